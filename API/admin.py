@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import AccountTier, APIUser, Image
+from .models import AccountTier, APIUser, EncodingProfile, Image, ThumbnailJob
 
 
 class AccountTierAdmin(admin.ModelAdmin):
@@ -10,6 +10,25 @@ class AccountTierAdmin(admin.ModelAdmin):
         "allowed_thumbnail_sizes",
         "can_create_original_img_link",
         "can_create_time_limited_link",
+        "job_priority",
+        "thumbnail_format",
+        "encoding_profile",
+        "max_image_pixels",
+        "max_render_memory",
+    )
+
+
+class EncodingProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "name",
+        "jpeg_quality",
+        "webp_quality",
+        "progressive",
+        "optimize",
+        "png_compress_level",
+        "png_colors",
+        "strip_metadata",
     )
 
 
@@ -21,6 +40,12 @@ class ImageAdmin(admin.ModelAdmin):
     list_display = ("id", "owner", "image", "thumbnail_size", "expire_time", "created")
 
 
+class ThumbnailJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "owner", "status", "priority", "progress", "created")
+
+
 admin.site.register(AccountTier, AccountTierAdmin)
 admin.site.register(APIUser, APIUserAdmin)
+admin.site.register(EncodingProfile, EncodingProfileAdmin)
 admin.site.register(Image, ImageAdmin)
+admin.site.register(ThumbnailJob, ThumbnailJobAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "API"
+
+    def ready(self):
+        from API import signals  # noqa: F401 - connects signal receivers
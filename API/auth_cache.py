@@ -0,0 +1,86 @@
+"""
+Cache of token -> user and user -> account tier resolution, used by authentication
+classes, so steady state authenticated requests don't query the database.
+Entries are invalidated by signal handlers in API.signals.
+"""
+import copy
+
+from django.conf import settings
+from rest_framework.authtoken.models import Token
+
+from API.caching import MISSING, TwoLevelCache
+from API.models import AccountTier, APIUser
+
+identity_cache = TwoLevelCache(
+    "auth",
+    local_size=settings.AUTH_CACHE_LOCAL_SIZE,
+    local_ttl=settings.AUTH_CACHE_LOCAL_TTL,
+    ttl=settings.AUTH_CACHE_TTL,
+)
+
+
+def store_user(user: APIUser):
+    """Caches user row and its account tier under separate keys"""
+    row = copy.copy(user)
+    row._state.fields_cache.pop("account_type", None)
+    identity_cache.set(f"user:{user.pk}", row)
+    if user.account_type_id is not None:
+        identity_cache.set(f"tier:{user.account_type_id}", copy.copy(user.account_type))
+
+
+def get_tier(tier_id: int):
+    """:return: AccountTier or None if it doesn't exist"""
+    tier = identity_cache.get(f"tier:{tier_id}")
+    if tier is MISSING:
+        tier = AccountTier.objects.filter(id=tier_id).first()
+        if tier is None:
+            return None
+        identity_cache.set(f"tier:{tier_id}", tier)
+    return copy.copy(tier)
+
+
+def get_user(user_id: int) -> APIUser:
+    """
+    :return: APIUser with account_type already set
+    :raises APIUser.DoesNotExist: if there is no such user
+    """
+    user = identity_cache.get(f"user:{user_id}")
+    if user is MISSING:
+        user = APIUser.objects.select_related("account_type").get(id=user_id)
+        store_user(user)
+        return user
+
+    user = copy.copy(user)
+    if user.account_type_id is not None:
+        user.account_type = get_tier(user.account_type_id)
+    return user
+
+
+def get_token_user(key: str) -> APIUser:
+    """
+    :return: APIUser owning auth token, with account_type already set
+    :raises Token.DoesNotExist: if token is invalid
+    """
+    user_id = identity_cache.get(f"token:{key}")
+    if user_id is not MISSING:
+        try:
+            return get_user(user_id)
+        except APIUser.DoesNotExist:
+            raise Token.DoesNotExist
+
+    token = Token.objects.select_related("user__account_type").get(key=key)
+    identity_cache.set(f"token:{key}", token.user_id)
+    store_user(token.user)
+    return token.user
+
+
+def invalidate_token(key: str):
+    identity_cache.delete(f"token:{key}")
+
+
+def invalidate_user(user_id: int):
+    identity_cache.delete(f"user:{user_id}")
+
+
+def invalidate_tier(tier_id: int):
+    identity_cache.delete(f"tier:{tier_id}")
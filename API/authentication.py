@@ -0,0 +1,55 @@
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from API.auth_cache import get_token_user, get_user
+
+
+class TierTokenAuthentication(TokenAuthentication):
+    """
+    DRF token authentication, resolving token to user together with its account
+    tier through API.auth_cache, so request.user can be used by views and
+    serializers without further queries.
+    """
+
+    def authenticate_credentials(self, key):
+        model = self.get_model()
+        try:
+            user = get_token_user(key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        return (user, model(key=key, user=user))
+
+
+class TierJWTAuthentication(JWTAuthentication):
+    """JWT authentication, loading user together with its account tier from API.auth_cache"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = get_user(user_id)
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return user
+
+
+class TierJWTScheme(SimpleJWTScheme):
+    """Documents TierJWTAuthentication in schema, same as the JWT it extends"""
+
+    target_class = "API.authentication.TierJWTAuthentication"
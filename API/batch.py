@@ -0,0 +1,189 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.request import Request
+
+from API.models import APIUser, Image
+from API.rendering import map_bounded, stored_thumbnail_format
+from API.sandbox import write_thumbnail_files_limited
+from API.serializers import ImageSerializer
+from API.uploads import atomic_upload, delete_rolled_back_files
+from API.utils import set_image_file_metadata
+
+logger = logging.getLogger(__name__)
+
+
+def render_original(
+    original: Image, sizes, tier, output_format=None, profile=None
+) -> dict:
+    """
+    Writes thumbnail files of a single batch original, meant to run on render pool.
+    Each original is rendered in its own render process, under budget of the tier.
+    :param sizes: sizes that are not already stored for content of the original
+    :param tier: AccountTier of the owner
+    :param output_format: stored thumbnail format of owners tier
+    :param profile: EncodingProfile of owners tier
+    :return: dict mapping thumbnail size to Image field values of the thumbnail file
+    """
+    return write_thumbnail_files_limited(
+        original.image,
+        sizes,
+        tier,
+        limit=1,
+        output_format=output_format,
+        profile=profile,
+    )
+
+
+def create_batch(owner: APIUser, files: list, request: Request) -> list:
+    """
+    Validates uploaded files, and creates originals and thumbnails for valid ones.
+    Files and thumbnails of already stored content are reused, see ImageQuerySet.
+    Originals are inserted first, then up to THUMBNAIL_BATCH_CONCURRENCY files are
+    rendered at once on render pool, outside of any transaction, and thumbnails
+    are bulk inserted in a second short one. If that fails, originals are deleted
+    again together with files written for them, see API.uploads.
+    :param owner: APIUser with account_type already loaded
+    :return: list of per-file result dicts, in order of received files
+    """
+    results = [None] * len(files)
+    originals = []
+    for index, uploaded_file in enumerate(files):
+        serializer = ImageSerializer(
+            data={"image": uploaded_file}, context={"request": request}
+        )
+        if serializer.is_valid():
+            original = Image(owner=owner, **serializer.validated_data)
+            set_image_file_metadata(original)
+            originals.append((index, original))
+        else:
+            results[index] = {
+                "file": uploaded_file.name,
+                "status": 400,
+                "errors": serializer.errors,
+            }
+
+    with atomic_upload() as uploaded:
+        Image.objects.bulk_create([original for _, original in originals])
+        uploaded.extend(original.image.name for _, original in originals)
+
+    try:
+        create_batch_thumbnails(owner, files, request, originals, results)
+    except Exception:
+        Image.objects.filter(id__in=[original.id for _, original in originals]).delete()
+        deleted = delete_rolled_back_files(uploaded)
+        logger.info("Deleted %s files of rolled back batch", deleted)
+        raise
+    return results
+
+
+def create_batch_thumbnails(
+    owner: APIUser, files: list, request: Request, originals: list, results: list
+):
+    """
+    Renders and inserts thumbnails of already inserted batch originals, and fills
+    in their results. Originals that can't be rendered are deleted, as are all
+    of them for tiers without original links.
+    :param originals: list of (index of file, original Image) pairs
+    :param results: list of per-file result dicts, filled in place
+    """
+    sizes = owner.account_type.allowed_thumbnail_sizes
+    keep_originals = owner.account_type.can_create_original_img_link
+    output_format = owner.account_type.stored_thumbnail_format
+    profile = owner.account_type.encoding_profile
+    formats = {
+        original.content_hash: stored_thumbnail_format(original.image, output_format)
+        for _, original in originals
+    }
+
+    def render(item):
+        index, original = item
+        missing_sizes = [
+            size
+            for size in sizes
+            if (original.content_hash, size) not in stored_thumbnails
+        ]
+        try:
+            return (
+                index,
+                original,
+                render_original(
+                    original, missing_sizes, owner.account_type, output_format, profile
+                ),
+            )
+        except Exception:
+            logger.exception("Batch image %s could not be rendered", original.image)
+            return index, original, None
+
+    stored_thumbnails = Image.objects.reuse_stored_thumbnails(formats, sizes, profile)
+    rendered_originals = list(
+        map_bounded(render, originals, settings.THUMBNAIL_BATCH_CONCURRENCY)
+    )
+
+    with transaction.atomic():
+        stored_thumbnails = Image.objects.reuse_stored_thumbnails(
+            formats, sizes, profile, lock=True
+        )
+
+        thumbnails_to_be_bulk_created = []
+        thumbnail_results = []
+        originals_to_delete = []
+        for index, original, rendered in rendered_originals:
+            if rendered is None:
+                originals_to_delete.append(original)
+                results[index] = {
+                    "file": files[index].name,
+                    "status": 400,
+                    "errors": {"image": ["Image could not be processed."]},
+                }
+                continue
+
+            # stored thumbnails deleted since the unlocked lookup
+            vanished_sizes = [
+                size
+                for size in sizes
+                if size not in rendered
+                and (original.content_hash, size) not in stored_thumbnails
+            ]
+            if vanished_sizes:
+                rendered.update(
+                    render_original(
+                        original,
+                        vanished_sizes,
+                        owner.account_type,
+                        output_format,
+                        profile,
+                    )
+                )
+
+            result = {"file": files[index].name, "status": 201}
+            result.update(ImageSerializer(original, context={"request": request}).data)
+            result["thumbnails"] = {}
+            for size in sizes:
+                thumbnail = Image(
+                    owner=owner,
+                    thumbnail_size=size,
+                    content_hash=original.content_hash,
+                    source=original if keep_originals else None,
+                    **(
+                        rendered.get(size)
+                        or stored_thumbnails[(original.content_hash, size)]
+                    ),
+                )
+                thumbnails_to_be_bulk_created.append(thumbnail)
+                thumbnail_results.append((result, thumbnail))
+
+            if keep_originals:
+                result["thumbnails"][original.dimensions] = original.get_url(request)
+            else:
+                originals_to_delete.append(original)
+            results[index] = result
+
+        # urls are read after insert, as colliding slugs get replaced by it
+        Image.objects.bulk_create(thumbnails_to_be_bulk_created)
+        for result, thumbnail in thumbnail_results:
+            result["thumbnails"][thumbnail.thumbnail_size] = thumbnail.get_url(request)
+        Image.objects.filter(
+            id__in=[original.id for original in originals_to_delete]
+        ).delete_with_files()
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from API import metrics
+
+MISSING = object()
+SINGLE_FLIGHT_POLL_INTERVAL = 0.02  # seconds
+
+
+class LocalCache:
+    """
+    Thread safe, in-process LRU cache, with entries expiring after ttl seconds.
+    Least recently used entries are evicted once maxsize is exceeded.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TwoLevelCache:
+    """
+    Local LRU cache in front of shared django cache. Local entries live only
+    a few seconds, because deletes reach local cache of the current process only,
+    while shared entries are dropped for every process at once.
+    Hits of both levels and misses are counted in metrics, under name prefix.
+    """
+
+    def __init__(self, name: str, local_size: int, local_ttl: float, ttl: float):
+        self.name = name
+        self.local = LocalCache(local_size, local_ttl)
+        self.ttl = ttl
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+
+    def make_key(self, key) -> str:
+        return f"{self.name}:{key}"
+
+    def get(self, key):
+        """:return: cached value or MISSING"""
+        key = self.make_key(key)
+        value = self.local.get(key)
+        if value is not MISSING:
+            metrics.increment(f"{self.name}_cache_local_hits")
+            return value
+
+        value = cache.get(key, MISSING)
+        if value is not MISSING:
+            metrics.increment(f"{self.name}_cache_shared_hits")
+            self.local.set(key, value)
+            return value
+
+        metrics.increment(f"{self.name}_cache_misses")
+        return MISSING
+
+    def set(self, key, value, ttl: float = None):
+        """:param ttl: seconds value is kept in shared cache, defaults to ttl of the cache"""
+        key = self.make_key(key)
+        cache.set(key, value, self.ttl if ttl is None else ttl)
+        self.local.set(key, value)
+
+    def delete(self, key):
+        key = self.make_key(key)
+        cache.delete(key)
+        self.local.delete(key)
+
+    def get_or_load(self, key, load, ttl=None):
+        """
+        Returns cached value, or stores and returns value of load().
+        Concurrent misses of a key are single flighted: threads of this process
+        wait for the one doing the load, other processes wait up to
+        CACHE_SINGLE_FLIGHT_WAIT seconds for the value stored by the process
+        holding shared lock, and only then load it themselves.
+        :param load: callable returning value of the key, None can be cached too
+        :param ttl: optional callable, returning shared cache ttl of loaded value
+        """
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        with self._flight(key):
+            value = self._peek(key)
+            if value is not MISSING:
+                metrics.increment(f"{self.name}_cache_coalesced")
+                return value
+
+            lock_key = self.make_key(key) + ":lock"
+            locked = cache.add(lock_key, 1, settings.CACHE_SINGLE_FLIGHT_WAIT * 2)
+            if not locked:
+                value = self._wait_shared(key)
+                if value is not MISSING:
+                    metrics.increment(f"{self.name}_cache_coalesced")
+                    return value
+
+            try:
+                value = load()
+                metrics.increment(f"{self.name}_cache_loads")
+                self.set(key, value, ttl(value) if ttl else None)
+            finally:
+                if locked:
+                    cache.delete(lock_key)
+            return value
+
+    def _peek(self, key):
+        """Looks key up in both levels without counting hits and misses"""
+        key = self.make_key(key)
+        value = self.local.get(key)
+        if value is MISSING:
+            value = cache.get(key, MISSING)
+            if value is not MISSING:
+                self.local.set(key, value)
+        return value
+
+    def _wait_shared(self, key):
+        """Polls shared cache for value loaded by another process"""
+        deadline = time.monotonic() + settings.CACHE_SINGLE_FLIGHT_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+            value = self._peek(key)
+            if value is not MISSING:
+                return value
+        return MISSING
+
+    @contextmanager
+    def _flight(self, key):
+        """Per key lock, shared by threads of this process missing the same key"""
+        with self._flights_lock:
+            lock, waiting = self._flights.get(key, (threading.Lock(), 0))
+            self._flights[key] = (lock, waiting + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._flights_lock:
+                lock, waiting = self._flights[key]
+                if waiting == 1:
+                    del self._flights[key]
+                else:
+                    self._flights[key] = (lock, waiting - 1)
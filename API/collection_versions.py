@@ -0,0 +1,77 @@
+"""
+Per user version of the image collection, stored on ImageCollection rows and
+replaced after commit of every transaction creating, changing or deleting images
+of the user, by any process - web, job worker or reaper. Image list and detail
+responses carry a strong ETag and Last-Modified derived from it, so conditional
+requests of polling clients are answered with 304 after a single primary key
+lookup, without running the queryset or the serializer.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from API import metrics
+from API.models import ImageCollection
+
+
+def get_version(user) -> tuple:
+    """
+    :param user: APIUser
+    :return: (version, unix time of last change) of images of the user
+    """
+    row = (
+        ImageCollection.objects.filter(owner_id=user.pk)
+        .values_list("version", "modified")
+        .first()
+    )
+    version, modified = row or ("", user.date_joined)
+    return version, int(modified.timestamp())
+
+
+def bump_versions(user_ids):
+    """Gives users new collection versions, once the current transaction commits"""
+    ImageCollection.objects.bump_on_commit(user_ids)
+
+
+def get_validators(request, user) -> tuple:
+    """
+    ETag of the response to request, and its Last-Modified unix time. Besides
+    collection version, ETag covers everything else the response depends on -
+    url with query parameters, host, media type, and original links of the tier.
+    :param user: APIUser with account_type already loaded
+    """
+    version, modified = get_version(user)
+    parts = [
+        version,
+        request.get_host(),
+        request.get_full_path(),
+        str(getattr(request, "accepted_media_type", "")),
+        str(user.account_type_id),
+        str(user.account_type and user.account_type.can_create_original_img_link),
+    ]
+    digest = hashlib.sha256("|".join(parts).encode()).hexdigest()
+    return f'"{digest[:32]}"', modified
+
+
+def conditional_response(request, etag: str, modified: int):
+    """
+    :return: 304 response when If-None-Match or If-Modified-Since of the request
+    match the validators, 412 when its If-Match doesn't, or None when a full
+    response is needed
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=modified, response=None
+    )
+    if response is not None and response.status_code == 304:
+        metrics.increment("collection_not_modified")
+        add_validators(response, etag, modified)
+    return response
+
+
+def add_validators(response, etag: str, modified: int):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(modified)
+    response["Cache-Control"] = "private, no-cache"
+    patch_vary_headers(response, ("Authorization",))
+    return response
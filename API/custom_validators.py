@@ -1,6 +1,12 @@
 import magic
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
+from PIL import Image as PILImage
+
+# Bytes of uploaded file read to identify its type, and to find its dimensions
+TYPE_SNIFF_SIZE = 2048
+HEADER_READ_SIZE = 64 * 1024
 
 
 class MinValueValidatorIgnoreNull(MinValueValidator):
@@ -40,7 +46,9 @@ def validate_image_type(value):
         raise ValidationError(error_msg)
 
     # Check if mimetype starts with any of allowed item from valid_data
-    mimetype = magic.from_buffer(value.read())
+    value.seek(0)
+    mimetype = magic.from_buffer(value.read(TYPE_SNIFF_SIZE))
+    value.seek(0)
     valid_data = ("PNG image data", "JPEG image data,")
 
     def check_correct_type(x):
@@ -48,3 +56,33 @@ def validate_image_type(value):
 
     if not any(map(check_correct_type, valid_data)):
         raise ValidationError(error_msg)
+
+
+def read_image_size(file):
+    """
+    Reads image dimensions from its header, without decoding pixel data.
+    :param file: file-like object, positioned at the start of image data
+    :return: (width, height) tuple, or None if header can't be parsed
+    """
+    try:
+        with PILImage.open(file) as image:
+            return image.size
+    except PILImage.DecompressionBombError:
+        return (PILImage.MAX_IMAGE_PIXELS, PILImage.MAX_IMAGE_PIXELS)
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+
+def validate_image_dimensions(value):
+    """
+    Check if image fits in THUMBNAIL_MAX_IMAGE_PIXELS budget, using its header only
+    :param value: models.ImageField object to check
+    """
+    value.seek(0)
+    size = read_image_size(value)
+    value.seek(0)
+
+    if size and size[0] * size[1] > settings.THUMBNAIL_MAX_IMAGE_PIXELS:
+        raise ValidationError(
+            f"Image is too large. Allowed size is {settings.THUMBNAIL_MAX_IMAGE_PIXELS} pixels."
+        )
@@ -0,0 +1,202 @@
+"""
+On-disk cache of lazily rendered thumbnails. Lazy thumbnail rows point at their
+source file, and each size is rendered on first view of its slug, see
+img.views.RawImageView. Format variants of thumbnails, e.g. WebP for clients
+accepting it, are rendered and cached the same way, with encoding profile of the
+tier. Rendered files live under DERIVED_CACHE_DIR of MEDIA_ROOT,
+are shared by all rows with the same source and size, and least recently viewed
+ones are evicted once they take more than DERIVED_CACHE_MAX_BYTES. Bytes written are
+counted in shared django cache, and eviction frees the cache down to its
+DERIVED_CACHE_LOW_WATER fraction, so the tree is walked only once in a while.
+First views are single flighted by TwoLevelCache, so concurrent ones render once,
+under render budget of the owners tier, see API.sandbox.
+"""
+import hashlib
+import logging
+import os
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+from API import metrics
+from API.caching import TwoLevelCache
+from API.models import AccountTier, EncodingProfile
+from API.rendering import encode_single_thumbnail, replace_file
+from API.sandbox import check_pixel_budget, run_limited
+
+logger = logging.getLogger(__name__)
+
+# possible extensions of rendered file, by forced output format, each format
+# has its own stem, so a file of one is never served for the other
+EXTENSIONS = {
+    None: (".jpg", ".png"),  # JPEG, or PNG when transparent
+    "jpeg": (".jpg",),
+    "webp": (".webp",),
+}
+SIZE_KEY = "derived_cache:bytes"  # shared estimate of bytes taken by the cache
+EVICTION_LOCK_KEY = "derived_cache:evicting"  # held by the one process evicting
+EVICTION_LOCK_TTL = 5 * 60  # seconds, lock of a killed process is released by then
+
+derived_cache = TwoLevelCache(
+    "derived",
+    local_size=settings.DERIVED_CACHE_LOCAL_SIZE,
+    local_ttl=settings.DERIVED_CACHE_LOCAL_TTL,
+    ttl=settings.DERIVED_CACHE_TTL,
+)
+
+
+def derived_stem(
+    source_name: str, size: int, output_format: str = None, profile_id: int = None
+) -> str:
+    """:return: storage path of rendered thumbnail, without file extension"""
+    digest = hashlib.sha256(source_name.encode()).hexdigest()
+    stem = f"{settings.DERIVED_CACHE_DIR}/{digest[:2]}/{digest}_{size}"
+    stem += f"_{output_format or 'src'}"
+    if profile_id is not None:
+        stem += f"_p{profile_id}"
+    return stem
+
+
+def find_derived(stem: str, output_format: str = None):
+    """:return: storage path of already rendered thumbnail, or None"""
+    for extension in EXTENSIONS[output_format]:
+        if default_storage.exists(stem + extension):
+            return stem + extension
+    return None
+
+
+def store_derived(stem: str, data: bytes, extension: str) -> str:
+    """
+    Writes rendered thumbnail through a temporary file, so views never send
+    a partially written one, and evicts old files if cache got too big.
+    :return: storage path of the written file
+    """
+    name = stem + extension
+    replace_file(name, data)
+
+    try:
+        total = cache.incr(SIZE_KEY, len(data))
+    except ValueError:  # not counted yet, or dropped from cache
+        total = settings.DERIVED_CACHE_MAX_BYTES + 1
+    # other processes keep serving and writing while one of them evicts
+    if total > settings.DERIVED_CACHE_MAX_BYTES and cache.add(
+        EVICTION_LOCK_KEY, True, EVICTION_LOCK_TTL
+    ):
+        low_water = settings.DERIVED_CACHE_MAX_BYTES * settings.DERIVED_CACHE_LOW_WATER
+        try:
+            evict(int(low_water), keep=default_storage.path(name))
+        finally:
+            cache.delete(EVICTION_LOCK_KEY)
+    return name
+
+
+def evict(max_bytes: int, keep: str = None) -> int:
+    """
+    Deletes least recently viewed rendered thumbnails, until the rest fits
+    in max_bytes, and stores exact size of the cache as shared estimate.
+    :param keep: absolute path of a file that is never evicted, e.g. one just written
+    :return: number of deleted files
+    """
+    entries = []
+    root = default_storage.path(settings.DERIVED_CACHE_DIR)
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # evicted by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    deleted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        deleted += 1
+
+    cache.set(SIZE_KEY, total, None)
+    metrics.increment("derived_cache_eviction_runs")
+    metrics.increment("derived_cache_evictions", deleted)
+    return deleted
+
+
+def encode_stored_source(source_name: str, size: int, output_format, profile):
+    """:return: encoded bytes and file extension of thumbnail of a stored source"""
+    with default_storage.open(source_name, "rb") as source_file:
+        return encode_single_thumbnail(
+            source_file, source_name, size, output_format, profile
+        )
+
+
+def render_derived(
+    source_name: str,
+    size: int,
+    output_format: str = None,
+    profile_id: int = None,
+    tier: AccountTier = None,
+) -> str:
+    """
+    Returns rendered thumbnail already on disk, or renders and stores it
+    under budget of the tier. Raises API.sandbox.RenderError if it can't be rendered.
+    """
+    stem = derived_stem(source_name, size, output_format, profile_id)
+    name = find_derived(stem, output_format)
+    if name is not None:
+        return name
+
+    tier = tier or AccountTier()
+    profile = None
+    if profile_id is not None:
+        profile = EncodingProfile.objects.filter(id=profile_id).first()
+    started = time.process_time()
+    with default_storage.open(source_name, "rb") as source_file:
+        check_pixel_budget(source_file, tier.pixel_budget)
+    data, extension = run_limited(
+        encode_stored_source, (source_name, size, output_format, profile), tier
+    )
+    metrics.increment("derived_cache_renders")
+    metrics.increment(
+        "derived_cache_render_ms", round((time.process_time() - started) * 1000)
+    )
+    return store_derived(stem, data, extension)
+
+
+def get_derived_image(
+    source_name: str,
+    size: int,
+    output_format: str = None,
+    profile_id: int = None,
+    tier: AccountTier = None,
+) -> str:
+    """
+    Storage path of thumbnail of given size rendered from source, rendered now
+    if it's not in the cache. Viewed file is marked as recently used for eviction.
+    :param source_name: storage path of source image, original or stored thumbnail
+    :param output_format: key of API.rendering.FORMAT_EXTENSIONS, None picks
+    JPEG or PNG by transparency
+    :param profile_id: id of EncodingProfile of owners tier, None for encoder defaults
+    :param tier: AccountTier with render budget of the owner, None for default budget
+    """
+    key = derived_stem(source_name, size, output_format, profile_id).rsplit("/", 1)[-1]
+    load = partial(render_derived, source_name, size, output_format, profile_id, tier)
+    name = derived_cache.get_or_load(key, load)
+    if not default_storage.exists(name):  # evicted since its path got cached
+        derived_cache.delete(key)
+        name = derived_cache.get_or_load(key, load)
+
+    try:
+        os.utime(default_storage.path(name))
+    except FileNotFoundError:
+        logger.warning("Rendered thumbnail %s was evicted while viewed", name)
+    return name
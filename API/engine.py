@@ -0,0 +1,143 @@
+"""
+Pillow thumbnail engine. Thumbnails are squares cropped around the center, and
+upscaled when the source is smaller. Files are named and encoded the same way
+easy_thumbnails did it for these options, so thumbnails rendered by it keep
+being reused, but they are tracked by Image rows only, without its tables.
+"""
+import os
+from io import BytesIO
+
+from PIL import Image as PILImage
+
+JPEG_QUALITY = 85
+JPEG_SUBSAMPLING = 2  # 4:2:0
+PROGRESSIVE_MIN_SIZE = 100  # JPEG thumbnails this big or bigger are progressive
+THUMBNAIL_EXTENSION = ".jpg"
+TRANSPARENT_THUMBNAIL_EXTENSION = ".png"
+
+# extensions of formats thumbnails can be forced into, encoder picks format by extension
+FORMAT_EXTENSIONS = {"jpeg": ".jpg", "webp": ".webp"}
+
+# transposition restoring upright image, by EXIF orientation tag
+ORIENTATION_TRANSPOSE = {
+    2: [PILImage.Transpose.FLIP_LEFT_RIGHT],
+    3: [PILImage.Transpose.ROTATE_180],
+    4: [PILImage.Transpose.FLIP_TOP_BOTTOM],
+    5: [PILImage.Transpose.ROTATE_270, PILImage.Transpose.FLIP_LEFT_RIGHT],
+    6: [PILImage.Transpose.ROTATE_270],
+    7: [PILImage.Transpose.ROTATE_90, PILImage.Transpose.FLIP_LEFT_RIGHT],
+    8: [PILImage.Transpose.ROTATE_90],
+}
+EXIF_ORIENTATION = 0x0112
+
+
+def is_transparent(image: PILImage.Image) -> bool:
+    return image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+
+
+def read_orientation(image: PILImage.Image) -> int:
+    """
+    :return: EXIF orientation tag of opened image, None without one. Has to be read
+    before image is reduced, as reduced copies don't carry EXIF of the file.
+    """
+    try:
+        exif = image._getexif()
+    except Exception:  # missing or broken EXIF fails in many ways
+        exif = None
+    return (exif or {}).get(EXIF_ORIENTATION)
+
+
+def apply_orientation(image: PILImage.Image, orientation: int) -> PILImage.Image:
+    """Rotates and flips image as given EXIF orientation tag says"""
+    for method in ORIENTATION_TRANSPOSE.get(orientation, []):
+        image = image.transpose(method)
+    return image
+
+
+def exif_orientation(image: PILImage.Image) -> PILImage.Image:
+    """Rotates and flips image as its EXIF orientation tag says"""
+    return apply_orientation(image, read_orientation(image))
+
+
+def colorspace(image: PILImage.Image) -> PILImage.Image:
+    """Converts image to RGB, or L for grayscale ones, keeping transparency"""
+    if image.mode == "I":  # 16 bit grayscale can't be converted to 8 bit directly
+        image = image.point([i // 256 for i in range(2**16)], "L")
+
+    mode = "L" if image.mode in ("L", "LA") else "RGB"
+    if is_transparent(image):
+        mode += "A"
+    return image if image.mode == mode else image.convert(mode)
+
+
+def scale_and_crop(image: PILImage.Image, size: int) -> PILImage.Image:
+    """Scales image to cover size x size square, and crops the square from its center"""
+    source_x, source_y = image.size
+    scale = max(size / source_x, size / source_y)
+    if scale != 1.0:
+        image = image.resize(
+            (int(round(source_x * scale)), int(round(source_y * scale))),
+            resample=PILImage.Resampling.LANCZOS,
+        )
+
+    source_x, source_y = image.size
+    if source_x > size or source_y > size:
+        left = max(0, min(source_x - size, source_x // 2 - size // 2))
+        top = max(0, min(source_y - size, source_y // 2 - size // 2))
+        image = image.crop(
+            (left, top, min(source_x, left + size), min(source_y, top + size))
+        )
+    return image
+
+
+def thumbnail_name(
+    source_name: str,
+    size: int,
+    transparent: bool = False,
+    output_format: str = None,
+    profile_id: int = None,
+) -> str:
+    """
+    Storage path of thumbnail, next to its source, e.g. a.jpg.200x200_q85_crop_upscale.jpg.
+    :param output_format: key of FORMAT_EXTENSIONS, None picks JPEG or PNG by transparency
+    :param profile_id: id of EncodingProfile, thumbnails of each profile get own names
+    """
+    options = [f"{size}x{size}", f"q{JPEG_QUALITY}", "crop"]
+    if profile_id is not None:
+        options.append(f"profile-{profile_id}")
+    options.append("upscale")
+
+    if output_format is not None:
+        extension = FORMAT_EXTENSIONS[output_format]
+    elif transparent:
+        extension = TRANSPARENT_THUMBNAIL_EXTENSION
+    else:
+        extension = THUMBNAIL_EXTENSION
+    return f"{source_name}.{'_'.join(options)}{extension}"
+
+
+def image_format(name: str) -> str:
+    """:return: PIL format name picked by extension of the file, JPEG by default"""
+    extension = os.path.splitext(name)[1].lower()
+    return PILImage.registered_extensions().get(extension, "JPEG")
+
+
+def save_image(image: PILImage.Image, image_format: str) -> bytes:
+    """Encodes thumbnail with default encoder settings of the format"""
+    options = {}
+    if image_format == "JPEG":
+        if image.mode.endswith("A"):
+            image = image.convert(image.mode[:-1])
+        options.update(
+            quality=JPEG_QUALITY, subsampling=JPEG_SUBSAMPLING, optimize=True
+        )
+        if max(image.size) >= PROGRESSIVE_MIN_SIZE:
+            options["progressive"] = True
+    elif image_format == "WEBP":
+        options["quality"] = JPEG_QUALITY
+
+    output = BytesIO()
+    image.save(output, format=image_format, **options)
+    return output.getvalue()
@@ -0,0 +1,112 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from API.models import APIUser, Image, ThumbnailJob
+from API.slug_cache import invalidate_slug
+from API.utils import set_image_model_slug
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_thumbnail_job(original: Image, owner: APIUser) -> ThumbnailJob:
+    """
+    Queues rendering of all thumbnails allowed by owners tier.
+    Slugs are assigned up front, so urls can be returned before thumbnails exist.
+    :param owner: APIUser with account_type already loaded
+    """
+    slugs = {}
+    for size in owner.account_type.allowed_thumbnail_sizes:
+        placeholder = Image(thumbnail_size=size)
+        set_image_model_slug(placeholder)
+        slugs[str(size)] = placeholder.slug
+
+    return ThumbnailJob.objects.create(
+        owner=owner,
+        source=original,
+        priority=owner.account_type.job_priority,
+        slugs=slugs,
+    )
+
+
+def claim_next_job(min_priority: int = 0):
+    """
+    Locks and marks as running the pending job with highest priority, or when
+    none is pending, a running job whose worker did not report progress in
+    THUMBNAIL_JOB_STALE_AFTER, see run_job. Each is looked up by its own partial index.
+    SKIP LOCKED lets any number of workers poll the table at the same time.
+    :return: claimed ThumbnailJob or None if queue is empty
+    """
+    stale_before = timezone.now() - settings.THUMBNAIL_JOB_STALE_AFTER
+    jobs = ThumbnailJob.objects.select_for_update(skip_locked=True).filter(
+        priority__gte=min_priority
+    )
+    with transaction.atomic():
+        job = (
+            jobs.filter(status=ThumbnailJob.PENDING).order_by("-priority", "id").first()
+        )
+        if job is None:
+            job = (
+                jobs.filter(status=ThumbnailJob.RUNNING, started__lt=stale_before)
+                .order_by("started")
+                .first()
+            )
+        if job is None:
+            return None
+        job.status = ThumbnailJob.RUNNING
+        job.started = timezone.now()
+        job.save(update_fields=["status", "started"])
+    return job
+
+
+def run_job(job: ThumbnailJob) -> ThumbnailJob:
+    """
+    Renders thumbnails of claimed job, and stores its final status.
+    Progress reports refresh start of the job, so it isn't reclaimed as stale
+    while its worker still renders. A job reclaimed from a worker that got stuck
+    renders only sizes whose reserved slug that worker hasn't stored.
+    """
+    stored_slugs = set()
+
+    def report_progress(done):
+        ThumbnailJob.objects.filter(id=job.id).update(
+            progress=len(stored_slugs) + done, started=timezone.now()
+        )
+
+    try:
+        stored_slugs.update(
+            Image.objects.filter(
+                owner_id=job.owner_id, slug__in=job.slugs.values()
+            ).values_list("slug", flat=True)
+        )
+        thumbnails = []
+        if not job.slugs or stored_slugs != set(job.slugs.values()):
+            if job.source_id is None:
+                raise Image.DoesNotExist("Source image no longer exists.")
+            owner = APIUser.objects.select_related("account_type").get(id=job.owner_id)
+            thumbnails = job.source.create_thumbnails(
+                owner,
+                slugs=job.slugs,
+                progress=report_progress,
+                sizes=[
+                    size
+                    for size in owner.account_type.allowed_thumbnail_sizes
+                    if job.slugs.get(str(size)) not in stored_slugs
+                ],
+            )
+            if job.source.pk is None:  # deleted, because tier doesn't keep originals
+                job.source = None
+        for slug in job.slugs.values():  # might be cached as unknown before rendering
+            invalidate_slug(slug)
+        job.status = ThumbnailJob.DONE
+        job.progress = len(stored_slugs) + len(thumbnails)
+    except Exception as e:
+        logger.exception("Thumbnail job %s failed", job.id)
+        job.status = ThumbnailJob.FAILED
+        job.error = str(e)
+
+    job.finished = timezone.now()
+    job.save(update_fields=["status", "progress", "error", "finished"])
+    return job
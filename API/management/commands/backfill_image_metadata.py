@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from API.models import Image
+from API.utils import read_image_metadata
+
+METADATA_FIELDS = ["width", "height", "file_size", "format"]
+
+
+def read_stored_metadata(image: Image):
+    """
+    :return: tuple of image and its metadata dict, or None if file can't be read
+    """
+    try:
+        with image.image.open("rb") as f:
+            return image, read_image_metadata(f)
+    except Exception:
+        return image, None
+
+
+class Command(BaseCommand):
+    help = (
+        "Stores dimensions, byte size and format of images uploaded before they were "
+        "recorded on Image rows. Can be interrupted, and resumed at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of files read from storage in parallel.",
+        )
+        parser.add_argument(
+            "--after-id",
+            type=int,
+            default=0,
+            help="Resume from rows with id greater than this one.",
+        )
+
+    def handle(self, *args, **options):
+        last_id = options["after_id"]
+        updated = failed = 0
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            while True:
+                chunk = list(
+                    Image.objects.filter(width__isnull=True, id__gt=last_id)
+                    .only("id", "image")
+                    .order_by("id")[: options["chunk_size"]]
+                )
+                if not chunk:
+                    break
+
+                images_to_update = []
+                for image, metadata in executor.map(read_stored_metadata, chunk):
+                    if metadata is None:
+                        failed += 1
+                        self.stderr.write(f"Can't read image {image.id}: {image.image}")
+                        continue
+                    for field, value in metadata.items():
+                        setattr(image, field, value)
+                    images_to_update.append(image)
+
+                Image.objects.bulk_update(images_to_update, METADATA_FIELDS)
+                updated += len(images_to_update)
+                last_id = chunk[-1].id
+                self.stdout.write(f"Updated {updated} images, last id {last_id}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Done. Updated {updated} images, {failed} failed.")
+        )
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from API.jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Renders thumbnails of uploads queued with async mode."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process queued jobs and exit, instead of polling for new ones.",
+        )
+        parser.add_argument(
+            "--min-priority",
+            type=int,
+            default=0,
+            help="Only take jobs of at least this priority, to reserve a worker for higher tiers.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.THUMBNAIL_JOB_POLL_INTERVAL,
+            help="Seconds to wait before checking an empty queue again.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_job(options["min_priority"])
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll_interval"])
+                continue
+
+            run_job(job)
+            self.stdout.write(f"Job {job.id}: {job.status}")
@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from API.reaper import reap_expired, reap_finished_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes expired time limited images and their files, "
+        "and thumbnail jobs past retention, in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.REAPER_BATCH_SIZE,
+            help="Number of images or jobs deleted in one transaction.",
+        )
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            default=None,
+            help="Stop a run after this many batches, even if expired rows are left.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, instead of exiting once no expired image is left.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.REAPER_INTERVAL,
+            help="Seconds to wait between runs in loop mode.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            stats = reap_expired(options["batch_size"], options["max_batches"])
+            self.stdout.write(
+                f"Deleted {stats['rows']} expired images in {stats['batches']} batches, "
+                f"{stats['seconds']:.2f}s ({stats['rows_per_second']:.1f} rows/s)"
+            )
+            stats = reap_finished_jobs(options["batch_size"], options["max_batches"])
+            self.stdout.write(
+                f"Deleted {stats['rows']} finished jobs in {stats['batches']} batches, "
+                f"{stats['seconds']:.2f}s ({stats['rows_per_second']:.1f} rows/s)"
+            )
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,43 @@
+"""
+Process wide counters of API internals, e.g. cache hits and misses.
+Values are exposed to staff users under /api/v1/metrics/.
+"""
+import threading
+from collections import Counter
+
+_counters = Counter()
+_lock = threading.Lock()
+
+
+def increment(name: str, amount: int = 1):
+    with _lock:
+        _counters[name] += amount
+
+
+def maximum(name: str, value: int):
+    """Keeps the biggest value seen so far, e.g. peak memory of a single render"""
+    with _lock:
+        _counters[name] = max(_counters[name], value)
+
+
+def get(name: str) -> int:
+    with _lock:
+        return _counters[name]
+
+
+def snapshot() -> dict:
+    """:return: dict with current value of every counter"""
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+
+def ratio(hits_name: str, misses_name: str) -> float:
+    """:return: share of hits in hits and misses counted so far, 0 before any"""
+    with _lock:
+        hits, misses = _counters[hits_name], _counters[misses_name]
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+def reset():
+    with _lock:
+        _counters.clear()
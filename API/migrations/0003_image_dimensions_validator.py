@@ -0,0 +1,26 @@
+# Generated by Django 4.1.6 on 2026-10-18 08:39
+
+from django.db import migrations, models
+
+import API.custom_validators
+import API.utils
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("API", "0002_thumbnail_jobs"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="image",
+            name="image",
+            field=models.ImageField(
+                upload_to=API.utils.user_directory_path,
+                validators=[
+                    API.custom_validators.validate_image_type,
+                    API.custom_validators.validate_image_dimensions,
+                ],
+            ),
+        ),
+    ]
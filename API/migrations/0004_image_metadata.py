@@ -0,0 +1,32 @@
+# Generated by Django 4.1.6 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("API", "0003_image_dimensions_validator"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="image",
+            name="file_size",
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="image",
+            name="format",
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name="image",
+            name="height",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="image",
+            name="width",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.1.6 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("API", "0004_image_metadata"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="image",
+            index=models.Index(fields=["owner", "id"], name="image_owner_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="image",
+            index=models.Index(
+                condition=models.Q(("thumbnail_size__isnull", True)),
+                fields=["owner", "id"],
+                name="image_owner_originals_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="image",
+            index=models.Index(
+                fields=["owner", "thumbnail_size", "id"], name="image_owner_size_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.6 on 2026-10-18 08:45
+
+from django.db import migrations
+from django.db.models import Count
+from django.utils.crypto import get_random_string
+
+
+def replace_duplicated_slugs(apps, schema_editor):
+    """Gives new slug to every row, but the first one, sharing a slug, and to empty ones"""
+    Image = apps.get_model("API", "Image")
+    duplicated = (
+        Image.objects.values("slug")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .values_list("slug", flat=True)
+    )
+    for slug in list(duplicated) + [""]:
+        images = Image.objects.filter(slug=slug).order_by("id")
+        if slug:
+            images = images[1:]
+        for image in images:
+            image.slug = get_random_string(15)
+            image.save(update_fields=["slug"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("API", "0005_image_list_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(replace_duplicated_slugs, migrations.RunPython.noop),
+    ]
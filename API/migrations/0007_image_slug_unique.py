@@ -0,0 +1,17 @@
+# Generated by Django 4.1.6 on 2026-10-18 08:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("API", "0006_image_slug_dedupe"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="image",
+            name="slug",
+            field=models.SlugField(max_length=15, unique=True),
+        ),
+    ]
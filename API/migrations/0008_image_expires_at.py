@@ -0,0 +1,42 @@
+# Generated by Django 4.1.6 on 2026-10-18 08:56
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import DateTimeField, DurationField, ExpressionWrapper, F
+
+
+def fill_expires_at(apps, schema_editor):
+    """Stores expiry of existing time limited images, in a single UPDATE"""
+    Image = apps.get_model("API", "Image")
+    lifetime = ExpressionWrapper(
+        F("expire_time") * timedelta(seconds=1), output_field=DurationField()
+    )
+    Image.objects.filter(expire_time__isnull=False).update(
+        expires_at=ExpressionWrapper(
+            F("created") + lifetime, output_field=DateTimeField()
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("API", "0007_image_slug_unique"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="image",
+            name="expires_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="image",
+            index=models.Index(
+                condition=models.Q(("expires_at__isnull", False)),
+                fields=["expires_at"],
+                name="image_expires_at_idx",
+            ),
+        ),
+        migrations.RunPython(fill_expires_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.1.6 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("API", "0008_image_expires_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="image",
+            name="content_hash",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name="image",
+            index=models.Index(
+                condition=models.Q(("expire_time__isnull", True)),
+                fields=["content_hash", "thumbnail_size"],
+                name="image_content_hash_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.6 on 2026-10-18 09:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("API", "0009_image_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="image",
+            name="lazy",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.6 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("API", "0010_image_lazy"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="accounttier",
+            name="thumbnail_format",
+            field=models.CharField(
+                choices=[("source", "Source"), ("jpeg", "JPEG"), ("webp", "WebP")],
+                default="source",
+                max_length=10,
+            ),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.1.6 on 2026-10-18 09:14
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("API", "0011_accounttier_thumbnail_format"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EncodingProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50)),
+                (
+                    "jpeg_quality",
+                    models.PositiveSmallIntegerField(
+                        default=85,
+                        validators=[
+                            django.core.validators.MinValueValidator(1),
+                            django.core.validators.MaxValueValidator(95),
+                        ],
+                    ),
+                ),
+                (
+                    "webp_quality",
+                    models.PositiveSmallIntegerField(
+                        default=80,
+                        validators=[
+                            django.core.validators.MinValueValidator(1),
+                            django.core.validators.MaxValueValidator(100),
+                        ],
+                    ),
+                ),
+                ("progressive", models.BooleanField(default=False)),
+                ("optimize", models.BooleanField(default=True)),
+                (
+                    "png_compress_level",
+                    models.PositiveSmallIntegerField(
+                        default=6,
+                        validators=[django.core.validators.MaxValueValidator(9)],
+                    ),
+                ),
+                (
+                    "png_colors",
+                    models.PositiveSmallIntegerField(
+                        default=0,
+                        validators=[django.core.validators.MaxValueValidator(256)],
+                    ),
+                ),
+                ("strip_metadata", models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="accounttier",
+            name="encoding_profile",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="API.encodingprofile",
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.1.6 on 2026-10-18 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("API", "0012_encodingprofile"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="accounttier",
+            name="max_image_pixels",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="accounttier",
+            name="max_render_memory",
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.1.6 on 2026-10-18 09:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def source_name(name, size):
+    """Storage name of source of a thumbnail file, see API.engine.thumbnail_name"""
+    return name.rsplit(f".{size}x{size}_", 1)[0]
+
+
+def link_thumbnails(apps, schema_editor):
+    """
+    Links thumbnails to the original of the same owner they were rendered from,
+    found by content hash, by thumbnail file name, or by lazy thumbnails pointing
+    at the original file. Of several matching originals, the newest one uploaded
+    before the thumbnail is picked. Thumbnails of deleted originals stay unlinked.
+    """
+    Image = apps.get_model("API", "Image")
+    owners = (
+        Image.objects.filter(thumbnail_size__isnull=False)
+        .values_list("owner_id", flat=True)
+        .distinct()
+    )
+    for owner_id in owners:
+        by_hash, by_name = {}, {}
+        for image_id, name, content_hash in (
+            Image.objects.filter(owner_id=owner_id, thumbnail_size__isnull=True)
+            .order_by("id")
+            .values_list("id", "image", "content_hash")
+        ):
+            by_name.setdefault(name, []).append(image_id)
+            if content_hash:
+                by_hash.setdefault(content_hash, []).append(image_id)
+        if not by_name:
+            continue
+
+        linked = []
+        for thumbnail in Image.objects.filter(
+            owner_id=owner_id, thumbnail_size__isnull=False
+        ).only("id", "image", "content_hash", "thumbnail_size"):
+            candidates = (
+                by_hash.get(thumbnail.content_hash, [])
+                + by_name.get(thumbnail.image.name, [])
+                + by_name.get(
+                    source_name(thumbnail.image.name, thumbnail.thumbnail_size), []
+                )
+            )
+            if not candidates:
+                continue
+            earlier = [image_id for image_id in candidates if image_id < thumbnail.id]
+            thumbnail.source_id = max(earlier or candidates)
+            linked.append(thumbnail)
+        Image.objects.bulk_update(linked, ["source"], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("API", "0013_accounttier_render_budget"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="image",
+            name="source",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="thumbnails",
+                to="API.image",
+            ),
+        ),
+        migrations.RunPython(link_thumbnails, migrations.RunPython.noop),
+    ]
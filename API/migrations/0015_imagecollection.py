@@ -0,0 +1,61 @@
+# Generated by Django 4.1.6 on 2026-10-18 09:46
+
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def add_collections(apps, schema_editor):
+    """Versions image collections of users already owning images, modified by their latest change"""
+    Image = apps.get_model("API", "Image")
+    ImageCollection = apps.get_model("API", "ImageCollection")
+    ImageCollection.objects.bulk_create(
+        [
+            ImageCollection(
+                owner_id=row["owner_id"],
+                version=uuid.uuid4().hex,
+                modified=row["modified"],
+            )
+            for row in Image.objects.values("owner_id").annotate(
+                modified=Max("created")
+            )
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("API", "0014_image_source"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImageCollection",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.CharField(max_length=32)),
+                ("modified", models.DateTimeField()),
+                (
+                    "owner",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="image_collection",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(add_collections, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.6 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("API", "0015_imagecollection"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="thumbnailjob",
+            index=models.Index(
+                condition=models.Q(("status", "running")),
+                fields=["started"],
+                name="thumbnailjob_running_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="thumbnailjob",
+            index=models.Index(
+                condition=models.Q(("status__in", ["done", "failed"])),
+                fields=["finished"],
+                name="thumbnailjob_finished_idx",
+            ),
+        ),
+    ]
@@ -1,34 +1,129 @@
+import logging
 import os
-from datetime import datetime, timedelta
+import threading
+import uuid
 
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.contrib.postgres.fields import ArrayField
-from django.db import models
+from django.core.files.storage import default_storage
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Now
 from django.http import HttpRequest
-from easy_thumbnails.files import get_thumbnailer
-from pytz import timezone
+from django.utils import timezone
 from rest_framework.request import Request
 
-from ThumbnailAPI.settings import TIME_ZONE
-
+from . import metrics
 from .custom_validators import (
     MaxValueValidatorIgnoreNull,
     MinValueValidatorIgnoreNull,
+    validate_image_dimensions,
     validate_image_type,
 )
-from .utils import set_image_model_slug, user_directory_path
+from .rendering import stored_thumbnail_format
+from .sandbox import check_pixel_budget, render_thumbnails_limited
+from .signed_urls import sign_path
+from .utils import (
+    insert_with_unique_slugs,
+    set_image_content_hash,
+    set_image_expiry,
+    set_image_file_metadata,
+    set_image_model_slug,
+    user_directory_path,
+)
+
+logger = logging.getLogger(__name__)
+
+# owners whose image collection changed in transactions of this thread, see bump_on_commit
+_changed_collections = threading.local()
+
+# fields describing stored file of an image, shared by rows of duplicate uploads
+STORED_FILE_FIELDS = ("image", "width", "height", "file_size", "format")
+
+
+class EncodingProfile(models.Model):
+    """
+    Encoder settings of thumbnails of tiers linked to the profile, trading
+    encoding CPU for bytes. Applied by API.rendering.save_with_profile.
+    """
+
+    name = models.CharField(max_length=50)
+    jpeg_quality = models.PositiveSmallIntegerField(
+        default=85, validators=[MinValueValidator(1), MaxValueValidator(95)]
+    )
+    webp_quality = models.PositiveSmallIntegerField(
+        default=80, validators=[MinValueValidator(1), MaxValueValidator(100)]
+    )
+    progressive = models.BooleanField(default=False)  # progressive JPEG
+    optimize = models.BooleanField(
+        default=True
+    )  # extra encoder pass of JPEG and PNG, slowest WebP method
+    png_compress_level = models.PositiveSmallIntegerField(
+        default=6, validators=[MaxValueValidator(9)]
+    )
+    png_colors = models.PositiveSmallIntegerField(
+        default=0, validators=[MaxValueValidator(256)]
+    )  # PNG quantized to palette of this many colors, 0 keeps full color
+    strip_metadata = models.BooleanField(
+        default=True
+    )  # leaves out ICC profile and EXIF of the source
+
+    def __str__(self):
+        return f"{self.name}"
 
 
 class AccountTier(models.Model):
+    # output format policy of thumbnails
+    SOURCE_FORMAT = "source"  # JPEG, or PNG for transparent images
+    JPEG_FORMAT = "jpeg"  # optimized JPEG, also for transparent images
+    WEBP_FORMAT = "webp"  # WebP for clients accepting it, source format for others
+    THUMBNAIL_FORMAT_CHOICES = [
+        (SOURCE_FORMAT, "Source"),
+        (JPEG_FORMAT, "JPEG"),
+        (WEBP_FORMAT, "WebP"),
+    ]
+
     tier_name = models.CharField(max_length=50)
     allowed_thumbnail_sizes = ArrayField(models.PositiveIntegerField())
 
     can_create_original_img_link = models.BooleanField(default=False)
     can_create_time_limited_link = models.BooleanField(default=False)
+    job_priority = models.PositiveSmallIntegerField(
+        default=0
+    )  # queued thumbnail jobs with higher priority are rendered first
+    thumbnail_format = models.CharField(
+        max_length=10, choices=THUMBNAIL_FORMAT_CHOICES, default=SOURCE_FORMAT
+    )
+    encoding_profile = models.ForeignKey(
+        EncodingProfile, null=True, blank=True, on_delete=models.SET_NULL
+    )  # API.engine encoder defaults without a profile
+    max_image_pixels = models.PositiveIntegerField(
+        null=True, blank=True
+    )  # THUMBNAIL_MAX_IMAGE_PIXELS when empty
+    max_render_memory = models.PositiveBigIntegerField(
+        null=True, blank=True
+    )  # bytes, RENDER_MAX_MEMORY when empty
 
     def __str__(self):
         return f"{self.tier_name}"
 
+    @property
+    def stored_thumbnail_format(self):
+        """Format thumbnail files are stored in, None lets encoder pick it by transparency"""
+        return self.JPEG_FORMAT if self.thumbnail_format == self.JPEG_FORMAT else None
+
+    @property
+    def pixel_budget(self) -> int:
+        """Most pixels a source of thumbnails may have, see API.sandbox"""
+        return self.max_image_pixels or settings.THUMBNAIL_MAX_IMAGE_PIXELS
+
+    @property
+    def memory_budget(self) -> int:
+        """Bytes memory of a render process may grow by, see API.sandbox"""
+        return self.max_render_memory or settings.RENDER_MAX_MEMORY
+
 
 class APIUser(AbstractUser):
     account_type = models.ForeignKey(
@@ -39,6 +134,240 @@ class APIUser(AbstractUser):
         return f"{self.username}"
 
 
+class ImageCollectionQuerySet(models.QuerySet):
+    def bump(self, user_ids):
+        """Stores new versions of image collections of users, in one upsert"""
+        modified = timezone.now()
+        self.bulk_create(
+            [
+                ImageCollection(
+                    owner_id=user_id, version=uuid.uuid4().hex, modified=modified
+                )
+                # users might be gone, with their images
+                for user_id in APIUser.objects.filter(id__in=user_ids).values_list(
+                    "id", flat=True
+                )
+            ],
+            update_conflicts=True,
+            unique_fields=["owner"],
+            update_fields=["version", "modified"],
+        )
+
+    def bump_on_commit(self, user_ids):
+        """
+        Bumps versions of users once the current transaction commits, so a new
+        version is never seen together with data from before the change.
+        Owners changed by a transaction are bumped by a single query.
+        """
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        _changed_collections.__dict__.setdefault("user_ids", set()).update(user_ids)
+        transaction.on_commit(self.bump_changed)
+
+    def bump_changed(self):
+        # owners of rolled back changes are bumped too, which is merely unnecessary
+        user_ids = _changed_collections.__dict__.pop("user_ids", None)
+        if user_ids:
+            self.bump(user_ids)
+
+
+class ImageCollection(models.Model):
+    """
+    Version of images of a user, replaced after every change of them, see
+    API.collection_versions. Users without a row had no change since it was added.
+    """
+
+    owner = models.OneToOneField(
+        APIUser, on_delete=models.CASCADE, related_name="image_collection"
+    )
+    version = models.CharField(max_length=32)
+    modified = models.DateTimeField()
+
+    objects = ImageCollectionQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.owner_id} {self.version}"
+
+
+class ImageQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, reserved_slugs=(), **kwargs):
+        """
+        Inserts images in one statement, giving new slugs to colliding ones,
+        except for reserved_slugs, see insert_with_unique_slugs.
+        Uploads of already stored content reuse the stored file.
+        """
+        objs = list(objs)
+        for image in objs:
+            set_image_model_slug(image)
+            set_image_expiry(image)
+            set_image_content_hash(image)
+        # bulk_create sends no post_save, see API.signals
+        ImageCollection.objects.bump_on_commit(image.owner_id for image in objs)
+        with transaction.atomic(savepoint=False):
+            self.reuse_stored_originals(objs)
+            return insert_with_unique_slugs(
+                lambda: super(ImageQuerySet, self).bulk_create(objs, *args, **kwargs),
+                objs,
+                reserved=set(reserved_slugs),
+            )
+
+    def originals(self):
+        return self.filter(thumbnail_size__isnull=True)
+
+    def active(self):
+        """Images without expire time, or with expire time still in the future"""
+        return self.filter(Q(expires_at__isnull=True) | Q(expires_at__gt=Now()))
+
+    def with_thumbnails(self, active=False):
+        """
+        Prefetches thumbnails rendered from the images, smallest first, in a single query
+        :param active: prefetch only thumbnails that haven't expired
+        """
+        thumbnails = Image.objects.order_by("thumbnail_size", "id")
+        if active:
+            thumbnails = thumbnails.active()
+        return self.prefetch_related(models.Prefetch("thumbnails", thumbnails))
+
+    def expired(self):
+        """Time limited images past their expire time, uses image_expires_at_idx"""
+        return self.filter(expires_at__lte=Now())
+
+    def reuse_stored_originals(self, images):
+        """
+        Points new uploads at the file of a stored original with the same content
+        hash, so duplicates are neither written to storage, nor read for metadata.
+        Only images without expire time share their files, see image_content_hash_idx.
+        Matched rows are locked until the transaction inserting the uploads commits,
+        so delete_with_files of them waits, and then sees the file still referenced.
+        Has to run inside of that transaction.
+        :param images: Image objects, uploads are those with uncommitted files
+        """
+        uploads = [
+            image
+            for image in images
+            if image.content_hash and not getattr(image.image, "_committed", True)
+        ]
+        if not uploads:
+            return
+
+        stored = {}
+        for row in (
+            self.originals()
+            .filter(
+                expire_time__isnull=True,
+                content_hash__in={image.content_hash for image in uploads},
+            )
+            .order_by("id")
+            .select_for_update()
+            .values("content_hash", *STORED_FILE_FIELDS)
+        ):
+            stored.setdefault(row.pop("content_hash"), row)
+
+        for image in uploads:
+            fields = stored.get(image.content_hash)
+            if fields is None:
+                metrics.increment("dedup_misses")
+                continue
+            metrics.increment("dedup_hits")
+            for field, value in fields.items():
+                setattr(image, field, value)
+
+    def reuse_stored_thumbnails(
+        self, formats: dict, sizes, profile=None, lock=False
+    ) -> dict:
+        """
+        Looks up thumbnails already rendered from content with given hashes,
+        so only sizes that are missing have to be rendered.
+        Lookup before rendering is unlocked, and has to be repeated with lock inside
+        of transaction inserting the thumbnails, like reuse_stored_originals - matched
+        rows stay locked until it commits, so delete_with_files of them waits.
+        Sizes that disappeared in between are not in the locked result.
+        :param formats: dict mapping content hash to stored format the thumbnails
+        need to have, see API.rendering.stored_thumbnail_format
+        :param profile: EncodingProfile of tier owning the thumbnails
+        :param lock: lock matched rows, only locked lookups count as reused
+        :return: dict mapping (content hash, size) to Image field values of thumbnail file
+        """
+        formats = {
+            content_hash: stored_format
+            for content_hash, stored_format in formats.items()
+            if content_hash and stored_format
+        }
+        if not formats or not sizes:
+            return {}
+
+        queryset = self.filter(
+            expire_time__isnull=True,
+            content_hash__in=formats,
+            thumbnail_size__in=sizes,
+            format__in=set(formats.values()),
+            lazy=False,
+            owner__account_type__encoding_profile=profile,
+        ).order_by("id")
+        if lock:
+            # rows of owner and tier are joined only for filtering
+            queryset = queryset.select_for_update(of=("self",))
+
+        stored = {}
+        for row in queryset.values(
+            "content_hash", "thumbnail_size", *STORED_FILE_FIELDS
+        ):
+            if row["format"] != formats[row["content_hash"]]:
+                continue
+            stored.setdefault((row.pop("content_hash"), row.pop("thumbnail_size")), row)
+        if lock:
+            metrics.increment("dedup_thumbnails_reused", len(stored))
+        return stored
+
+    def delete_with_files(self, delete_files=None) -> int:
+        """
+        Deletes images together with thumbnails rendered from them, see Image.source,
+        and their files after commit, unless other rows still reference them.
+        :param delete_files: callable receiving names of files of deleted rows,
+        delete_unreferenced_files by default
+        :return: number of deleted rows
+        """
+        rows = list(self.values_list("id", "image"))
+        parent_ids = [image_id for image_id, _ in rows]
+        while (
+            parent_ids
+        ):  # thumbnails can be made of thumbnails, e.g. time limited ones
+            children = list(
+                self.model.objects.filter(source_id__in=parent_ids).values_list(
+                    "id", "image"
+                )
+            )
+            rows += children
+            parent_ids = [image_id for image_id, _ in children]
+        if not rows:
+            return 0
+
+        deleted, _ = self.model.objects.filter(
+            id__in=[image_id for image_id, _ in rows]
+        ).delete()
+        names = [name for _, name in rows]
+        delete_files = delete_files or self.model.objects.delete_unreferenced_files
+        transaction.on_commit(lambda: delete_files(names))
+        return deleted
+
+    def delete_unreferenced_files(self, names) -> int:
+        """
+        Deletes stored files, unless an image row still refers to them.
+        Duplicate uploads share files, so a file goes away with the last of its rows.
+        :return: number of deleted files
+        """
+        referenced = set(self.filter(image__in=names).values_list("image", flat=True))
+        deleted = 0
+        for name in set(names) - referenced:
+            try:
+                default_storage.delete(name)
+                deleted += 1
+            except OSError:
+                logger.exception("Image file %s could not be deleted", name)
+        return deleted
+
+
 class Image(models.Model):
     owner = models.ForeignKey(APIUser, on_delete=models.CASCADE)
     thumbnail_size = models.PositiveIntegerField(
@@ -46,9 +375,13 @@ class Image(models.Model):
     )  # blank for original imgs
     image = models.ImageField(
         upload_to=user_directory_path,
-        validators=[validate_image_type],
+        validators=[validate_image_type, validate_image_dimensions],
     )
-    slug = models.SlugField(max_length=15, blank=True)
+    slug = models.SlugField(max_length=15, unique=True)
+    width = models.PositiveIntegerField(blank=True, null=True)
+    height = models.PositiveIntegerField(blank=True, null=True)
+    file_size = models.PositiveBigIntegerField(blank=True, null=True)  # bytes
+    format = models.CharField(max_length=10, blank=True)
     expire_time = models.IntegerField(
         default=None,
         blank=True,
@@ -59,82 +392,327 @@ class Image(models.Model):
         ],
     )
     created = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField(blank=True, null=True)  # set from expire_time
+    content_hash = models.CharField(
+        max_length=64, blank=True
+    )  # SHA-256 of uploaded file, for thumbnails - of their source file
+    lazy = models.BooleanField(
+        default=False
+    )  # thumbnail not rendered yet, image is its source, see API.derived_cache
+    source = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="thumbnails",
+    )  # image the thumbnail was rendered from, empty for originals and when it's not kept
+
+    objects = ImageQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # keyset pagination of image list, see API.pagination
+            models.Index(fields=["owner", "id"], name="image_owner_id_idx"),
+            models.Index(
+                fields=["owner", "id"],
+                condition=Q(thumbnail_size__isnull=True),
+                name="image_owner_originals_idx",
+            ),
+            models.Index(
+                fields=["owner", "thumbnail_size", "id"], name="image_owner_size_idx"
+            ),
+            # expiry checks and expired images reaper, see API.reaper
+            models.Index(
+                fields=["expires_at"],
+                condition=Q(expires_at__isnull=False),
+                name="image_expires_at_idx",
+            ),
+            # stored files reused by duplicate uploads, see reuse_stored_originals
+            models.Index(
+                fields=["content_hash", "thumbnail_size"],
+                condition=Q(expire_time__isnull=True),
+                name="image_content_hash_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{os.path.basename(self.image.url)}"
 
     def save(self, *args, **kwargs):
         set_image_model_slug(self)
-        super().save(*args, **kwargs)
+        if not self._state.adding:
+            set_image_file_metadata(self)
+            set_image_expiry(self)
+            super().save(*args, **kwargs)
+            return
+
+        # stored original reused by the upload stays locked until it's inserted
+        with transaction.atomic(savepoint=False):
+            set_image_content_hash(self)
+            Image.objects.reuse_stored_originals([self])
+            set_image_file_metadata(self)
+            set_image_expiry(self)
+            insert_with_unique_slugs(
+                lambda: super(Image, self).save(*args, **kwargs), [self]
+            )
 
     @property
-    def is_expired(self):
-        tz = timezone(TIME_ZONE)
-        date_now = tz.localize(datetime.now())
-        date_created = self.created
+    def dimensions(self) -> str:
+        """
+        Image size as WIDTHxHEIGHT string. File is opened only for rows that are
+        still missing stored metadata, see backfill_image_metadata command.
+        """
+        if self.width is None:
+            return f"{self.image.width}x{self.image.height}"
+        return f"{self.width}x{self.height}"
+
+    def delete_with_file(self):
+        """
+        Deletes the row with its thumbnails, and their files after commit,
+        unless other rows reference them
+        """
+        Image.objects.filter(pk=self.pk).delete_with_files()
+        self.pk = None
 
-        if not self.expire_time:
-            return False
-        if date_now > date_created + timedelta(seconds=self.expire_time):
-            return True
-        return False
+    @property
+    def is_expired(self):
+        return self.expires_at is not None and self.expires_at <= timezone.now()
 
     def get_url(self, request: HttpRequest):
         return request.get_host() + "/i/" + self.slug + "/"
 
-    def make_thumbnails(self, owner: APIUser, request: Request) -> dict:
+    def create_thumbnails(
+        self,
+        owner: APIUser,
+        slugs: dict = None,
+        progress=None,
+        lazy=False,
+        sizes: list = None,
+    ) -> list:
         """
         Bulk creates thumbnails for specified original image and its owner.
+        Sizes already rendered from the same content are reused instead of rendered.
+        With lazy, missing sizes aren't rendered, but left for first view of their slug.
+        Rendering runs under budget of owners tier, see API.sandbox - RenderError is raised
+        when the image breaks it.
         If users tier can't grab original images, will delete original image after making thumbnails
         owner - APIUser model instance, that submited the image for thumbnail creation
-        request - request object from DRF view
+        slugs - optional dict of pre-assigned slugs, with thumbnail size as string key,
+        IntegrityError is raised when one of them is already taken
+        progress - optional callable, receives number of thumbnails stored so far
+        lazy - if true, rows of missing sizes point at original file, see API.derived_cache
+        sizes - optional subset of sizes allowed by owners tier to create
         """
+        slugs = slugs or {}
         possible_thumbnail_sizes = owner.account_type.allowed_thumbnail_sizes
+        if sizes is not None:
+            possible_thumbnail_sizes = [
+                size for size in possible_thumbnail_sizes if size in sizes
+            ]
+        output_format = owner.account_type.stored_thumbnail_format
+        profile = owner.account_type.encoding_profile
 
-        thumbnails_to_be_bulk_created = []
-        response_thumbnails = {"thumbnails": {}}
+        formats = {
+            self.content_hash: stored_thumbnail_format(self.image, output_format)
+        }
+        keep_original = owner.account_type.can_create_original_img_link
+
+        def render_missing(sizes):
+            if lazy:
+                check_pixel_budget(self.image, owner.account_type.pixel_budget)
+                return {
+                    size: {"image": self.image.name, "width": size, "height": size}
+                    for size in sizes
+                }
+            return render_thumbnails_limited(
+                self.image,
+                sizes,
+                owner.account_type,
+                progress=progress,
+                output_format=output_format,
+                profile=profile,
+            )
+
+        stored_thumbnails = Image.objects.reuse_stored_thumbnails(
+            formats, possible_thumbnail_sizes, profile
+        )
+        rendered_thumbnails = render_missing(
+            [
+                size
+                for size in possible_thumbnail_sizes
+                if (self.content_hash, size) not in stored_thumbnails
+            ]
+        )
+
+        with transaction.atomic(savepoint=False):
+            stored_thumbnails = Image.objects.reuse_stored_thumbnails(
+                formats,
+                [
+                    size
+                    for size in possible_thumbnail_sizes
+                    if size not in rendered_thumbnails
+                ],
+                profile,
+                lock=True,
+            )
+            # stored thumbnails deleted since the unlocked lookup
+            rendered_thumbnails.update(
+                render_missing(
+                    [
+                        size
+                        for size in possible_thumbnail_sizes
+                        if size not in rendered_thumbnails
+                        and (self.content_hash, size) not in stored_thumbnails
+                    ]
+                )
+            )
 
-        for index, size in enumerate(possible_thumbnail_sizes):
-            options = {"size": (size, size), "upscale": True, "crop": True}
-            thumbnail = get_thumbnailer(self.image).get_thumbnail(options)
-            thumbnails_to_be_bulk_created.append(
-                Image(
+            thumbnails_to_be_bulk_created = []
+            for size in possible_thumbnail_sizes:
+                thumbnail = Image(
                     owner=owner,
                     thumbnail_size=size,
-                    image=str(thumbnail),
+                    slug=slugs.get(str(size), ""),
+                    content_hash=self.content_hash,
+                    lazy=lazy and size in rendered_thumbnails,
+                    source=self if keep_original else None,
+                    **(
+                        rendered_thumbnails.get(size)
+                        or stored_thumbnails[(self.content_hash, size)]
+                    ),
                 )
-            )
+                thumbnails_to_be_bulk_created.append(thumbnail)
 
-            current_image = thumbnails_to_be_bulk_created[index]
-            set_image_model_slug(current_image)
-            response_thumbnails["thumbnails"][
-                current_image.thumbnail_size
-            ] = current_image.get_url(request)
+            if not keep_original:
+                self.delete_with_file()
+            return Image.objects.bulk_create(
+                thumbnails_to_be_bulk_created, reserved_slugs=slugs.values()
+            )
 
-        if not owner.account_type.can_create_original_img_link:
-            self.delete()
-        else:
+    def make_thumbnails(self, owner: APIUser, request: Request, lazy=False) -> dict:
+        """
+        Creates thumbnails using create_thumbnails, and returns their urls
+        request - request object from DRF view
+        lazy - leave rendering to first view of each thumbnail
+        """
+        response_thumbnails = {"thumbnails": {}}
+        for thumbnail in self.create_thumbnails(owner, lazy=lazy):
             response_thumbnails["thumbnails"][
-                f"{self.image.width}x{self.image.height}"
-            ] = self.get_url(request)
+                thumbnail.thumbnail_size
+            ] = thumbnail.get_url(request)
 
-        Image.objects.bulk_create(thumbnails_to_be_bulk_created)
+        if owner.account_type.can_create_original_img_link:
+            response_thumbnails["thumbnails"][self.dimensions] = self.get_url(request)
         return response_thumbnails
 
     def make_time_limited_thumbnail(
         self, owner: APIUser, request: Request, expire_time: int, size: int
     ) -> dict:
-        options = {"size": (size, size), "upscale": True, "crop": True}
-        thumbnail = get_thumbnailer(self.image).get_thumbnail(options)
-
-        time_limited_img = Image.objects.create(
-            owner=owner,
-            thumbnail_size=size,
-            image=str(thumbnail),
-            expire_time=expire_time,
-        )
+        output_format = owner.account_type.stored_thumbnail_format
+        profile = owner.account_type.encoding_profile
+        formats = {
+            self.content_hash: stored_thumbnail_format(self.image, output_format)
+        }
+
+        def render_missing():
+            return render_thumbnails_limited(
+                self.image,
+                [size],
+                owner.account_type,
+                output_format=output_format,
+                profile=profile,
+            )[size]
+
+        thumbnail = None
+        if (self.content_hash, size) not in Image.objects.reuse_stored_thumbnails(
+            formats, [size], profile
+        ):
+            thumbnail = render_missing()
+
+        with transaction.atomic(savepoint=False):
+            if thumbnail is None:
+                thumbnail = Image.objects.reuse_stored_thumbnails(
+                    formats, [size], profile, lock=True
+                ).get((self.content_hash, size))
+            if thumbnail is None:
+                # stored thumbnail deleted since the unlocked lookup
+                thumbnail = render_missing()
+
+            time_limited_img = Image.objects.create(
+                owner=owner,
+                thumbnail_size=size,
+                expire_time=expire_time,
+                content_hash=self.content_hash,
+                source=self,
+                **thumbnail,
+            )
         response_thumbnails_data = {}
         response_thumbnails_data["img_url"] = (
             request.get_host() + "/i/" + time_limited_img.slug + "/"
         )
+        response_thumbnails_data["signed_url"] = request.get_host() + sign_path(
+            time_limited_img.image.name, time_limited_img.expires_at
+        )
         return response_thumbnails_data
+
+
+class ThumbnailJob(models.Model):
+    """
+    Thumbnails of an uploaded original, queued for rendering outside of request.
+    Jobs are processed by the process_thumbnail_jobs management command.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    owner = models.ForeignKey(APIUser, on_delete=models.CASCADE)
+    source = models.ForeignKey(
+        Image, null=True, blank=True, on_delete=models.SET_NULL
+    )  # emptied when original gets deleted after rendering
+    priority = models.PositiveSmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    slugs = models.JSONField(default=dict)  # pre-assigned slug for each size
+    progress = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                F("priority").desc(),
+                "id",
+                condition=Q(status="pending"),
+                name="thumbnailjob_pending_idx",
+            ),
+            # stale running jobs, see API.jobs.claim_next_job
+            models.Index(
+                fields=["started"],
+                condition=Q(status="running"),
+                name="thumbnailjob_running_idx",
+            ),
+            # finished jobs past retention, see API.reaper
+            models.Index(
+                fields=["finished"],
+                condition=Q(status__in=["done", "failed"]),
+                name="thumbnailjob_finished_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.id} {self.status}"
+
+    def get_thumbnail_urls(self, request: HttpRequest) -> dict:
+        return {
+            size: request.get_host() + "/i/" + slug + "/"
+            for size, slug in self.slugs.items()
+        }
@@ -0,0 +1,16 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class ImageCursorPagination(CursorPagination):
+    """
+    Keyset pagination over owners images, newest first. Cursor holds last seen id,
+    so every page is a single index range scan, no matter how deep it is.
+    """
+
+    ordering = "-id"
+    page_size_query_param = "page_size"
+
+    def __init__(self):
+        self.page_size = settings.THUMBNAIL_LIST_PAGE_SIZE
+        self.max_page_size = settings.THUMBNAIL_LIST_MAX_PAGE_SIZE
@@ -0,0 +1,100 @@
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from API import metrics
+from API.models import Image, ThumbnailJob
+
+
+def delete_unreferenced_files(names):
+    """Deletes files of reaped rows, unless another image row still points at them"""
+    deleted = Image.objects.delete_unreferenced_files(names)
+    metrics.increment("reaper_files_deleted", deleted)
+    return deleted
+
+
+def reap_expired_batch(batch_size: int) -> int:
+    """
+    Deletes up to batch_size expired images, oldest expiry first, thumbnails
+    rendered from them, and their files.
+    Rows are locked with SKIP LOCKED, so reapers on several nodes take disjoint
+    batches. Files are deleted only after rows deletion is committed.
+    :return: number of deleted rows
+    """
+    with transaction.atomic():
+        ids = list(
+            Image.objects.expired()
+            .select_for_update(skip_locked=True)
+            .order_by("expires_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        deleted = Image.objects.filter(id__in=ids).delete_with_files(
+            delete_unreferenced_files
+        )
+
+    metrics.increment("reaper_rows_deleted", deleted)
+    metrics.increment("reaper_batches")
+    return deleted
+
+
+def reap_finished_jobs_batch(batch_size: int) -> int:
+    """
+    Deletes up to batch_size done or failed thumbnail jobs, which finished more
+    than THUMBNAIL_JOB_RETENTION ago, oldest first. Locked like reap_expired_batch.
+    :return: number of deleted jobs
+    """
+    finished_before = timezone.now() - settings.THUMBNAIL_JOB_RETENTION
+    with transaction.atomic():
+        ids = list(
+            ThumbnailJob.objects.filter(
+                status__in=[ThumbnailJob.DONE, ThumbnailJob.FAILED],
+                finished__lt=finished_before,
+            )
+            .select_for_update(skip_locked=True)
+            .order_by("finished")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        deleted, _ = ThumbnailJob.objects.filter(id__in=ids).delete()
+
+    metrics.increment("reaper_jobs_deleted", deleted)
+    return deleted
+
+
+def run_batches(reap_batch, batch_size: int, max_batches: int = None) -> dict:
+    """
+    Runs batches until nothing is left to delete, or max_batches were run
+    :param reap_batch: callable deleting up to batch_size rows, returning their number
+    :return: dict with number of deleted rows, batches and rows per second
+    """
+    started = time.monotonic()
+    rows = batches = 0
+    while max_batches is None or batches < max_batches:
+        deleted = reap_batch(batch_size)
+        if not deleted:
+            break
+        rows += deleted
+        batches += 1
+
+    elapsed = time.monotonic() - started
+    return {
+        "rows": rows,
+        "batches": batches,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else 0,
+    }
+
+
+def reap_expired(batch_size: int, max_batches: int = None) -> dict:
+    """Deletes expired images in batches, see run_batches"""
+    return run_batches(reap_expired_batch, batch_size, max_batches)
+
+
+def reap_finished_jobs(batch_size: int, max_batches: int = None) -> dict:
+    """Deletes thumbnail jobs past retention in batches, see run_batches"""
+    return run_batches(reap_finished_jobs_batch, batch_size, max_batches)
@@ -0,0 +1,375 @@
+import os
+import tempfile
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image as PILImage
+
+from API.engine import (
+    EXIF_ORIENTATION,
+    FORMAT_EXTENSIONS,
+    apply_orientation,
+    colorspace,
+    image_format,
+    is_transparent,
+    read_orientation,
+    save_image,
+    scale_and_crop,
+    thumbnail_name,
+)
+
+# thumbnail file rendered in memory, image is the PIL image it was encoded from
+RenderedThumbnail = namedtuple("RenderedThumbnail", "name data image")
+
+# Source is pre-shrunk with cheap integer box reduction only while it stays at
+# least this many times bigger than the largest thumbnail, LANCZOS does the rest.
+REDUCE_OVERSAMPLING = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def decode_source(source_file, largest_size: int) -> PILImage.Image:
+    """
+    Opens and decodes source image a single time.
+    JPEG sources are decoded in draft mode, so decoder scales DCT blocks down
+    instead of producing full resolution bitmap when thumbnails are much smaller.
+    Other formats are reduced by an integer factor right after decoding.
+    EXIF orientation is read from the file before that, and applied to the result.
+    :param source_file: django File/FieldFile of the original image
+    :param largest_size: biggest thumbnail side that will be derived from the image
+    """
+    source_file.open("rb")
+    source_file.seek(0)
+    image = PILImage.open(source_file)
+    orientation = read_orientation(image)
+
+    if image.format == "JPEG":
+        width, height = image.size
+        scale = largest_size / min(width, height)
+        if scale < 1:
+            image.draft(
+                image.mode, (round(width * scale) + 1, round(height * scale) + 1)
+            )
+
+    image.load()  # truncated files raise OSError, and are rejected
+
+    factor = min(image.size) // (largest_size * REDUCE_OVERSAMPLING)
+    if factor >= 2:
+        image = image.reduce(factor)
+
+    image = apply_orientation(image, orientation)
+    return colorspace(image)
+
+
+def prepare_sources(source_file, sizes):
+    """
+    Decodes the source once, and renders the largest thumbnail from it.
+    Every other size is derived from the largest, already downscaled, thumbnail,
+    unless it had to be upscaled - then decoded source is used instead.
+    :return: tuple of sizes sorted from largest, shared source and largest thumbnail
+    """
+    unique_sizes = sorted(set(sizes), reverse=True)
+    decoded = decode_source(source_file, unique_sizes[0])
+    largest = scale_and_crop(decoded, unique_sizes[0])
+    source = largest if min(decoded.size) >= unique_sizes[0] else decoded
+    return unique_sizes, source, largest
+
+
+def render_images(source_file, sizes) -> dict:
+    """
+    Renders square thumbnails of all given sizes from one decode of the source.
+    :return: dict mapping thumbnail size to PIL image
+    """
+    if not sizes:
+        return {}
+
+    unique_sizes, source, largest = prepare_sources(source_file, sizes)
+    rendered = {unique_sizes[0]: largest}
+    for size in unique_sizes[1:]:
+        rendered[size] = scale_and_crop(source, size)
+    return rendered
+
+
+def get_render_executor():
+    """
+    Process wide thread pool for resizing, encoding and writing thumbnails.
+    Pillow releases GIL while doing that, so sizes are rendered on multiple cores.
+    :return: ThreadPoolExecutor, or None if THUMBNAIL_RENDER_WORKERS disables the pool
+    """
+    global _executor
+    if settings.THUMBNAIL_RENDER_WORKERS <= 1:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_RENDER_WORKERS,
+                thread_name_prefix="thumbnail-render",
+            )
+    return _executor
+
+
+def reset_render_executor():
+    """Forked processes don't inherit threads of the pool, so they start their own"""
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=reset_render_executor)
+
+
+def map_bounded(function, items, limit: int):
+    """
+    Works like map, but runs function on render pool, with at most limit
+    items of this call in flight at once. Results keep the order of items.
+    """
+    executor = get_render_executor()
+    if executor is None or limit <= 1:
+        yield from map(function, items)
+        return
+
+    in_flight = deque()
+    for item in items:
+        if len(in_flight) >= limit:
+            yield in_flight.popleft().result()
+        in_flight.append(executor.submit(function, item))
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def upright_exif(exif: bytes) -> bytes:
+    """:return: EXIF with orientation tag reset to normal, for already transposed pixels"""
+    if not exif:
+        return exif
+    tags = PILImage.Exif()
+    tags.load(exif)
+    if tags.get(EXIF_ORIENTATION, 1) == 1:
+        return exif
+    tags[EXIF_ORIENTATION] = 1
+    return tags.tobytes()
+
+
+def save_with_profile(image: PILImage.Image, image_format: str, profile) -> bytes:
+    """
+    Encodes image with settings of an EncodingProfile. Metadata is left out when
+    profile strips it, otherwise ICC profile and EXIF of the source are kept, with
+    orientation reset, as pixels are already upright.
+    :param image_format: PIL format name, e.g. JPEG, PNG or WEBP
+    """
+    if profile.strip_metadata:
+        options = {"icc_profile": None, "exif": b""}
+    else:
+        options = {
+            "icc_profile": image.info.get("icc_profile"),
+            "exif": upright_exif(image.info.get("exif", b"")),
+        }
+
+    if image_format == "JPEG":
+        if image.mode not in ("RGB", "L", "CMYK"):
+            image = image.convert("RGB")
+        options.update(
+            quality=profile.jpeg_quality,
+            progressive=profile.progressive,
+            optimize=profile.optimize,
+        )
+    elif image_format == "PNG":
+        if profile.png_colors:
+            # median cut can't quantize alpha, fast octree does it for RGBA only
+            method = PILImage.Quantize.MEDIANCUT
+            if is_transparent(image):
+                image = image.convert("RGBA")
+                method = PILImage.Quantize.FASTOCTREE
+            image = image.quantize(colors=profile.png_colors, method=method)
+        options.update(
+            compress_level=profile.png_compress_level, optimize=profile.optimize
+        )
+    elif image_format == "WEBP":
+        options.update(
+            quality=profile.webp_quality, method=6 if profile.optimize else 4
+        )
+
+    output = BytesIO()
+    image.save(output, format=image_format, **options)
+    return output.getvalue()
+
+
+def encode_thumbnail(
+    source_name: str,
+    size: int,
+    image: PILImage.Image,
+    output_format: str = None,
+    profile=None,
+) -> RenderedThumbnail:
+    """
+    Names and encodes rendered thumbnail, see API.engine.
+    :param source_name: storage path of the source, thumbnail name is derived from it
+    :param output_format: key of FORMAT_EXTENSIONS, None picks JPEG or PNG by transparency
+    :param profile: EncodingProfile of owners tier, None uses encoder defaults
+    """
+    name = thumbnail_name(
+        source_name,
+        size,
+        transparent=is_transparent(image),
+        output_format=output_format,
+        profile_id=profile.pk if profile is not None else None,
+    )
+    if profile is None:
+        data = save_image(image, image_format(name))
+    else:
+        data = save_with_profile(image, image_format(name), profile)
+    return RenderedThumbnail(name, data, image)
+
+
+def encode_single_thumbnail(
+    source_file, source_name: str, size: int, output_format: str = None, profile=None
+):
+    """
+    Renders and encodes one thumbnail in memory, like write_thumbnails would,
+    without writing it to storage or touching the database.
+    :param source_file: open django File of the source image
+    :param source_name: storage path of the source, thumbnail name is derived from it
+    :param output_format: key of FORMAT_EXTENSIONS, None picks JPEG or PNG by transparency
+    :param profile: EncodingProfile of owners tier, None uses encoder defaults
+    :return: tuple of encoded bytes and file extension of the thumbnail
+    """
+    image = render_images(source_file, [size])[size]
+    thumbnail = encode_thumbnail(source_name, size, image, output_format, profile)
+    return thumbnail.data, os.path.splitext(thumbnail.name)[1]
+
+
+def stored_thumbnail_format(source_file, output_format: str = None) -> str:
+    """
+    PIL format of thumbnails rendered from source, read from its header without
+    decoding it, so already stored thumbnails of matching format can be reused.
+    :param output_format: key of FORMAT_EXTENSIONS, None picks JPEG or PNG by transparency
+    :return: format name, e.g. JPEG, or None when the source can't be opened
+    """
+    try:
+        source_file.open("rb")
+        source_file.seek(0)
+        with PILImage.open(source_file) as image:
+            transparent = is_transparent(image)
+    except Exception:  # broken sources fail in many ways, rendering reports them
+        return None
+    return image_format(thumbnail_name(source_file.name, 0, transparent, output_format))
+
+
+def replace_file(name: str, data: bytes):
+    """
+    Writes file to storage through a temporary file renamed over its name, so
+    readers and concurrent writers of the same name never see a partial file,
+    and the name is never changed by storage to avoid a collision.
+    :param name: storage path of the file
+    """
+    path = default_storage.path(name)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as f:
+        f.write(data)
+    if default_storage.file_permissions_mode is not None:
+        os.chmod(f.name, default_storage.file_permissions_mode)
+    os.replace(f.name, path)
+
+
+def write_thumbnail(thumbnail: RenderedThumbnail):
+    """
+    Writes encoded thumbnail to storage, replacing the previous version in place,
+    as rows of duplicate uploads keep referring to the same name.
+    """
+    replace_file(thumbnail.name, thumbnail.data)
+
+
+def thumbnail_metadata(thumbnail: RenderedThumbnail) -> dict:
+    """
+    Describes written thumbnail file with Image model field values, so its
+    dimensions, byte size and format never have to be read back from storage.
+    """
+    return {
+        "image": thumbnail.name,
+        "width": thumbnail.image.width,
+        "height": thumbnail.image.height,
+        "file_size": len(thumbnail.data),
+        "format": image_format(thumbnail.name),
+    }
+
+
+def write_thumbnails(
+    source_file, sizes, limit: int, output_format: str = None, profile=None
+):
+    """
+    Renders thumbnails of all sizes and writes their files to storage, without
+    touching the database, so it can also run inside of render pool threads.
+    :param limit: number of sizes rendered at once on the render pool
+    :param output_format: key of FORMAT_EXTENSIONS, None picks JPEG or PNG by transparency
+    :param profile: EncodingProfile of owners tier, None uses encoder defaults
+    :return: generator of (size, RenderedThumbnail) tuples, largest size first
+    """
+    if not sizes:
+        return
+
+    unique_sizes, source, largest = prepare_sources(source_file, sizes)
+
+    def render(size):
+        image = largest if size == unique_sizes[0] else scale_and_crop(source, size)
+        thumbnail = encode_thumbnail(
+            source_file.name, size, image, output_format, profile
+        )
+        write_thumbnail(thumbnail)
+        return size, thumbnail
+
+    yield from map_bounded(render, unique_sizes, limit)
+
+
+def write_thumbnail_files(
+    source_file,
+    sizes,
+    limit: int,
+    output_format: str = None,
+    profile=None,
+    progress=None,
+) -> dict:
+    """
+    Writes thumbnail files like write_thumbnails, but describes them with
+    picklable Image field values only, so it can run in a render process.
+    :param progress: optional callable, receives number of thumbnails written so far
+    :return: dict mapping thumbnail size to Image field values of the thumbnail file
+    """
+    rendered = {}
+    for size, thumbnail in write_thumbnails(
+        source_file, sizes, limit, output_format, profile
+    ):
+        rendered[size] = thumbnail_metadata(thumbnail)
+        if progress:
+            progress(len(rendered))
+    return rendered
+
+
+def render_thumbnails(
+    source_file, sizes, progress=None, output_format: str = None, profile=None
+) -> dict:
+    """
+    Renders and stores thumbnails of all sizes for a source image field.
+    Resizing, encoding and writing of each size runs on the render pool, with up
+    to THUMBNAIL_RENDER_MAX_WORKERS_PER_REQUEST sizes of one source at a time.
+    :param progress: optional callable, receives number of thumbnails stored so far
+    :param output_format: key of FORMAT_EXTENSIONS, None picks JPEG or PNG by transparency
+    :param profile: EncodingProfile of owners tier, None uses encoder defaults
+    :return: dict mapping thumbnail size to Image field values of the thumbnail file
+    """
+    rendered = {}
+    for size, thumbnail in write_thumbnails(
+        source_file,
+        sizes,
+        settings.THUMBNAIL_RENDER_MAX_WORKERS_PER_REQUEST,
+        output_format,
+        profile,
+    ):
+        rendered[size] = thumbnail_metadata(thumbnail)
+        if progress:
+            progress(len(rendered))
+    return rendered
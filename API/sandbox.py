@@ -0,0 +1,202 @@
+"""
+Thumbnail rendering under pixel and memory budget of the owners account tier.
+Sources are checked against the pixel budget from their header, and rendered in
+a forked render process, which is killed once it runs longer than RENDER_TIMEOUT
+or its RSS grows by more than the memory budget. A decompression bomb fails the
+render with RenderError, reported to clients as 400, instead of taking down the
+web or job worker. Render processes only write thumbnail files, database is used
+by the parent process only.
+"""
+import multiprocessing
+import time
+
+from django.conf import settings
+from PIL import Image as PILImage
+
+from API import metrics
+from API.custom_validators import read_image_size
+from API.rendering import write_thumbnail_files
+
+# kinds of messages sent by render process
+PROGRESS = "progress"
+RESULT = "result"
+
+
+class RenderError(Exception):
+    """Thumbnails of a source could not be rendered"""
+
+
+class RenderLimitExceeded(RenderError):
+    """Source or its render broke the budget of owners tier"""
+
+
+def read_rss(pid="self", field="VmRSS") -> int:
+    """:return: resident memory of a process in bytes, 0 where /proc isn't available"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def check_pixel_budget(source_file, max_pixels: int):
+    """Raises RenderLimitExceeded if header of the source declares too many pixels"""
+    source_file.open("rb")
+    source_file.seek(0)
+    size = read_image_size(source_file)
+    source_file.seek(0)
+    if size and size[0] * size[1] > max_pixels:
+        raise RenderLimitExceeded(
+            f"Image is too large. Allowed size is {max_pixels} pixels."
+        )
+
+
+def run_render_process(connection, function, args, max_pixels, report_progress):
+    """
+    Entry point of render process. Sends (PROGRESS, done) messages while function
+    reports progress, and (RESULT, ok, result or error, peak RSS) at the end.
+    """
+    PILImage.MAX_IMAGE_PIXELS = max_pixels
+    kwargs = {}
+    if report_progress:
+        kwargs["progress"] = lambda done: connection.send((PROGRESS, done))
+    try:
+        result = (True, function(*args, **kwargs))
+    except Exception as e:
+        result = (False, f"{type(e).__name__}: {e}")
+    connection.send((RESULT,) + result + (read_rss(field="VmHWM"),))
+    connection.close()
+
+
+def run_sandboxed(
+    function, args, max_pixels: int, max_memory: int, timeout: float, progress=None
+):
+    """
+    Runs function in a forked render process and returns its result.
+    Render process is killed when it breaks the time or memory limit.
+    :param max_memory: bytes RSS of render process may grow by, over RSS at fork
+    :param timeout: seconds of wall-clock time
+    :param progress: optional callable, passed to function as progress keyword
+    argument, and called in this process with what function reports
+    """
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    baseline = read_rss()
+    process = context.Process(
+        target=run_render_process,
+        args=(sender, function, args, max_pixels, progress is not None),
+        daemon=True,
+    )
+    process.start()
+    sender.close()
+
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            if read_rss(process.pid) - baseline > max_memory:
+                metrics.increment("render_memory_kills")
+                raise RenderLimitExceeded(
+                    f"Rendering the image needs more than {max_memory // 2 ** 20} MB of memory."
+                )
+            if time.monotonic() > deadline:
+                metrics.increment("render_timeouts")
+                raise RenderLimitExceeded(
+                    f"Rendering the image took longer than {timeout} seconds."
+                )
+            if not receiver.poll(settings.RENDER_POLL_INTERVAL):
+                continue
+            try:
+                message = receiver.recv()
+            except EOFError:  # killed from outside, e.g. by OOM killer
+                process.join()
+                raise RenderError(
+                    f"Render process exited with code {process.exitcode}."
+                )
+            if message[0] == RESULT:
+                _, ok, result, peak_rss = message
+                break
+            progress(message[1])
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+    peak_memory = max(peak_rss - baseline, 0)
+    metrics.increment("render_processes")
+    metrics.increment("render_peak_memory_bytes", peak_memory)
+    metrics.maximum("render_max_peak_memory_bytes", peak_memory)
+    if not ok:
+        raise RenderError(result)
+    return result
+
+
+def run_limited(function, args, tier, progress=None):
+    """
+    Runs function under budget of given tier, in a render process unless
+    RENDER_SANDBOX disables them.
+    :param tier: AccountTier of the owner, unsaved one works for its budget fields
+    :param progress: optional callable, passed to function as progress keyword argument
+    """
+    kwargs = {} if progress is None else {"progress": progress}
+    if not settings.RENDER_SANDBOX:
+        return function(*args, **kwargs)
+    return run_sandboxed(
+        function,
+        args,
+        tier.pixel_budget,
+        tier.memory_budget,
+        settings.RENDER_TIMEOUT,
+        **kwargs,
+    )
+
+
+def write_thumbnail_files_limited(
+    source_file,
+    sizes,
+    tier,
+    limit: int,
+    output_format=None,
+    profile=None,
+    progress=None,
+) -> dict:
+    """
+    Writes thumbnail files of source under budget of given tier, see run_limited.
+    :param tier: AccountTier of the owner
+    :param limit: number of sizes rendered at once by the render process
+    :param progress: optional callable, receives number of thumbnails written so far
+    :return: dict mapping thumbnail size to Image field values of the thumbnail file
+    """
+    check_pixel_budget(source_file, tier.pixel_budget)
+    if not sizes:
+        return {}
+    return run_limited(
+        write_thumbnail_files,
+        (source_file, sizes, limit, output_format, profile),
+        tier,
+        progress,
+    )
+
+
+def render_thumbnails_limited(
+    source_file, sizes, tier, progress=None, output_format=None, profile=None
+) -> dict:
+    """
+    Renders and stores thumbnails like API.rendering.render_thumbnails, under
+    budget of given tier. Raises RenderError when they can't be rendered.
+    :param tier: AccountTier of the owner
+    :param progress: optional callable, receives number of thumbnails stored so far
+    :return: dict mapping thumbnail size to Image field values of the thumbnail file
+    """
+    return write_thumbnail_files_limited(
+        source_file,
+        sizes,
+        tier,
+        settings.THUMBNAIL_RENDER_MAX_WORKERS_PER_REQUEST,
+        output_format,
+        profile,
+        progress,
+    )
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from API.models import Image
+from API.models import Image, ThumbnailJob
 
 
 class ImageSerializer(serializers.ModelSerializer):
@@ -28,7 +28,19 @@ class ImageSerializer(serializers.ModelSerializer):
         return request.build_absolute_uri(image_url)
 
     def get_img_size(self, generated_image: Image):
-        return f"{generated_image.image.width}x{generated_image.image.height}"
+        return generated_image.dimensions
+
+
+class GroupedImageSerializer(ImageSerializer):
+    """
+    Image with thumbnails rendered from it, see Image.source. Thumbnails have to be
+    prefetched, see ImageQuerySet.with_thumbnails.
+    """
+
+    thumbnails = ImageSerializer(many=True, read_only=True)
+
+    class Meta(ImageSerializer.Meta):
+        fields = ImageSerializer.Meta.fields + ["thumbnails"]
 
 
 class TimeLimitedImageSerializer(serializers.ModelSerializer):
@@ -48,3 +60,38 @@ class TimeLimitedImageSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             "image": {"write_only": True},
         }
+
+
+class TimeLimitedLinkSerializer(serializers.Serializer):
+    """
+    Time limited thumbnail of an image user uploaded earlier, instead of a new upload.
+    Only active originals of the requesting user can be chosen.
+    """
+
+    image_id = serializers.PrimaryKeyRelatedField(queryset=Image.objects.none())
+    expire_time = serializers.IntegerField(min_value=300, max_value=30000)
+    thumbnail_size = serializers.IntegerField(min_value=50, max_value=4000)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context["request"]
+        self.fields["image_id"].queryset = (
+            Image.objects.originals().active().filter(owner=request.user)
+        )
+
+
+class ThumbnailJobSerializer(serializers.ModelSerializer):
+    """Progress of thumbnails queued with async upload mode"""
+
+    total = serializers.SerializerMethodField()
+    thumbnails = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ThumbnailJob
+        fields = ["id", "status", "progress", "total", "thumbnails", "error"]
+
+    def get_total(self, job: ThumbnailJob):
+        return len(job.slugs)
+
+    def get_thumbnails(self, job: ThumbnailJob):
+        return job.get_thumbnail_urls(self.context.get("request"))
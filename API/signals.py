@@ -0,0 +1,34 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from API import auth_cache
+from API.collection_versions import bump_versions
+from API.models import AccountTier, APIUser, Image
+from API.slug_cache import invalidate_slug
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    auth_cache.invalidate_token(instance.key)
+
+
+@receiver([post_save, post_delete], sender=APIUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    auth_cache.invalidate_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=AccountTier)
+def invalidate_cached_tier(sender, instance, **kwargs):
+    auth_cache.invalidate_tier(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Image)
+def invalidate_cached_slug(sender, instance, **kwargs):
+    if instance.slug:
+        invalidate_slug(instance.slug)
+
+
+@receiver([post_save, post_delete], sender=Image)
+def bump_collection_version(sender, instance, **kwargs):
+    bump_versions([instance.owner_id])
@@ -0,0 +1,57 @@
+"""
+Stateless signed urls of time limited images. Url carries id of the signing
+key, expiry unix timestamp, and a token with storage path of the image file,
+encrypted and authenticated with Fernet keyed from the signing key. It's served
+from the url alone, without database or cache, while storage paths, which
+deduplicated uploads of different users share, are never revealed. Keys are
+rotated by adding a new key in front of URL_SIGNING_KEYS, and removing the old
+one once urls signed with it expired.
+"""
+import base64
+import hashlib
+from datetime import datetime
+
+from cryptography.fernet import Fernet, InvalidToken
+from django.conf import settings
+from django.urls import reverse
+
+
+class InvalidSignature(Exception):
+    pass
+
+
+def get_cipher(secret: str) -> Fernet:
+    """:return: Fernet keyed from signing key secret, by its own derivation"""
+    digest = hashlib.sha256(f"signed-url:{secret}".encode()).digest()
+    return Fernet(base64.urlsafe_b64encode(digest))
+
+
+def sign_path(path: str, expires_at: datetime) -> str:
+    """
+    :param path: storage path of the image file
+    :param expires_at: moment after which url stops working
+    :return: url path of signed_image view, signed with the current key
+    """
+    key_id, secret = next(iter(settings.URL_SIGNING_KEYS.items()))
+    expires = int(expires_at.timestamp())
+    token = get_cipher(secret).encrypt(f"{expires}:{path}".encode()).decode()
+    return reverse("signed_image", args=[key_id, expires, token])
+
+
+def open_signed_path(key_id: str, expires: int, token: str) -> str:
+    """
+    :return: storage path of the image file, decrypted from token
+    :raises InvalidSignature: if key is unknown, or token wasn't issued with it
+    for given expiry
+    """
+    secret = settings.URL_SIGNING_KEYS.get(key_id)
+    if secret is None:
+        raise InvalidSignature(f"Unknown signing key {key_id}")
+    try:
+        signed = get_cipher(secret).decrypt(token.encode()).decode()
+    except InvalidToken:
+        raise InvalidSignature("Token doesn't match")
+    signed_expires, path = signed.split(":", 1)
+    if int(signed_expires) != expires:
+        raise InvalidSignature("Expiry doesn't match")
+    return path
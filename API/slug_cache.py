@@ -0,0 +1,78 @@
+"""
+Cache of slug -> SlugMetadata lookups done by public /i/<slug>/ pages.
+Unknown slugs are cached too, for a shorter time. Entries are invalidated by
+signal handlers in API.signals, and for reserved slugs by API.jobs.run_job.
+Shared level has to be a cache reachable by every node, e.g. redis or memcached,
+for invalidation to reach all of them.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+
+from API.caching import TwoLevelCache
+from API.models import Image
+
+slug_cache = TwoLevelCache(
+    "slug",
+    local_size=settings.SLUG_CACHE_LOCAL_SIZE,
+    local_ttl=settings.SLUG_CACHE_LOCAL_TTL,
+    ttl=settings.SLUG_CACHE_TTL,
+)
+
+# path - storage path of image file, source file of lazy thumbnails
+# expires_at - None for images without expire time
+# thumbnail_size - None for originals
+# lazy - thumbnail is rendered on first view, see API.derived_cache
+# thumbnail_format - output format policy of owners tier, None for originals
+# encoding_profile - id of EncodingProfile of owners tier, None for originals
+# max_image_pixels, max_render_memory - render budget of owners tier, None for
+# defaults of AccountTier, also in entries cached before they were added
+SlugMetadata = namedtuple(
+    "SlugMetadata",
+    "path expires_at thumbnail_size lazy thumbnail_format encoding_profile "
+    "max_image_pixels max_render_memory",
+    defaults=(None, None),
+)
+
+
+def load_slug_metadata(slug: str):
+    row = (
+        Image.objects.filter(slug=slug)
+        .values_list(
+            "image",
+            "expires_at",
+            "thumbnail_size",
+            "lazy",
+            "owner__account_type__thumbnail_format",
+            "owner__account_type__encoding_profile",
+            "owner__account_type__max_image_pixels",
+            "owner__account_type__max_render_memory",
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    metadata = SlugMetadata(*row)
+    if metadata.thumbnail_size is None:
+        return metadata._replace(thumbnail_format=None, encoding_profile=None)
+    return metadata
+
+
+def metadata_ttl(metadata):
+    """Unknown slugs are cached shortly, so reserved slugs start working soon"""
+    return settings.SLUG_CACHE_NEGATIVE_TTL if metadata is None else None
+
+
+def get_slug_metadata(slug: str):
+    """
+    :return: SlugMetadata, or None if there is no image with the slug.
+    Changed output format or encoding profile of a tier reaches cached entries
+    after SLUG_CACHE_TTL.
+    """
+    return slug_cache.get_or_load(
+        slug, lambda: load_slug_metadata(slug), ttl=metadata_ttl
+    )
+
+
+def invalidate_slug(slug: str):
+    slug_cache.delete(slug)
@@ -0,0 +1,79 @@
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    FileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from API.custom_validators import HEADER_READ_SIZE, read_image_size
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Uploaded file is too large."
+    default_code = "upload_too_large"
+
+
+class ImageUploadLimitHandler(FileUploadHandler):
+    """
+    Rejects uploaded files bigger than THUMBNAIL_MAX_UPLOAD_SIZE bytes, or with
+    header declaring more than THUMBNAIL_MAX_IMAGE_PIXELS pixels, while request
+    body is still being read. Chunks are passed on to the next handler, so it has
+    to be listed before the one storing files in FILE_UPLOAD_HANDLERS.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.header = b""
+        self.header_checked = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.THUMBNAIL_MAX_UPLOAD_SIZE:
+            raise UploadTooLarge(
+                f"Uploaded file is too large. Allowed size is {settings.THUMBNAIL_MAX_UPLOAD_SIZE} bytes."
+            )
+        if not self.header_checked:
+            self.header += raw_data[: HEADER_READ_SIZE - len(self.header)]
+            self.check_header()
+        return raw_data
+
+    def check_header(self):
+        size = read_image_size(BytesIO(self.header))
+        if size is None and len(self.header) < HEADER_READ_SIZE:
+            return  # header may be complete after next chunk
+
+        self.header_checked = True
+        self.header = b""
+        if size and size[0] * size[1] > settings.THUMBNAIL_MAX_IMAGE_PIXELS:
+            raise UploadTooLarge(
+                f"Image is too large. Allowed size is {settings.THUMBNAIL_MAX_IMAGE_PIXELS} pixels."
+            )
+
+    def file_complete(self, file_size):
+        return None
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams uploaded file to a temporary file, like TemporaryFileUploadHandler,
+    and computes SHA-256 of its content on the way. Hex digest is set as
+    content_hash attribute of the uploaded file, see
+    API.models.ImageQuerySet.reuse_stored_originals.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.content_hash = self.hasher.hexdigest()
+        return file
@@ -0,0 +1,68 @@
+"""
+Upload pipeline transaction. Original, its thumbnails and deletion of the
+original for tiers without original links are committed together, and files
+written for a transaction that got rolled back are deleted again.
+"""
+import logging
+import posixpath
+from contextlib import contextmanager
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from API.models import Image
+
+logger = logging.getLogger(__name__)
+
+
+def source_files(source_name: str) -> list:
+    """
+    :return: storage names of the source and of every thumbnail rendered from it,
+    found by their name prefix, see API.engine.thumbnail_name
+    """
+    directory, filename = posixpath.split(source_name)
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return [source_name] + [
+        posixpath.join(directory, name)
+        for name in files
+        if name.startswith(filename + ".")
+    ]
+
+
+def delete_rolled_back_files(source_names) -> int:
+    """
+    Deletes files of rolled back uploads - sources and their thumbnails, including
+    ones a killed render process left behind. Sources still referenced by rows,
+    i.e. files reused by duplicate uploads, are kept together with their thumbnails.
+    :return: number of deleted files
+    """
+    referenced = set(
+        Image.objects.filter(image__in=source_names).values_list("image", flat=True)
+    )
+    names = [
+        name
+        for source_name in set(source_names) - referenced
+        for name in source_files(source_name)
+    ]
+    return Image.objects.delete_unreferenced_files(names)
+
+
+@contextmanager
+def atomic_upload():
+    """
+    Transaction of a whole upload. Yields a list, to which storage names of
+    uploaded originals are added - when the block raises, they are deleted
+    with their thumbnails after rollback.
+    """
+    source_names = []
+    try:
+        with transaction.atomic():
+            yield source_names
+    except Exception:
+        if source_names:
+            deleted = delete_rolled_back_files(source_names)
+            logger.info("Deleted %s files of rolled back upload", deleted)
+        raise
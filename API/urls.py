@@ -2,11 +2,17 @@ from django.urls import include, path
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from rest_framework.routers import DefaultRouter
 
-from .views import ImageUploadView, TimeLimitedThumbnailView
+from .views import (
+    ImageUploadView,
+    MetricsView,
+    ThumbnailJobView,
+    TimeLimitedThumbnailView,
+)
 
 router = DefaultRouter()
 router.register("all", ImageUploadView, basename="all")
 router.register("timed", TimeLimitedThumbnailView, basename="timed")
+router.register("jobs", ThumbnailJobView, basename="jobs")
 
 api_v1 = "v1"
 
@@ -14,6 +20,7 @@ urlpatterns = [
     path(f"{api_v1}/thumbnails/", include(router.urls), name="thumbnail"),
     path(f"{api_v1}/auth/", include("djoser.urls.authtoken")),
     path(f"{api_v1}/auth/", include("djoser.urls.jwt")),
+    path(f"{api_v1}/metrics/", MetricsView.as_view({"get": "list"}), name="metrics"),
     path(f"{api_v1}/schema/", SpectacularAPIView.as_view(), name="schema"),
     path(
         f"{api_v1}/schema/swagger-ui/",
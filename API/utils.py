@@ -1,9 +1,12 @@
-import jwt
+import hashlib
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from django.utils.crypto import get_random_string
-from rest_framework.authtoken.models import Token
+from PIL import Image as PILImage
 
-from API import models
-from ThumbnailAPI.settings import SECRET_KEY
+SLUG_LENGTH = 15
 
 
 def user_directory_path(instance, filename):
@@ -15,31 +18,109 @@ def user_directory_path(instance, filename):
     return "user_{0}/{1}".format(instance.owner.id, filename)
 
 
-def set_image_model_slug(image, max_tries=10):
+def set_image_model_slug(image):
     """
-    Generates and sets unique slug
+    Sets random slug, unless image already has one. No query is made, uniqueness
+    is guaranteed by unique index on slug, see insert_with_unique_slugs.
     :param obj: object of GeneratedImage model
     """
     if not image.slug:
-        image.slug = get_random_string(15)
-
-    attempt = 0
-    while models.Image.objects.filter(slug=image.slug).count() != 0:
-        image.slug = get_random_string(15)
-        attempt += 1
-        if attempt >= 10:
-            raise Exception(
-                f"Failed to generate unique slug for image {str(max_tries)} times."
+        image.slug = get_random_string(SLUG_LENGTH)
+
+
+def set_image_expiry(image):
+    """
+    Sets expires_at of time limited image, once, from its expire_time in seconds
+    :param image: object of Image model
+    """
+    if image.expire_time and image.expires_at is None:
+        image.expires_at = timezone.now() + timedelta(seconds=image.expire_time)
+
+
+def insert_with_unique_slugs(insert, images, max_tries=10, reserved=()):
+    """
+    Runs insert of images in a savepoint. When it fails on an integrity error,
+    slugs already taken by stored rows, or repeated among images, are replaced
+    by new random ones and insert is retried. Other errors are raised.
+    :param insert: callable doing single INSERT statement of given images
+    :param images: list of Image model objects with slugs already set
+    :param reserved: slugs whose urls were already handed out, e.g. by ThumbnailJob -
+    their collision raises the integrity error instead of replacing them
+    :return: result of insert callable
+    """
+    model = type(images[0])
+    for attempt in range(max_tries):
+        try:
+            with transaction.atomic():
+                return insert()
+        except IntegrityError:
+            if attempt + 1 >= max_tries:
+                raise
+            slugs = [image.slug for image in images]
+            taken = set(
+                model.objects.filter(slug__in=slugs).values_list("slug", flat=True)
             )
+            collided = False
+            for image in images:
+                if image.slug in taken:
+                    if image.slug in reserved:
+                        raise
+                    image.slug = get_random_string(SLUG_LENGTH)
+                    collided = True
+                taken.add(image.slug)
+            if not collided:
+                raise
+
+
+def read_image_metadata(file) -> dict:
+    """
+    Reads dimensions and format of image from its header, and byte size of file
+    :param file: django File positioned at the start of image data
+    :return: dict of Image model field values
+    """
+    with PILImage.open(file) as image:
+        metadata = {
+            "width": image.width,
+            "height": image.height,
+            "format": image.format,
+        }
+    metadata["file_size"] = file.size
+    return metadata
+
+
+def set_image_file_metadata(image):
+    """
+    Stores dimensions, byte size and format of newly uploaded image file on its model,
+    so listing images doesn't need to open their files.
+    :param image: object of Image model, with file that is not saved to storage yet
+    """
+    if image.width is not None or getattr(image.image, "_committed", True):
+        return
+
+    upload = image.image.file
+    upload.seek(0)
+    for field, value in read_image_metadata(upload).items():
+        setattr(image, field, value)
+    upload.seek(0)
 
 
-def get_token_user_id(request):
-    """Helper function to be used in view. Gets user id using JWT or DRF auth token"""
-    request_token = request.META.get("HTTP_AUTHORIZATION", " ").split(" ")
+def set_image_content_hash(image):
+    """
+    Stores SHA-256 of newly uploaded image file on its model. Digest computed by
+    HashingTemporaryFileUploadHandler while the upload streamed in is used when
+    present, other uploads are hashed here.
+    :param image: object of Image model, with file that is not saved to storage yet
+    """
+    if image.content_hash or getattr(image.image, "_committed", True):
+        return
 
-    if request_token[0] == "Bearer":
-        data = jwt.decode(jwt=request_token[1], key=SECRET_KEY, algorithms=["HS256"])
-        token_user_id = data["user_id"]
-    elif request_token[0] == "Token":
-        token_user_id = Token.objects.get(key=request_token[1]).user_id
-    return token_user_id
+    upload = image.image.file
+    content_hash = getattr(upload, "content_hash", None)
+    if content_hash is None:
+        hasher = hashlib.sha256()
+        upload.seek(0)
+        for chunk in upload.chunks():
+            hasher.update(chunk)
+        upload.seek(0)
+        content_hash = hasher.hexdigest()
+    image.content_hash = content_hash
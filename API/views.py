@@ -1,13 +1,29 @@
+from django.conf import settings
+from django.db import transaction
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiExample, OpenApiParameter, extend_schema
 from rest_framework import status, viewsets
 from rest_framework.authtoken.admin import User
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
-from API.models import APIUser, Image
-from API.serializers import ImageSerializer, TimeLimitedImageSerializer
-from API.utils import get_token_user_id
+from API import metrics
+from API.batch import create_batch
+from API.collection_versions import add_validators, conditional_response, get_validators
+from API.jobs import enqueue_thumbnail_job
+from API.models import Image, ThumbnailJob
+from API.pagination import ImageCursorPagination
+from API.sandbox import RenderError
+from API.serializers import (
+    GroupedImageSerializer,
+    ImageSerializer,
+    ThumbnailJobSerializer,
+    TimeLimitedImageSerializer,
+    TimeLimitedLinkSerializer,
+)
+from API.uploads import atomic_upload
 
 
 class ImageUploadView(viewsets.ViewSet):
@@ -20,23 +36,103 @@ class ImageUploadView(viewsets.ViewSet):
     permission_classes = (IsAuthenticated,)
 
     @extend_schema(  # drf-spectacular documentation extension
-        responses={200: OpenApiTypes.OBJECT, 401: OpenApiTypes.OBJECT},
+        parameters=[
+            OpenApiParameter(
+                name="cursor",
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description="Opaque cursor taken from next or previous url of a page",
+            ),
+            OpenApiParameter(
+                name="page_size",
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description="Number of images per page, 50 by default, 500 at most",
+            ),
+            OpenApiParameter(
+                name="originals",
+                type=OpenApiTypes.BOOL,
+                location=OpenApiParameter.QUERY,
+                description="Pass true to list only original images",
+            ),
+            OpenApiParameter(
+                name="thumbnail_size",
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description="List only thumbnails of this size",
+            ),
+            OpenApiParameter(
+                name="active",
+                type=OpenApiTypes.BOOL,
+                location=OpenApiParameter.QUERY,
+                description="Pass true to skip expired time limited images",
+            ),
+            OpenApiParameter(
+                name="grouped",
+                type=OpenApiTypes.BOOL,
+                location=OpenApiParameter.QUERY,
+                description="Pass true to list thumbnails nested under the image they were "
+                "rendered from, instead of as separate items",
+            ),
+        ],
+        responses={
+            200: OpenApiTypes.OBJECT,
+            304: None,
+            400: OpenApiTypes.OBJECT,
+            401: OpenApiTypes.OBJECT,
+        },
         examples=[
             OpenApiExample(
                 "200 OK",
-                description="Get all owned images.",
-                value=[
-                    {
-                        "id": 1,
-                        "img_url": "localhost:1337/i/fsomeCslug3aoqA/",
-                        "img_size": "720x619",
-                    },
-                    {
-                        "id": 2,
-                        "img_url": "localhost:1337/i/fsomeCslug3qwer/",
-                        "img_size": "200x200",
-                    },
-                ],
+                description="Get a page of owned images, newest first.",
+                value={
+                    "next": "localhost:1337/api/v1/image/?cursor=cD0xOQ%3D%3D",
+                    "previous": None,
+                    "results": [
+                        {
+                            "id": 2,
+                            "img_url": "localhost:1337/i/fsomeCslug3qwer/",
+                            "img_size": "200x200",
+                        },
+                        {
+                            "id": 1,
+                            "img_url": "localhost:1337/i/fsomeCslug3aoqA/",
+                            "img_size": "720x619",
+                        },
+                    ],
+                },
+                response_only=True,
+                status_codes=["200"],
+            ),
+            OpenApiExample(
+                "400 Invalid filter",
+                description="Response when thumbnail_size filter is not a number",
+                value={"thumbnail_size": ["A valid integer is required."]},
+                response_only=True,
+                status_codes=["400"],
+            ),
+            OpenApiExample(
+                "200 OK grouped",
+                description="Get a page of owned images with grouped=true, thumbnails are nested "
+                "under their original.",
+                value={
+                    "next": None,
+                    "previous": None,
+                    "results": [
+                        {
+                            "id": 1,
+                            "img_url": "localhost:1337/i/fsomeCslug3aoqA/",
+                            "img_size": "720x619",
+                            "thumbnails": [
+                                {
+                                    "id": 2,
+                                    "img_url": "localhost:1337/i/fsomeCslug3qwer/",
+                                    "img_size": "200x200",
+                                }
+                            ],
+                        }
+                    ],
+                },
                 response_only=True,
                 status_codes=["200"],
             ),
@@ -52,11 +148,44 @@ class ImageUploadView(viewsets.ViewSet):
     def list(self, request):
         """
         Lists all images and related thumbnails for specific user. Auth or JWT token is required.
+        With grouped, thumbnails are listed under the image they were rendered from.
+        Responses carry ETag and Last-Modified, unless active images are listed, as
+        those change with time.
         """
-        token_user_id = get_token_user_id(request)
-        queryset = Image.objects.filter(owner=token_user_id)
-        serializer = ImageSerializer(queryset, many=True, context={"request": request})
-        return Response(serializer.data)
+        active = request.query_params.get("active") in ("1", "true")
+        validators = None
+        if not active:
+            validators = get_validators(request, request.user)
+            response = conditional_response(request, *validators)
+            if response is not None:
+                return response
+
+        queryset = Image.objects.filter(owner=request.user)
+        serializer_class = ImageSerializer
+
+        if request.query_params.get("originals") in ("1", "true"):
+            queryset = queryset.originals()
+        if active:
+            queryset = queryset.active()
+        if request.query_params.get("grouped") in ("1", "true"):
+            queryset = queryset.filter(source__isnull=True).with_thumbnails(active)
+            serializer_class = GroupedImageSerializer
+        thumbnail_size = request.query_params.get("thumbnail_size")
+        if thumbnail_size is not None:
+            if not thumbnail_size.isdigit():
+                return Response(
+                    {"thumbnail_size": ["A valid integer is required."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            queryset = queryset.filter(thumbnail_size=int(thumbnail_size))
+
+        paginator = ImageCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = serializer_class(page, many=True, context={"request": request})
+        response = paginator.get_paginated_response(serializer.data)
+        if validators is not None:
+            add_validators(response, *validators)
+        return response
 
     @extend_schema(  # drf-spectacular documentation extension
         parameters=[
@@ -69,6 +198,7 @@ class ImageUploadView(viewsets.ViewSet):
         ],
         responses={
             200: OpenApiTypes.OBJECT,
+            304: None,
             401: OpenApiTypes.OBJECT,
             404: OpenApiTypes.OBJECT,
         },
@@ -86,6 +216,13 @@ class ImageUploadView(viewsets.ViewSet):
                     "id": 1,
                     "img_url": "localhost:1337/i/someQWERTYUslug/",
                     "img_size": "720x619",
+                    "thumbnails": [
+                        {
+                            "id": 2,
+                            "img_url": "localhost:1337/i/someASDFGHJslug/",
+                            "img_size": "200x200",
+                        }
+                    ],
                 },
                 response_only=True,
                 status_codes=["200"],
@@ -108,19 +245,68 @@ class ImageUploadView(viewsets.ViewSet):
     )
     def retrieve(self, request, pk=None):
         """
-        Display information about specific uploaded image
+        Display information about specific uploaded image, with thumbnails rendered from it
         """
-        token_user_id = get_token_user_id(request)
+        validators = get_validators(request, request.user)
+        response = conditional_response(request, *validators)
+        if response is not None:
+            return response
 
         try:
-            queryset = Image.objects.get(owner=token_user_id, id=pk)
+            queryset = Image.objects.with_thumbnails().get(owner=request.user, id=pk)
         except Image.DoesNotExist:
             return Response(
                 {"detail": "Item not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = ImageSerializer(queryset, context={"request": request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer = GroupedImageSerializer(queryset, context={"request": request})
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        return add_validators(response, *validators)
+
+    @extend_schema(  # drf-spectacular documentation extension
+        parameters=[
+            OpenApiParameter(
+                name="id",
+                location=OpenApiParameter.PATH,
+                description="ID number of image passed through url",
+                required=True,
+            )
+        ],
+        responses={
+            204: None,
+            401: OpenApiTypes.OBJECT,
+            404: OpenApiTypes.OBJECT,
+        },
+        examples=[
+            OpenApiExample(
+                "401 No authorization provided",
+                description="Response when user does not provide token or jwt token in request header",
+                value={"detail": "Authentication credentials were not provided."},
+                response_only=True,
+                status_codes=["401"],
+            ),
+            OpenApiExample(
+                "404 thumbnail not found",
+                description="Response when image with id does not exist or is not owned by user.",
+                value={"detail": "Item not found"},
+                response_only=True,
+                status_codes=["404"],
+            ),
+        ],
+    )
+    def destroy(self, request, pk=None):
+        """
+        Deletes uploaded image together with all thumbnails rendered from it, and their files
+        """
+        with transaction.atomic():
+            deleted = Image.objects.filter(
+                owner=request.user, id=pk
+            ).delete_with_files()
+        if not deleted:
+            return Response(
+                {"detail": "Item not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @extend_schema(  # drf-spectacular documentation extension
         parameters=[
@@ -129,10 +315,23 @@ class ImageUploadView(viewsets.ViewSet):
                 location=OpenApiParameter.QUERY,
                 description="attached image",
                 required=True,
-            )
+            ),
+            OpenApiParameter(
+                name="async",
+                location=OpenApiParameter.QUERY,
+                description="true to queue thumbnail rendering and get response immediately",
+                required=False,
+            ),
+            OpenApiParameter(
+                name="lazy",
+                location=OpenApiParameter.QUERY,
+                description="true to render each thumbnail on first view of its url, instead of during upload",
+                required=False,
+            ),
         ],
         responses={
             201: OpenApiTypes.OBJECT,
+            202: OpenApiTypes.OBJECT,
             400: OpenApiTypes.OBJECT,
             401: OpenApiTypes.OBJECT,
         },
@@ -160,6 +359,27 @@ class ImageUploadView(viewsets.ViewSet):
                 response_only=True,
                 status_codes=["201"],
             ),
+            OpenApiExample(
+                "202 Thumbnails queued",
+                description="Response in async mode. Thumbnail urls are reserved, and become available "
+                "once job reported under status_url is done.",
+                value={
+                    "id": 1,
+                    "img_url": "localhost:1337/i/someQWEslugRT/",
+                    "img_size": "720x619",
+                    "thumbnails": {
+                        "200": "localhost:1337/i/someASDslugRT/",
+                        "400": "localhost:1337/i/someZXCslugRT/",
+                    },
+                    "job": {
+                        "id": 1,
+                        "status": "pending",
+                        "status_url": "http://localhost:1337/api/v1/thumbnails/jobs/1/",
+                    },
+                },
+                response_only=True,
+                status_codes=["202"],
+            ),
             OpenApiExample(
                 "400 No image parameter",
                 description="Response when 'image' parameter is not included.",
@@ -167,6 +387,16 @@ class ImageUploadView(viewsets.ViewSet):
                 response_only=True,
                 status_codes=["400"],
             ),
+            OpenApiExample(
+                "400 Render budget exceeded",
+                description="Response when image breaks pixel or memory budget of account tier, "
+                "or its rendering times out.",
+                value={
+                    "image": ["Image is too large. Allowed size is 64000000 pixels."]
+                },
+                response_only=True,
+                status_codes=["400"],
+            ),
             OpenApiExample(
                 "401",
                 description="Response when user does not provide token or jwt token in request header, required to authorize and identify him.",
@@ -177,22 +407,149 @@ class ImageUploadView(viewsets.ViewSet):
         ],
     )
     def create(self, request):
-        token_user_id = get_token_user_id(request)
-        token_user = APIUser.objects.get(id=token_user_id)
+        user = request.user
 
         serializer = ImageSerializer(data=request.data, context={"request": request})
         serializer.is_valid(raise_exception=True)
-        serializer.save(owner=token_user)
 
-        user = APIUser.objects.select_related("account_type").get(id=token_user_id)
-        original_img = Image.objects.filter(owner=token_user_id).latest("id")
+        lazy = settings.THUMBNAIL_LAZY_RENDERING or request.query_params.get(
+            "lazy"
+        ) in ("1", "true")
+        try:
+            with atomic_upload() as uploaded:
+                original_img = serializer.save(owner=user)
+                uploaded.append(original_img.image.name)
+
+                if request.query_params.get("async") in ("1", "true"):
+                    return self.queue_thumbnails(
+                        request, serializer, original_img, user
+                    )
 
-        response_thumbnails = original_img.make_thumbnails(user, request)
+                response_thumbnails = original_img.make_thumbnails(
+                    user, request, lazy=lazy
+                )
+        except RenderError as e:
+            return Response({"image": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
 
         updated_serializer_data = serializer.data
         updated_serializer_data.update(response_thumbnails)
         return Response(updated_serializer_data, status=status.HTTP_201_CREATED)
 
+    def queue_thumbnails(self, request, serializer, original_img, user):
+        """
+        Async upload mode - original is stored, and thumbnails are left for
+        process_thumbnail_jobs worker. Response contains their reserved urls.
+        """
+        job = enqueue_thumbnail_job(original_img, user)
+
+        updated_serializer_data = serializer.data
+        updated_serializer_data["thumbnails"] = job.get_thumbnail_urls(request)
+        if user.account_type.can_create_original_img_link:
+            updated_serializer_data["thumbnails"][
+                original_img.dimensions
+            ] = original_img.get_url(request)
+        updated_serializer_data["job"] = {
+            "id": job.id,
+            "status": job.status,
+            "status_url": request.build_absolute_uri(
+                reverse("jobs-detail", args=[job.id])
+            ),
+        }
+        return Response(updated_serializer_data, status=status.HTTP_202_ACCEPTED)
+
+    @extend_schema(  # drf-spectacular documentation extension
+        parameters=[
+            OpenApiParameter(
+                name="images",
+                location=OpenApiParameter.QUERY,
+                description="attached image files, field can be repeated",
+                required=True,
+            )
+        ],
+        responses={
+            201: OpenApiTypes.OBJECT,
+            207: OpenApiTypes.OBJECT,
+            400: OpenApiTypes.OBJECT,
+            401: OpenApiTypes.OBJECT,
+        },
+        examples=[
+            OpenApiExample(
+                "request body",
+                description="Every image must be of png or jpg type. "
+                f"Up to {settings.THUMBNAIL_BATCH_MAX_FILES} files can be sent at once.",
+                value={"images": ["<attached image file>", "<attached image file>"]},
+                request_only=True,
+            ),
+            OpenApiExample(
+                "207 Some files were rejected",
+                description="Every file has its own result, in order of upload. Status is 201 if all "
+                "files were created, 400 if none were, and 207 otherwise.",
+                value={
+                    "results": [
+                        {
+                            "file": "cat.png",
+                            "status": 201,
+                            "id": 1,
+                            "img_url": "localhost:1337/i/someQWEslugRT/",
+                            "img_size": "720x619",
+                            "thumbnails": {
+                                "200": "localhost:1337/i/someASDslugRT/",
+                                "720x619": "localhost:1337/i/someQWEslugRT/",
+                            },
+                        },
+                        {
+                            "file": "notes.txt",
+                            "status": 400,
+                            "errors": {
+                                "image": ["Incorrect file type. Allowed types: jpg png"]
+                            },
+                        },
+                    ]
+                },
+                response_only=True,
+                status_codes=["207"],
+            ),
+            OpenApiExample(
+                "400 No images parameter",
+                description="Response when no file was sent, or there are too many of them.",
+                value={"images": ["No file was submitted."]},
+                response_only=True,
+                status_codes=["400"],
+            ),
+        ],
+    )
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """
+        Creates originals and thumbnails for many images sent in one request
+        """
+        files = request.FILES.getlist("images")
+        if not files:
+            return Response(
+                {"images": ["No file was submitted."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(files) > settings.THUMBNAIL_BATCH_MAX_FILES:
+            return Response(
+                {
+                    "images": [
+                        f"Upload at most {settings.THUMBNAIL_BATCH_MAX_FILES} files at once."
+                    ]
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = create_batch(request.user, files, request)
+
+        created = sum(1 for result in results if result["status"] == 201)
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created == 0:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_207_MULTI_STATUS
+        return Response({"results": results}, status=response_status)
+
 
 class TimeLimitedThumbnailView(viewsets.ViewSet):
     serializer_class = TimeLimitedImageSerializer
@@ -203,8 +560,14 @@ class TimeLimitedThumbnailView(viewsets.ViewSet):
             OpenApiParameter(
                 name="image",
                 location=OpenApiParameter.QUERY,
-                description="attached image",
-                required=True,
+                description="attached image, required unless image_id is sent",
+                required=False,
+            ),
+            OpenApiParameter(
+                name="image_id",
+                location=OpenApiParameter.QUERY,
+                description="integer, id of an image uploaded earlier, used instead of attached image",
+                required=False,
             ),
             OpenApiParameter(
                 name="thumbnail_size",
@@ -237,6 +600,17 @@ class TimeLimitedThumbnailView(viewsets.ViewSet):
                 },
                 request_only=True,
             ),
+            OpenApiExample(
+                "request body with image id",
+                description="Creates a new time limited link to an image uploaded earlier, nothing is uploaded. "
+                "Thumbnail of requested size is rendered only if it wasn't rendered from that image yet.",
+                value={
+                    "image_id": "integer",
+                    "thumbnail_size": "integer",
+                    "expire_time": "integer",
+                },
+                request_only=True,
+            ),
             OpenApiExample(
                 "201 Thumbnail created",
                 description="Example response when thumbnail gets created successfully.",
@@ -244,10 +618,33 @@ class TimeLimitedThumbnailView(viewsets.ViewSet):
                     "thumbnail_size": 50,
                     "expire_time": 300,
                     "img_url": "localhost:1337/i/someQWERTslug5T/",
+                    "signed_url": "localhost:1337/s/key1/1700000300/"
+                    "q3JzAbVYnNl0y2bZ8LCZVg/user_1/image.png.50x50_q85_crop_upscale.jpg",
                 },
                 response_only=True,
                 status_codes=["201"],
             ),
+            OpenApiExample(
+                "201 Thumbnail of uploaded image created",
+                description="Example response when link to image uploaded earlier gets created successfully.",
+                value={
+                    "image_id": 12,
+                    "thumbnail_size": 50,
+                    "expire_time": 300,
+                    "img_url": "localhost:1337/i/someQWERTslug5T/",
+                    "signed_url": "localhost:1337/s/key1/1700000300/"
+                    "q3JzAbVYnNl0y2bZ8LCZVg/user_1/image.png.50x50_q85_crop_upscale.jpg",
+                },
+                response_only=True,
+                status_codes=["201"],
+            ),
+            OpenApiExample(
+                "400 Unknown image id",
+                description="Response when image_id is not an active image of the user.",
+                value={"image_id": ['Invalid pk "12" - object does not exist.']},
+                response_only=True,
+                status_codes=["400"],
+            ),
             OpenApiExample(
                 "400 No file parameter",
                 description="Response when 'file' parameter is not included.",
@@ -285,11 +682,10 @@ class TimeLimitedThumbnailView(viewsets.ViewSet):
     )
     def create(self, request):
         """
-        Checks authorization of user, then creates a time limited thumbnail if user permission allows it
+        Checks authorization of user, then creates a time limited thumbnail if user permission allows it.
+        Thumbnail is made from attached image, or from image uploaded earlier when image_id is sent.
         """
-        token_user_id = get_token_user_id(request)
-        token_user = APIUser.objects.get(id=token_user_id)
-        user = APIUser.objects.select_related("account_type").get(id=token_user_id)
+        user = request.user
 
         if not user.account_type.can_create_time_limited_link:
             return Response(
@@ -297,20 +693,136 @@ class TimeLimitedThumbnailView(viewsets.ViewSet):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        serializer = TimeLimitedImageSerializer(
-            data=request.data, context={"request": request}
-        )
+        if "image_id" in request.data:
+            serializer = TimeLimitedLinkSerializer(
+                data=request.data, context={"request": request}
+            )
+        else:
+            serializer = TimeLimitedImageSerializer(
+                data=request.data, context={"request": request}
+            )
         serializer.is_valid(raise_exception=True)
-        serializer.save(owner=token_user)
 
-        expire_time = serializer.data["expire_time"]
-        thumbnail_size = serializer.data["thumbnail_size"]
+        try:
+            with atomic_upload() as uploaded:
+                if "image_id" in request.data:
+                    source_image = serializer.validated_data["image_id"]
+                else:
+                    source_image = serializer.save(owner=user)
+                    uploaded.append(source_image.image.name)
 
-        source_image = Image.objects.filter(owner=token_user_id).latest("id")
-        response_thumbnail = source_image.make_time_limited_thumbnail(
-            user, request, expire_time, thumbnail_size
-        )
+                response_thumbnail = source_image.make_time_limited_thumbnail(
+                    user,
+                    request,
+                    serializer.data["expire_time"],
+                    serializer.data["thumbnail_size"],
+                )
+        except RenderError as e:
+            return Response({"image": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
 
         updated_serializer_data = serializer.data
         updated_serializer_data.update(response_thumbnail)
         return Response(updated_serializer_data, status=status.HTTP_201_CREATED)
+
+
+class ThumbnailJobView(viewsets.ViewSet):
+    serializer_class = ThumbnailJobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(  # drf-spectacular documentation extension
+        parameters=[
+            OpenApiParameter(
+                name="id",
+                location=OpenApiParameter.PATH,
+                description="ID number of job returned by async upload",
+                required=True,
+            )
+        ],
+        responses={
+            200: OpenApiTypes.OBJECT,
+            401: OpenApiTypes.OBJECT,
+            404: OpenApiTypes.OBJECT,
+        },
+        examples=[
+            OpenApiExample(
+                "200 job status",
+                description="Status is one of pending, running, done or failed. "
+                "Progress is the number of already rendered thumbnails.",
+                value={
+                    "id": 1,
+                    "status": "running",
+                    "progress": 1,
+                    "total": 2,
+                    "thumbnails": {
+                        "200": "localhost:1337/i/someASDslugRT/",
+                        "400": "localhost:1337/i/someZXCslugRT/",
+                    },
+                    "error": "",
+                },
+                response_only=True,
+                status_codes=["200"],
+            ),
+            OpenApiExample(
+                "404 job not found",
+                description="Response when job with id does not exist or is not owned by user.",
+                value={"detail": "Item not found"},
+                response_only=True,
+                status_codes=["404"],
+            ),
+        ],
+    )
+    def retrieve(self, request, pk=None):
+        """
+        Display progress of thumbnails queued by async upload
+        """
+        try:
+            job = ThumbnailJob.objects.get(owner=request.user, id=pk)
+        except ThumbnailJob.DoesNotExist:
+            return Response(
+                {"detail": "Item not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        serializer = ThumbnailJobSerializer(job, context={"request": request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class MetricsView(viewsets.ViewSet):
+    """Internal counters of this API process, available to staff users only"""
+
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(  # drf-spectacular documentation extension
+        responses={
+            200: OpenApiTypes.OBJECT,
+            401: OpenApiTypes.OBJECT,
+            403: OpenApiTypes.OBJECT,
+        },
+        examples=[
+            OpenApiExample(
+                "200 metrics",
+                description="Counters of the process that handled the request.",
+                value={
+                    "auth_cache_local_hits": 120,
+                    "auth_cache_misses": 3,
+                    "auth_cache_shared_hits": 14,
+                    "dedup_hit_rate": 0.25,
+                    "dedup_hits": 4,
+                    "dedup_misses": 12,
+                },
+                response_only=True,
+                status_codes=["200"],
+            ),
+            OpenApiExample(
+                "403 not a staff user",
+                description="Response when authenticated user is not a staff member",
+                value={"detail": "You do not have permission to perform this action."},
+                response_only=True,
+                status_codes=["403"],
+            ),
+        ],
+    )
+    def list(self, request):
+        counters = metrics.snapshot()
+        # share of uploads that reused stored file of the same content
+        counters["dedup_hit_rate"] = metrics.ratio("dedup_hits", "dedup_misses")
+        return Response(counters, status=status.HTTP_200_OK)
@@ -12,6 +12,9 @@ STATIC_URL = "/static/"
 
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 MEDIA_URL = "/media/"
+# Internal nginx location serving MEDIA_ROOT, used for X-Accel-Redirect by /i/<slug>/raw.
+# When empty, Django sends files itself.
+MEDIA_ACCEL_REDIRECT_LOCATION = os.getenv("MEDIA_ACCEL_REDIRECT_LOCATION", "")
 
 TEST_API_DIR = os.path.join(BASE_DIR, "tests")
 TESTS_MEDIA_DIR = os.path.join(
@@ -27,6 +30,13 @@ AUTH_USER_MODEL = "API.APIUser"
 
 SECRET_KEY = os.getenv("SECRET_KEY", "not_safe_secret_key")
 
+# Keys of signed urls of time limited images, as "id:secret,id:secret" - first one signs
+# new urls, all of them are accepted, see API.signed_urls
+URL_SIGNING_KEYS = dict(
+    key.split(":", 1)
+    for key in os.getenv("URL_SIGNING_KEYS", f"default:{SECRET_KEY}").split(",")
+)
+
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=55),
@@ -67,7 +77,6 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-    "easy_thumbnails",  # Thumbnail generation
     "debug_toolbar",  # Development and optimization helper
     "djoser",  # Allows to send credentials to receive token required for api requests
     "drf_spectacular",  # API docs generation
@@ -85,13 +94,81 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Shared by web, job worker and reaper through the django_cache volume, so cache invalidation
+# done by any of them, e.g. of slugs of reaped images, reaches all of them
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': '/var/tmp/django_cache',
+        'LOCATION': os.getenv("DJANGO_CACHE_DIR", "/var/tmp/django_cache"),
     }
 }
 
+# Cache of token -> user and user -> account tier, see API.auth_cache
+AUTH_CACHE_TTL = 300  # seconds, shared django cache
+AUTH_CACHE_LOCAL_SIZE = 1024  # entries in per process LRU
+AUTH_CACHE_LOCAL_TTL = 5  # seconds, local entries aren't invalidated by other processes
+
+# /i/<slug>/ pages of images without expire time, time limited ones are cached until they expire
+DISPLAY_IMAGE_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+
+# slug -> (storage path, expires_at, ...) of /i/<slug>/ lookups, see API.slug_cache
+SLUG_CACHE_TTL = 24 * 60 * 60  # seconds
+SLUG_CACHE_NEGATIVE_TTL = 30  # seconds, for slugs without an image
+SLUG_CACHE_LOCAL_SIZE = 10000  # entries in per process LRU
+SLUG_CACHE_LOCAL_TTL = 5  # seconds
+
+# Concurrent cache misses of a key wait this long for the process loading it
+CACHE_SINGLE_FLIGHT_WAIT = 0.5  # seconds
+
+# Uploads are streamed to temporary files and hashed, and rejected once they exceed the limits
+FILE_UPLOAD_HANDLERS = [
+    "API.upload_handlers.ImageUploadLimitHandler",
+    "API.upload_handlers.HashingTemporaryFileUploadHandler",
+]
+THUMBNAIL_MAX_UPLOAD_SIZE = 64 * 1024 * 1024  # bytes
+THUMBNAIL_MAX_IMAGE_PIXELS = 64_000_000
+
+# Thread pool rendering thumbnail sizes in parallel, 1 renders them one by one
+THUMBNAIL_RENDER_WORKERS = int(os.getenv("THUMBNAIL_RENDER_WORKERS", os.cpu_count()))
+THUMBNAIL_RENDER_MAX_WORKERS_PER_REQUEST = 4  # sizes of one image rendered at once
+
+# Thumbnails of uploads are rendered in forked processes, killed once they run longer
+# than the timeout or their RSS grows by more than the memory budget, see API.sandbox.
+# Account tiers can override the pixel and memory budget.
+RENDER_SANDBOX = os.getenv("RENDER_SANDBOX", "true") in ("1", "true")
+RENDER_TIMEOUT = 30  # seconds
+RENDER_MAX_MEMORY = int(os.getenv("RENDER_MAX_MEMORY", 512 * 1024 * 1024))  # bytes
+RENDER_POLL_INTERVAL = 0.05  # seconds between checks of render process
+
+# Batch upload endpoint
+THUMBNAIL_BATCH_MAX_FILES = 100
+THUMBNAIL_BATCH_CONCURRENCY = 4  # images of one batch rendered at once
+
+# Image list pagination
+THUMBNAIL_LIST_PAGE_SIZE = 50
+THUMBNAIL_LIST_MAX_PAGE_SIZE = 500
+
+# Async thumbnail jobs, processed by `manage.py process_thumbnail_jobs`
+THUMBNAIL_JOB_POLL_INTERVAL = 1  # seconds
+THUMBNAIL_JOB_STALE_AFTER = timedelta(minutes=10)  # retried after, unless progressing
+THUMBNAIL_JOB_RETENTION = timedelta(days=7)  # done and failed jobs get reaped after
+
+# Lazy rendering, thumbnails are rendered on first view of their slug, see API.derived_cache.
+# Uploads use it with ?lazy=true, or always when THUMBNAIL_LAZY_RENDERING is set.
+THUMBNAIL_LAZY_RENDERING = os.getenv("THUMBNAIL_LAZY_RENDERING", "") in ("1", "true")
+DERIVED_CACHE_DIR = "derived"  # inside of MEDIA_ROOT, so nginx sends rendered files too
+DERIVED_CACHE_MAX_BYTES = int(
+    os.getenv("DERIVED_CACHE_MAX_BYTES", 1024 * 1024 * 1024)
+)  # least recently viewed files are evicted above it
+DERIVED_CACHE_LOW_WATER = 0.9  # eviction frees the cache down to this part of max bytes
+DERIVED_CACHE_TTL = 60 * 60  # seconds, (source, size) -> rendered file lookups
+DERIVED_CACHE_LOCAL_SIZE = 10000  # entries in per process LRU
+DERIVED_CACHE_LOCAL_TTL = 5  # seconds
+
+# Expired images reaper, `manage.py reap_expired_images`
+REAPER_BATCH_SIZE = 500
+REAPER_INTERVAL = 60  # seconds between runs with --loop
+
 # https://drf-spectacular.readthedocs.io/en/latest/settings.html
 SPECTACULAR_SETTINGS = {
     "SWAGGER_UI_DIST": "SIDECAR",
@@ -172,9 +249,9 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "API.authentication.TierTokenAuthentication",
         # 'rest_framework.authentication.SessionAuthentication',
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "API.authentication.TierJWTAuthentication",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
@@ -0,0 +1,123 @@
+"""
+Compares thumbnail output formats of account tiers, see AccountTier.thumbnail_format.
+Thumbnails of a photo, a screenshot-like image and a transparent image are encoded
+in source format (JPEG, or PNG for transparency), forced JPEG and WebP, and total
+bytes, saving against source format and encode CPU time of all sizes are reported.
+Profile options encode with such an EncodingProfile instead of encoder defaults.
+
+Usage: python -m benchmarks.format_benchmark [--megapixels 4] [--sizes 200 400 800]
+    [--jpeg-quality 85] [--webp-quality 80] [--progressive] [--png-colors 0]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ThumbnailAPI.settings")
+
+DEFAULT_SIZES = [200, 400, 800]
+FORMATS = [None, "jpeg", "webp"]  # None is the source format policy
+
+
+def make_source_images(directory, megapixels):
+    """Creates a noisy photo, a flat colored screenshot and a transparent png"""
+    from PIL import Image, ImageDraw
+
+    width = int((megapixels * 1_000_000 * 3 / 2) ** 0.5)
+    height = width * 2 // 3
+    noise = Image.effect_noise((width, height), 64).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    photo = Image.blend(noise, gradient, 0.5)
+
+    screenshot = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(screenshot)
+    for top in range(0, height, 40):
+        draw.rectangle((20, top + 5, width * 2 // 3, top + 25), fill=(40, 40, 40))
+        draw.rectangle((width * 3 // 4, top + 5, width - 20, top + 25), fill="#3b7dd8")
+
+    transparent = photo.convert("RGBA")
+    transparent.putalpha(Image.linear_gradient("L").resize((width, height)))
+
+    paths = {}
+    for name, image, extension in (
+        ("photo", photo, "jpg"),
+        ("screenshot", screenshot, "png"),
+        ("transparent", transparent, "png"),
+    ):
+        paths[name] = os.path.join(directory, f"{name}.{extension}")
+        image.save(paths[name])
+    return paths
+
+
+def encode_all(path, sizes, output_format, profile=None):
+    """:return: total bytes of encoded thumbnails and encoding CPU seconds"""
+    from django.core.files import File
+
+    from API.rendering import encode_thumbnail, render_images
+
+    with open(path, "rb") as f:
+        source = File(f, name=os.path.basename(path))
+        rendered = render_images(source, sizes)
+
+    total_bytes = 0
+    start = time.process_time()
+    for size, image in rendered.items():
+        thumbnail = encode_thumbnail(source.name, size, image, output_format, profile)
+        total_bytes += len(thumbnail.data)
+    return total_bytes, time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megapixels", type=float, default=4)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--jpeg-quality", type=int)
+    parser.add_argument("--webp-quality", type=int)
+    parser.add_argument("--progressive", action="store_true")
+    parser.add_argument("--png-colors", type=int)
+    args = parser.parse_args()
+    django.setup()
+
+    from API.models import EncodingProfile
+
+    profile_options = {
+        field: value
+        for field, value in (
+            ("jpeg_quality", args.jpeg_quality),
+            ("webp_quality", args.webp_quality),
+            ("progressive", args.progressive or None),
+            ("png_colors", args.png_colors),
+        )
+        if value is not None
+    }
+    profile = EncodingProfile(name="benchmark", **profile_options)
+    if not profile_options:
+        profile = None
+
+    with tempfile.TemporaryDirectory() as directory:
+        sources = make_source_images(directory, args.megapixels)
+        print(
+            f"{args.megapixels} MP source, sizes {args.sizes}, profile {profile_options}"
+        )
+        print(
+            f"{'image':<13}{'format':<8}{'bytes':>10}{'saving':>9}{'encode [ms]':>13}"
+        )
+        for name, path in sources.items():
+            source_bytes = None
+            for output_format in FORMATS:
+                total_bytes, cpu_time = encode_all(
+                    path, args.sizes, output_format, profile
+                )
+                if source_bytes is None:
+                    source_bytes = total_bytes
+                saving = 1 - total_bytes / source_bytes
+                print(
+                    f"{name:<13}{output_format or 'source':<8}{total_bytes:>10}"
+                    f"{saving:>9.1%}{cpu_time * 1000:>13.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Compares thumbnail rendering of a single upload before and after decode-once pipeline.
+"before" opens and decodes the original once per thumbnail size, like repeated
+get_thumbnailer().get_thumbnail() calls did, "after" uses API.rendering.render_images.
+Every variant runs in a fresh interpreter, so reported peak RSS is not shared between them.
+
+Usage: python -m benchmarks.render_benchmark [--megapixels 20] [--sizes 200 400 800 1200]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ThumbnailAPI.settings")
+
+DEFAULT_SIZES = [200, 400, 800, 1200]
+VARIANTS = ["before", "after"]
+
+
+def make_source_images(directory, megapixels):
+    """Creates noisy jpg and png test images of roughly given size"""
+    from PIL import Image
+
+    width = int((megapixels * 1_000_000 * 3 / 2) ** 0.5)
+    height = width * 2 // 3
+    noise = Image.effect_noise((width, height), 64).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    image = Image.blend(noise, gradient, 0.5)
+
+    paths = {}
+    for extension, options in (("jpg", {"quality": 90}), ("png", {})):
+        paths[extension] = os.path.join(directory, f"source.{extension}")
+        image.save(paths[extension], **options)
+    return paths
+
+
+def render_before(path, sizes):
+    from easy_thumbnails import engine, source_generators
+
+    for size in sizes:
+        with open(path, "rb") as f:
+            image = source_generators.pil_image(f)
+            engine.process_image(
+                image, {"size": (size, size), "upscale": True, "crop": True}
+            )
+
+
+def render_after(path, sizes):
+    from django.core.files import File
+
+    from API.rendering import render_images
+
+    with open(path, "rb") as f:
+        render_images(File(f), sizes)
+
+
+def peak_rss_mib():
+    """
+    Peak resident memory of current process. VmHWM is used when available,
+    because ru_maxrss survives exec and would report the parent's peak.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_variant(variant, path, sizes):
+    """Executed in a child process, prints cpu seconds and peak RSS in MiB"""
+    django.setup()
+    render = render_before if variant == "before" else render_after
+
+    start = time.process_time()
+    render(path, sizes)
+    cpu_time = time.process_time() - start
+    print(f"{cpu_time} {peak_rss_mib()}")
+
+
+def measure(variant, path, sizes):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.render_benchmark", "--child", variant]
+        + ["--source", path, "--sizes"]
+        + [str(size) for size in sizes],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    return float(output[-2]), float(output[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megapixels", type=float, default=20)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--child", choices=VARIANTS)
+    parser.add_argument("--source")
+    args = parser.parse_args()
+
+    if args.child:
+        run_variant(args.child, args.source, args.sizes)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        sources = make_source_images(directory, args.megapixels)
+        print(f"{args.megapixels} MP source, sizes {args.sizes}")
+        print(f"{'format':<8}{'variant':<10}{'cpu [s]':>10}{'peak RSS [MiB]':>18}")
+        for extension, path in sources.items():
+            for variant in VARIANTS:
+                cpu_time, peak_rss = measure(variant, path, args.sizes)
+                print(f"{extension:<8}{variant:<10}{cpu_time:>10.2f}{peak_rss:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ImgConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "img"
+
+    def ready(self):
+        from img import signals  # noqa: F401 - connects signal receivers
@@ -0,0 +1,53 @@
+"""
+Cache of rendered /i/<slug>/ pages. Time limited images are cached only until
+they expire, so expired image is never served from any cache.
+"""
+import time
+from email.utils import formatdate
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+def page_cache_key(slug: str) -> str:
+    return f"display_image:{slug}"
+
+
+def page_ttl(expires_at) -> int:
+    """
+    Seconds for which page of an image may be cached: configured
+    DISPLAY_IMAGE_CACHE_TTL, or remaining lifetime of time limited image if shorter.
+    Page of already expired image doesn't change anymore, so it gets the full TTL.
+    """
+    ttl = settings.DISPLAY_IMAGE_CACHE_TTL
+    if expires_at is None:
+        return ttl
+    remaining = int((expires_at - timezone.now()).total_seconds())
+    if remaining <= 0:
+        return ttl
+    return min(ttl, remaining)
+
+
+def get_cached_page(slug: str):
+    """:return: tuple of page content and cache expiry unix timestamp, or None"""
+    return cache.get(page_cache_key(slug))
+
+
+def cache_page(slug: str, content: bytes, ttl: int) -> float:
+    """:return: unix timestamp when cached page expires"""
+    cached_until = time.time() + ttl
+    cache.set(page_cache_key(slug), (content, cached_until), ttl)
+    return cached_until
+
+
+def invalidate_page(slug: str):
+    cache.delete(page_cache_key(slug))
+
+
+def set_cache_headers(response, cached_until: float):
+    """Sets Cache-Control and Expires headers, matching lifetime of cached page"""
+    max_age = max(0, int(cached_until - time.time()))
+    response["Cache-Control"] = f"public, max-age={max_age}"
+    response["Expires"] = formatdate(cached_until, usegmt=True)
+    return response
@@ -0,0 +1,60 @@
+import mimetypes
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+
+from API.models import AccountTier
+
+
+def accepts(request, media_type: str) -> bool:
+    """Checks if Accept header of request lists media type, with non zero quality"""
+    for item in request.headers.get("Accept", "").split(","):
+        accepted, *params = item.split(";")
+        if accepted.strip() != media_type:
+            continue
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def negotiate_format(request, thumbnail_format: str):
+    """
+    Picks format variant of a thumbnail for output format policy of its tier
+    and Accept header of the request.
+    :return: forced output format, or None to send the stored thumbnail format
+    """
+    if thumbnail_format == AccountTier.WEBP_FORMAT and accepts(request, "image/webp"):
+        return "webp"
+    if thumbnail_format == AccountTier.JPEG_FORMAT:
+        return "jpeg"
+    return None
+
+
+def media_file_response(path: str):
+    """
+    Response sending stored media file. With MEDIA_ACCEL_REDIRECT_LOCATION set,
+    body is left empty and nginx sends the file from its internal location,
+    otherwise file is streamed by Django, e.g. when running without nginx.
+    :param path: storage path of the file, relative to MEDIA_ROOT
+    """
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    location = settings.MEDIA_ACCEL_REDIRECT_LOCATION
+    if location:
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = quote(f"{location.rstrip('/')}/{path}")
+        return response
+
+    try:
+        file = default_storage.open(path, "rb")
+    except FileNotFoundError:
+        raise Http404("Image file not found")
+    return FileResponse(file, content_type=content_type)
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from API.models import Image
+from img.caching import invalidate_page
+
+
+@receiver([post_save, post_delete], sender=Image)
+def invalidate_cached_page(sender, instance, **kwargs):
+    if instance.slug:
+        invalidate_page(instance.slug)
@@ -1,10 +1,15 @@
 from django.conf.urls.static import static
 from django.urls import path
-from django.views.decorators.cache import cache_page
 
 from ThumbnailAPI import settings
-from img.views import DisplayImageView
+from img.views import DisplayImageView, RawImageView, SignedImageView
 
 urlpatterns = [
-    path("i/<str:slug>/",  cache_page(60*10)(DisplayImageView.as_view()), name="display_image"),
+    path("i/<str:slug>/", DisplayImageView.as_view(), name="display_image"),
+    path("i/<str:slug>/raw", RawImageView.as_view(), name="display_image_raw"),
+    path(
+        "s/<str:key_id>/<int:expires>/<str:token>",
+        SignedImageView.as_view(),
+        name="signed_image",
+    ),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,20 +1,123 @@
-from datetime import datetime, timedelta
+import logging
+import time
 
+from django.conf import settings
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    HttpResponseGone,
+)
 from django.shortcuts import render
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
 from django.views import View
-from pytz import timezone
 
-from API.models import Image
+from API.derived_cache import get_derived_image
+from API.models import AccountTier
+from API.sandbox import RenderError
+from API.signed_urls import InvalidSignature, open_signed_path
+from API.slug_cache import get_slug_metadata
+from img.caching import cache_page, get_cached_page, page_ttl, set_cache_headers
+from img.serving import media_file_response, negotiate_format
+
+logger = logging.getLogger(__name__)
+
+
+def has_expired(expires_at) -> bool:
+    return expires_at is not None and expires_at <= timezone.now()
 
 
 class DisplayImageView(View):
     def get(self, request, slug):
         """
-        Checks if image is expired, and displays image if not
+        Checks if image is expired, and displays image if not.
+        Rendered page is cached until image expires, see img.caching, and image
+        lookup itself is cached by API.slug_cache.
         :param request:
         :param slug: string identifying specific image to display
         """
+        cached = get_cached_page(slug)
+        if cached is not None:
+            content, cached_until = cached
+            return set_cache_headers(HttpResponse(content), cached_until)
+
+        metadata = get_slug_metadata(slug)
+        if metadata is None:
+            raise Http404("Image not found")
+
+        context = {
+            "image_path": reverse("display_image_raw", args=[slug]),
+            "expired": has_expired(metadata.expires_at),
+        }
+        response = render(request, "img/image.html", context=context)
+
+        cached_until = cache_page(slug, response.content, page_ttl(metadata.expires_at))
+        return set_cache_headers(response, cached_until)
+
+
+class RawImageView(View):
+    def get(self, request, slug):
+        """
+        Sends image file itself, unless image has expired. Only slug and expiry are
+        checked here, file is sent by nginx through X-Accel-Redirect, see img.serving.
+        Lazy thumbnails are rendered on first view, and thumbnails of tiers with
+        WebP policy are sent as WebP to clients accepting it, see API.derived_cache.
+        :param slug: string identifying specific image to send
+        """
+        metadata = get_slug_metadata(slug)
+        if metadata is None:
+            raise Http404("Image not found")
+
+        if has_expired(metadata.expires_at):
+            return HttpResponseGone("Image has expired")
+
+        path = metadata.path
+        output_format = negotiate_format(request, metadata.thumbnail_format)
+        if metadata.lazy or output_format == AccountTier.WEBP_FORMAT:
+            tier = AccountTier(
+                max_image_pixels=metadata.max_image_pixels,
+                max_render_memory=metadata.max_render_memory,
+            )
+            try:
+                path = get_derived_image(
+                    path,
+                    metadata.thumbnail_size,
+                    output_format,
+                    metadata.encoding_profile,
+                    tier,
+                )
+            except FileNotFoundError:
+                raise Http404("Image file not found")
+            except RenderError as e:
+                if metadata.lazy:
+                    return HttpResponseBadRequest(str(e))
+                # stored thumbnail is sent in its own format instead of WebP
+                logger.warning("WebP variant of %s failed to render: %s", path, e)
+
+        response = media_file_response(path)
+        if metadata.thumbnail_format == AccountTier.WEBP_FORMAT:
+            patch_vary_headers(response, ["Accept"])
+        return set_cache_headers(response, time.time() + page_ttl(metadata.expires_at))
+
+
+class SignedImageView(View):
+    def get(self, request, key_id, expires, token):
+        """
+        Sends image file of a signed url, see API.signed_urls. Token and expiry
+        are checked, and the file is found, from the url alone, without database
+        or cache lookups.
+        """
+        try:
+            path = open_signed_path(key_id, expires, token)
+        except InvalidSignature:
+            return HttpResponseForbidden("Invalid signature")
+
+        if expires <= time.time():
+            return HttpResponseGone("Image has expired")
 
-        image = Image.objects.get(slug=slug)
-        context = {"image_path": image.image.url, "expired": image.is_expired}
-        return render(request, "img/image.html", context=context)
+        response = media_file_response(path)
+        cached_until = min(expires, time.time() + settings.DISPLAY_IMAGE_CACHE_TTL)
+        return set_cache_headers(response, cached_until)
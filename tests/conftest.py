@@ -3,12 +3,24 @@ import shutil
 from random import randint
 
 import pytest
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
+from API import metrics
+from API.auth_cache import identity_cache
+from API.derived_cache import derived_cache
 from API.models import AccountTier, APIUser
+from API.slug_cache import slug_cache
 from ThumbnailAPI.settings import TEST_API_DIR, TESTS_MEDIA_DIR
-from tests.constants import TEST_USER_LOGIN, TEST_USER_PASS
+from tests.constants import (
+    CONTENT_TYPE_PNG,
+    ENDPOINT_ALL,
+    TEST_IMAGE_PATH_A,
+    TEST_USER_LOGIN,
+    TEST_USER_PASS,
+)
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -26,6 +38,16 @@ def setup_and_teardown():
             shutil.rmtree(directory)
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Every test starts with empty caches and zeroed metrics"""
+    cache.clear()
+    identity_cache.local.clear()
+    slug_cache.local.clear()
+    derived_cache.local.clear()
+    metrics.reset()
+
+
 @pytest.fixture
 def test_client(user, authorization_header=True):
     """
@@ -101,3 +123,36 @@ def enterprise_user(db, enterprise_tier) -> APIUser:
     )
     token = Token.objects.create(user=user)
     return {"user": user, "token": token}
+
+
+@pytest.fixture
+def upload(client):
+    """
+    Posts image file as multipart upload of a user
+    :return: callable(user, path, endpoint, content, client, **data) returning response.
+    path defaults to test image A, endpoint to ENDPOINT_ALL, content replaces file
+    content, client replaces pytest-django client, and data is sent with the image.
+    """
+
+    def post(
+        user,
+        path=TEST_IMAGE_PATH_A,
+        endpoint=ENDPOINT_ALL,
+        content=None,
+        client=client,
+        **data,
+    ):
+        if content is None:
+            with open(path, "rb") as file:
+                content = file.read()
+        image = SimpleUploadedFile(
+            name=os.path.basename(path), content=content, content_type=CONTENT_TYPE_PNG
+        )
+        return client.post(
+            endpoint,
+            data={"image": image, **data},
+            HTTP_AUTHORIZATION=f"Token {user['token']}",
+            format="multipart",
+        )
+
+    return post
@@ -25,6 +25,9 @@ TEST_IMAGE_PATH_JPG = os.path.join(
 TEST_IMAGE_PATH_BMP = os.path.join(
     os.getcwd(), "tests", "helper_files", "test_image_e.bmp"
 )
+TEST_IMAGE_PATH_ROTATED = os.path.join(
+    os.getcwd(), "tests", "helper_files", "test_image_f_rotated.png"
+)  # 1600x800 pixels, dark on the left, with EXIF orientation 6
 MOCK_WRONG_FILE_TYPE_PATH = os.path.join(
     os.getcwd(), "tests", "helper_files", "test_text.txt"
 )
@@ -35,3 +38,6 @@ CONTENT_TYPE_PNG = "image/png"
 CONTENT_TYPE_DEFAULT = "text/plain"
 TESTS_MEDIA_ROOT = os.path.join(BASE_DIR, "tests", "tests_media")
 TESTS_MEDIA_URL = "/tests_media/"
+ENDPOINT_JOBS = "/api/v1/thumbnails/jobs/"
+ENDPOINT_BATCH = "/api/v1/thumbnails/all/batch/"
+ENDPOINT_METRICS = "/api/v1/metrics/"
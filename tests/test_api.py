@@ -1,21 +1,27 @@
 import json
 import os
+from datetime import timedelta
 
 import pytest
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import override_settings
+from django.utils import timezone
 
-from API.models import Image
+from API.jobs import claim_next_job, run_job
+from API.models import Image, ThumbnailJob
 from tests.constants import (
     CONTENT_TYPE_DEFAULT,
     CONTENT_TYPE_PNG,
     ENDPOINT_ALL,
+    ENDPOINT_BATCH,
+    ENDPOINT_JOBS,
     ENDPOINT_TIMED,
     MOCK_WRONG_FILE_TYPE_PATH,
     TEST_IMAGE_PATH_A,
     TEST_IMAGE_PATH_B,
     TEST_IMAGE_PATH_BMP,
     TEST_IMAGE_PATH_C,
+    TEST_MEDIA_IMAGE_PATH_A,
     TESTS_MEDIA_ROOT,
     TESTS_MEDIA_URL,
 )
@@ -60,10 +66,10 @@ def test_all_list_endpoint_receive_correct_response(
     assert post_1_basic_user.status_code == 201
     assert post_2_basic_user.status_code == 201
     assert response.status_code == 200
-    assert len(json_dict) == 2
-    assert len(json_dict[0].keys()) == 3
-    assert len(json_dict[1].keys()) == 3
-    assert "http" in json_dict[0]["img_url"]
+    assert len(json_dict["results"]) == 2
+    assert len(json_dict["results"][0].keys()) == 3
+    assert len(json_dict["results"][1].keys()) == 3
+    assert "http" in json_dict["results"][0]["img_url"]
 
 
 @override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
@@ -86,7 +92,89 @@ def test_all_list_endpoint_can_see_only_own_images(basic_user, enterprise_user,
     json_dict = json.loads(response.content)
 
     assert response.status_code == 200
-    assert len(json_dict) == 0
+    assert len(json_dict["results"]) == 0
+
+
+def create_listed_images(owner, count, **fields):
+    return Image.objects.bulk_create(
+        Image(
+            owner=owner, image=TEST_MEDIA_IMAGE_PATH_A, width=840, height=680, **fields
+        )
+        for _ in range(count)
+    )
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_all_list_endpoint_paginates_with_cursor(basic_user, client):
+    create_listed_images(basic_user["user"], 5)
+    auth = f"Token {basic_user['token']}"
+
+    first_page = client.get(ENDPOINT_ALL, {"page_size": 3}, HTTP_AUTHORIZATION=auth)
+    first_dict = json.loads(first_page.content)
+    second_page = client.get(first_dict["next"], HTTP_AUTHORIZATION=auth)
+    second_dict = json.loads(second_page.content)
+
+    first_ids = [image["id"] for image in first_dict["results"]]
+    second_ids = [image["id"] for image in second_dict["results"]]
+    assert first_page.status_code == 200
+    assert second_page.status_code == 200
+    assert len(first_ids) == 3
+    assert len(second_ids) == 2
+    assert first_ids + second_ids == sorted(first_ids + second_ids, reverse=True)
+    assert second_dict["next"] is None
+    assert second_dict["previous"] is not None
+
+
+@override_settings(
+    MEDIA_URL=TESTS_MEDIA_URL,
+    MEDIA_ROOT=TESTS_MEDIA_ROOT,
+    THUMBNAIL_LIST_PAGE_SIZE=2,
+    THUMBNAIL_LIST_MAX_PAGE_SIZE=3,
+)
+def test_all_list_endpoint_limits_page_size(basic_user, client):
+    create_listed_images(basic_user["user"], 5)
+    auth = f"Token {basic_user['token']}"
+
+    default_page = client.get(ENDPOINT_ALL, HTTP_AUTHORIZATION=auth)
+    capped_page = client.get(ENDPOINT_ALL, {"page_size": 100}, HTTP_AUTHORIZATION=auth)
+
+    assert len(json.loads(default_page.content)["results"]) == 2
+    assert len(json.loads(capped_page.content)["results"]) == 3
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_all_list_endpoint_filters(basic_user, client):
+    owner = basic_user["user"]
+    (original,) = create_listed_images(owner, 1)
+    (small,) = create_listed_images(owner, 1, thumbnail_size=200)
+    (big,) = create_listed_images(owner, 1, thumbnail_size=400)
+    (expired,) = create_listed_images(owner, 1, thumbnail_size=200, expire_time=300)
+    Image.objects.filter(id=expired.id).update(
+        expires_at=timezone.now() - timedelta(seconds=1)
+    )
+    auth = f"Token {basic_user['token']}"
+
+    def listed_ids(params):
+        response = client.get(ENDPOINT_ALL, params, HTTP_AUTHORIZATION=auth)
+        assert response.status_code == 200
+        return {image["id"] for image in json.loads(response.content)["results"]}
+
+    assert listed_ids({"originals": "true"}) == {original.id}
+    assert listed_ids({"thumbnail_size": 200}) == {small.id, expired.id}
+    assert listed_ids({"thumbnail_size": 200, "active": "true"}) == {small.id}
+    assert listed_ids({"active": "1"}) == {original.id, small.id, big.id}
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_all_list_endpoint_rejects_invalid_thumbnail_size(basic_user, client):
+    response = client.get(
+        ENDPOINT_ALL,
+        {"thumbnail_size": "big"},
+        HTTP_AUTHORIZATION=f"Token {basic_user['token']}",
+    )
+
+    assert response.status_code == 400
+    assert "thumbnail_size" in json.loads(response.content)
 
 
 @override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
@@ -112,7 +200,7 @@ def test_all_detail_endpoint_can_correctly_view_created_img_detail(
     response_dict = json.loads(get_1.content)
 
     assert get_1.status_code == 200
-    assert len(response_dict) == 3
+    assert len(response_dict) == 4
 
 
 @override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
@@ -226,7 +314,105 @@ def test_timed_endpoint_creating_timed_img_response(enterprise_user, client):
 
     assert enterprise_user_response.status_code == 201
     assert timed_image.expire_time is not None
-    assert len(response_dict) == 3
+    assert len(response_dict) == 4
+    assert "/s/" in response_dict["signed_url"]
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_timed_endpoint_reuses_thumbnail_of_uploaded_image(enterprise_user, client):
+    mock_image = SimpleUploadedFile(
+        name=os.path.basename(TEST_IMAGE_PATH_A),
+        content=open(TEST_IMAGE_PATH_A, "rb").read(),
+        content_type=CONTENT_TYPE_PNG,
+    )
+    client.post(
+        ENDPOINT_ALL,
+        data={"image": mock_image},
+        HTTP_AUTHORIZATION=f"Token {enterprise_user['token']}",
+        format="multipart",
+    )
+    original = Image.objects.originals().get()
+    thumbnail = Image.objects.get(thumbnail_size=200)
+
+    response = client.post(
+        ENDPOINT_TIMED,
+        data={"image_id": original.id, "thumbnail_size": 200, "expire_time": 300},
+        HTTP_AUTHORIZATION=f"Token {enterprise_user['token']}",
+        format="multipart",
+    )
+    response_dict = json.loads(response.content.decode("utf8"))
+    timed_image = Image.objects.latest("id")
+
+    assert response.status_code == 201
+    assert response_dict["image_id"] == original.id
+    assert Image.objects.count() == 4
+    assert timed_image.image.name == thumbnail.image.name
+    assert timed_image.expires_at is not None
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_timed_endpoint_renders_missing_size_of_uploaded_image(enterprise_user, client):
+    original = Image.objects.create(
+        owner=enterprise_user["user"],
+        image=SimpleUploadedFile(
+            name=os.path.basename(TEST_IMAGE_PATH_A),
+            content=open(TEST_IMAGE_PATH_A, "rb").read(),
+            content_type=CONTENT_TYPE_PNG,
+        ),
+    )
+
+    response = client.post(
+        ENDPOINT_TIMED,
+        data={"image_id": original.id, "thumbnail_size": 100, "expire_time": 300},
+        HTTP_AUTHORIZATION=f"Token {enterprise_user['token']}",
+        format="multipart",
+    )
+    timed_image = Image.objects.latest("id")
+
+    assert response.status_code == 201
+    assert Image.objects.count() == 2
+    assert timed_image.thumbnail_size == 100
+    assert timed_image.dimensions == "100x100"
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_timed_endpoint_rejects_image_id_of_other_user(
+    enterprise_user, premium_user, client
+):
+    other_image = Image.objects.create(
+        owner=premium_user["user"], image=TEST_MEDIA_IMAGE_PATH_A
+    )
+
+    response = client.post(
+        ENDPOINT_TIMED,
+        data={"image_id": other_image.id, "thumbnail_size": 100, "expire_time": 300},
+        HTTP_AUTHORIZATION=f"Token {enterprise_user['token']}",
+        format="multipart",
+    )
+
+    assert response.status_code == 400
+    assert "image_id" in json.loads(response.content.decode("utf8"))
+    assert Image.objects.count() == 1
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_timed_endpoint_rejects_image_id_of_thumbnail(enterprise_user, client):
+    thumbnail = Image.objects.create(
+        owner=enterprise_user["user"],
+        image=TEST_MEDIA_IMAGE_PATH_A,
+        thumbnail_size=200,
+    )
+
+    response = client.post(
+        ENDPOINT_TIMED,
+        data={"image_id": thumbnail.id, "thumbnail_size": 100, "expire_time": 300},
+        HTTP_AUTHORIZATION=f"Token {enterprise_user['token']}",
+        format="multipart",
+    )
+
+    assert response.status_code == 400
+    assert "image_id" in json.loads(response.content.decode("utf8"))
+    assert Image.objects.count() == 1
 
 
 @override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
@@ -378,3 +564,196 @@ def test_all_endpoint_check_validation_for_unsupported_image_type(basic_user, cl
     assert len(json_dict) == 1
     assert "image" in json_dict.keys()
     assert "Incorrect file type. Allowed types" in json_dict["image"][0]
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_all_endpoint_async_upload_queues_thumbnails(premium_user, client):
+    mock_image_a = SimpleUploadedFile(
+        name=os.path.basename(TEST_IMAGE_PATH_A).split("/")[-1],
+        content=open(TEST_IMAGE_PATH_A, "rb").read(),
+        content_type=CONTENT_TYPE_PNG,
+    )
+
+    response = client.post(
+        ENDPOINT_ALL + "?async=true",
+        data={"image": mock_image_a},
+        HTTP_AUTHORIZATION=f"Token {premium_user['token']}",
+        format="multipart",
+    )
+    response_dict = json.loads(response.content.decode("utf8"))
+
+    assert response.status_code == 202
+    assert len(response_dict["thumbnails"]) == 3
+    assert response_dict["job"]["status"] == ThumbnailJob.PENDING
+    assert Image.objects.filter(thumbnail_size__isnull=False).count() == 0
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_jobs_endpoint_reports_finished_job(basic_user, enterprise_user, client):
+    mock_image_a = SimpleUploadedFile(
+        name=os.path.basename(TEST_IMAGE_PATH_A).split("/")[-1],
+        content=open(TEST_IMAGE_PATH_A, "rb").read(),
+        content_type=CONTENT_TYPE_PNG,
+    )
+
+    upload_response = client.post(
+        ENDPOINT_ALL + "?async=1",
+        data={"image": mock_image_a},
+        HTTP_AUTHORIZATION=f"Token {basic_user['token']}",
+        format="multipart",
+    )
+    upload_dict = json.loads(upload_response.content.decode("utf8"))
+    run_job(claim_next_job())
+    job_url = ENDPOINT_JOBS + f"{upload_dict['job']['id']}/"
+    owner_response = client.get(
+        job_url, HTTP_AUTHORIZATION=f"Token {basic_user['token']}"
+    )
+    other_user_response = client.get(
+        job_url, HTTP_AUTHORIZATION=f"Token {enterprise_user['token']}"
+    )
+    job_dict = json.loads(owner_response.content.decode("utf8"))
+    thumbnail = Image.objects.get()
+
+    assert owner_response.status_code == 200
+    assert job_dict["status"] == ThumbnailJob.DONE
+    assert job_dict["progress"] == job_dict["total"] == 1
+    assert job_dict["thumbnails"] == upload_dict["thumbnails"]
+    assert thumbnail.slug in upload_dict["thumbnails"]["200"]
+    assert other_user_response.status_code == 404
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_batch_endpoint_creates_all_images(premium_user, client):
+    images = [
+        SimpleUploadedFile(
+            name=os.path.basename(path),
+            content=open(path, "rb").read(),
+            content_type=CONTENT_TYPE_PNG,
+        )
+        for path in (TEST_IMAGE_PATH_A, TEST_IMAGE_PATH_B, TEST_IMAGE_PATH_C)
+    ]
+
+    response = client.post(
+        ENDPOINT_BATCH,
+        data={"images": images},
+        HTTP_AUTHORIZATION=f"Token {premium_user['token']}",
+        format="multipart",
+    )
+    results = json.loads(response.content.decode("utf8"))["results"]
+
+    assert response.status_code == 201
+    assert len(results) == 3
+    for result in results:
+        assert result["status"] == 201
+        assert len(result["thumbnails"]) == 3
+    assert Image.objects.filter(thumbnail_size__isnull=True).count() == 3
+    assert Image.objects.filter(thumbnail_size__isnull=False).count() == 6
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_batch_endpoint_reports_per_file_errors(basic_user, client):
+    valid_image = SimpleUploadedFile(
+        name=os.path.basename(TEST_IMAGE_PATH_A),
+        content=open(TEST_IMAGE_PATH_A, "rb").read(),
+        content_type=CONTENT_TYPE_PNG,
+    )
+    incorrect_file = SimpleUploadedFile(
+        name=os.path.basename(MOCK_WRONG_FILE_TYPE_PATH),
+        content=open(MOCK_WRONG_FILE_TYPE_PATH, "rb").read(),
+        content_type=CONTENT_TYPE_DEFAULT,
+    )
+
+    response = client.post(
+        ENDPOINT_BATCH,
+        data={"images": [incorrect_file, valid_image]},
+        HTTP_AUTHORIZATION=f"Token {basic_user['token']}",
+        format="multipart",
+    )
+    results = json.loads(response.content.decode("utf8"))["results"]
+
+    assert response.status_code == 207
+    assert results[0]["status"] == 400
+    assert "image" in results[0]["errors"]
+    assert results[1]["status"] == 201
+    assert "Upgrade account tier" in results[1]["img_url"]
+    assert len(results[1]["thumbnails"]) == 1
+    # basic tier doesn't keep originals
+    assert Image.objects.filter(owner=basic_user["user"]).count() == 1
+
+
+@override_settings(
+    MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT, THUMBNAIL_BATCH_MAX_FILES=1
+)
+def test_batch_endpoint_rejects_empty_and_too_big_batches(basic_user, client):
+    images = [
+        SimpleUploadedFile(
+            name=os.path.basename(path),
+            content=open(path, "rb").read(),
+            content_type=CONTENT_TYPE_PNG,
+        )
+        for path in (TEST_IMAGE_PATH_A, TEST_IMAGE_PATH_B)
+    ]
+
+    empty_response = client.post(
+        ENDPOINT_BATCH, {}, HTTP_AUTHORIZATION=f"Token {basic_user['token']}"
+    )
+    too_big_response = client.post(
+        ENDPOINT_BATCH,
+        data={"images": images},
+        HTTP_AUTHORIZATION=f"Token {basic_user['token']}",
+        format="multipart",
+    )
+
+    assert empty_response.status_code == 400
+    assert too_big_response.status_code == 400
+    assert Image.objects.count() == 0
+
+
+@override_settings(
+    MEDIA_URL=TESTS_MEDIA_URL,
+    MEDIA_ROOT=TESTS_MEDIA_ROOT,
+    THUMBNAIL_MAX_UPLOAD_SIZE=1024,
+)
+def test_all_endpoint_rejects_too_big_file(basic_user, client):
+    mock_image_a = SimpleUploadedFile(
+        name=os.path.basename(TEST_IMAGE_PATH_A),
+        content=open(TEST_IMAGE_PATH_A, "rb").read(),
+        content_type=CONTENT_TYPE_PNG,
+    )
+
+    response = client.post(
+        ENDPOINT_ALL,
+        data={"image": mock_image_a},
+        HTTP_AUTHORIZATION=f"Token {basic_user['token']}",
+        format="multipart",
+    )
+    json_dict = json.loads(response.content.decode("utf8"))
+
+    assert response.status_code == 413
+    assert "too large" in json_dict["detail"]
+    assert Image.objects.count() == 0
+
+
+@override_settings(
+    MEDIA_URL=TESTS_MEDIA_URL,
+    MEDIA_ROOT=TESTS_MEDIA_ROOT,
+    THUMBNAIL_MAX_IMAGE_PIXELS=100_000,
+)
+def test_all_endpoint_rejects_image_over_pixel_budget(basic_user, client):
+    mock_image_a = SimpleUploadedFile(
+        name=os.path.basename(TEST_IMAGE_PATH_A),
+        content=open(TEST_IMAGE_PATH_A, "rb").read(),
+        content_type=CONTENT_TYPE_PNG,
+    )
+
+    response = client.post(
+        ENDPOINT_ALL,
+        data={"image": mock_image_a},
+        HTTP_AUTHORIZATION=f"Token {basic_user['token']}",
+        format="multipart",
+    )
+    json_dict = json.loads(response.content.decode("utf8"))
+
+    assert response.status_code == 413
+    assert "pixels" in json_dict["detail"]
+    assert Image.objects.count() == 0
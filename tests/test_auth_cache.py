@@ -0,0 +1,124 @@
+import time
+
+import pytest
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from API import metrics
+from API.auth_cache import get_token_user, get_user, identity_cache
+from API.caching import MISSING, LocalCache
+from tests.constants import (
+    ENDPOINT_ALL,
+    ENDPOINT_METRICS,
+    TESTS_MEDIA_ROOT,
+    TESTS_MEDIA_URL,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def test_local_cache_evicts_least_recently_used():
+    local = LocalCache(maxsize=2, ttl=60)
+    local.set("a", 1)
+    local.set("b", 2)
+    local.get("a")
+    local.set("c", 3)
+
+    assert local.get("a") == 1
+    assert local.get("b") is MISSING
+    assert local.get("c") == 3
+
+
+def test_local_cache_expires_entries():
+    local = LocalCache(maxsize=2, ttl=0.01)
+    local.set("a", 1)
+    time.sleep(0.02)
+
+    assert local.get("a") is MISSING
+    assert len(local) == 0
+
+
+def test_get_token_user_counts_hits_and_misses(premium_user, django_assert_num_queries):
+    key = premium_user["token"].key
+
+    with django_assert_num_queries(1):
+        get_token_user(key)
+    identity_cache.local.clear()
+    with django_assert_num_queries(0):
+        get_token_user(key)
+        user = get_token_user(key)
+
+    assert user == premium_user["user"]
+    assert user.account_type.tier_name == "premium"
+    assert metrics.get("auth_cache_misses") == 1
+    assert metrics.get("auth_cache_shared_hits") == 3  # token, user and tier
+    assert metrics.get("auth_cache_local_hits") == 3  # token, user and tier
+
+
+def test_cached_user_copies_are_independent(premium_user):
+    get_token_user(premium_user["token"].key)
+
+    first = get_user(premium_user["user"].id)
+    first.account_type.allowed_thumbnail_sizes = [1]
+    first.username = "changed"
+    second = get_user(premium_user["user"].id)
+
+    assert second.username == premium_user["user"].username
+    assert second.account_type.allowed_thumbnail_sizes == [200, 400]
+
+
+def test_tier_change_invalidates_cache(premium_user):
+    get_token_user(premium_user["token"].key)
+    tier = premium_user["user"].account_type
+
+    tier.allowed_thumbnail_sizes = [100]
+    tier.save()
+
+    assert get_token_user(
+        premium_user["token"].key
+    ).account_type.allowed_thumbnail_sizes == [100]
+
+
+def test_user_tier_change_invalidates_cache(premium_user, enterprise_tier):
+    get_token_user(premium_user["token"].key)
+    user = premium_user["user"]
+
+    user.account_type = enterprise_tier
+    user.save()
+
+    assert get_user(user.id).account_type.tier_name == "enterprise"
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_deleted_token_is_rejected(premium_user, client):
+    auth = f"Token {premium_user['token']}"
+    assert client.get(ENDPOINT_ALL, HTTP_AUTHORIZATION=auth).status_code == 200
+
+    premium_user["token"].delete()
+
+    assert client.get(ENDPOINT_ALL, HTTP_AUTHORIZATION=auth).status_code == 401
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_deactivated_jwt_user_is_rejected(premium_user, client):
+    auth = f"Bearer {AccessToken.for_user(premium_user['user'])}"
+    assert client.get(ENDPOINT_ALL, HTTP_AUTHORIZATION=auth).status_code == 200
+
+    premium_user["user"].is_active = False
+    premium_user["user"].save()
+
+    assert client.get(ENDPOINT_ALL, HTTP_AUTHORIZATION=auth).status_code == 401
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_metrics_endpoint_is_staff_only(premium_user, client):
+    auth = f"Token {premium_user['token']}"
+
+    forbidden = client.get(ENDPOINT_METRICS, HTTP_AUTHORIZATION=auth)
+    premium_user["user"].is_staff = True
+    premium_user["user"].save()
+    allowed = client.get(ENDPOINT_METRICS, HTTP_AUTHORIZATION=auth)
+
+    assert forbidden.status_code == 403
+    assert allowed.status_code == 200
+    assert allowed.json()["auth_cache_misses"] >= 1
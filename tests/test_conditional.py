@@ -0,0 +1,113 @@
+import pytest
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils.http import http_date
+
+from API import metrics
+from API.models import Image, ImageCollection
+from tests.constants import (
+    ENDPOINT_ALL,
+    TEST_IMAGE_PATH_JPG,
+    TESTS_MEDIA_ROOT,
+    TESTS_MEDIA_URL,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def get(client, user, url=ENDPOINT_ALL, **headers):
+    return client.get(url, HTTP_AUTHORIZATION=f"Token {user['token']}", **headers)
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_list_is_not_modified_until_images_change(
+    premium_user, client, django_capture_on_commit_callbacks, upload
+):
+    upload(premium_user)
+    first = get(client, premium_user)
+
+    not_modified = get(client, premium_user, HTTP_IF_NONE_MATCH=first["ETag"])
+    with django_capture_on_commit_callbacks(execute=True):
+        upload(premium_user, TEST_IMAGE_PATH_JPG)
+    modified = get(client, premium_user, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert first.status_code == 200
+    assert first["Last-Modified"]
+    assert not_modified.status_code == 304
+    assert not_modified["ETag"] == first["ETag"]
+    assert modified.status_code == 200
+    assert modified["ETag"] != first["ETag"]
+    assert len(modified.json()["results"]) == 6
+    assert metrics.get("collection_not_modified") == 1
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_retrieve_is_modified_by_deleting_images(
+    premium_user, client, django_capture_on_commit_callbacks, upload
+):
+    upload(premium_user)
+    original = Image.objects.originals().get()
+    url = f"{ENDPOINT_ALL}{original.id}/"
+    etag = get(client, premium_user, url)["ETag"]
+
+    assert get(client, premium_user, url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    with django_capture_on_commit_callbacks(execute=True):
+        Image.objects.filter(thumbnail_size=400).delete()
+    response = get(client, premium_user, url, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 200
+    assert len(response.json()["thumbnails"]) == 1
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_if_modified_since(premium_user, client, upload):
+    upload(premium_user)
+    last_modified = get(client, premium_user)["Last-Modified"]
+
+    response = get(client, premium_user, HTTP_IF_MODIFIED_SINCE=last_modified)
+    older = get(client, premium_user, HTTP_IF_MODIFIED_SINCE=http_date(0))
+
+    assert response.status_code == 304
+    assert older.status_code == 200
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_etags_differ_by_user_and_query(premium_user, enterprise_user, client, upload):
+    upload(premium_user)
+    etags = {
+        get(client, premium_user)["ETag"],
+        get(client, premium_user, ENDPOINT_ALL + "?originals=true")["ETag"],
+        get(client, enterprise_user)["ETag"],
+    }
+    active = get(client, premium_user, ENDPOINT_ALL + "?active=true")
+
+    assert len(etags) == 3
+    # listing of active images changes once they expire
+    assert not active.has_header("ETag")
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_versions_changed_by_other_processes_are_seen(
+    premium_user, client, django_capture_on_commit_callbacks, upload
+):
+    upload(premium_user)
+    etag = get(client, premium_user)["ETag"]
+
+    # e.g. reaper deleting rows, with its own django cache
+    with django_capture_on_commit_callbacks(execute=True):
+        Image.objects.filter(thumbnail_size=200).delete()
+    cache.clear()
+    response = get(client, premium_user, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 200
+    assert ImageCollection.objects.get(owner=premium_user["user"])
+
+
+def test_bump_skips_deleted_users(premium_user, django_capture_on_commit_callbacks):
+    user_id = premium_user["user"].id
+    premium_user["user"].delete()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        ImageCollection.objects.bump_on_commit([user_id])
+
+    assert not ImageCollection.objects.exists()
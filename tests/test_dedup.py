@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+
+import pytest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image as PILImage
+
+from API import metrics
+from API.models import AccountTier, EncodingProfile, Image
+from API.upload_handlers import HashingTemporaryFileUploadHandler
+from tests.constants import (
+    CONTENT_TYPE_PNG,
+    ENDPOINT_BATCH,
+    ENDPOINT_METRICS,
+    TEST_IMAGE_PATH_A,
+    TEST_IMAGE_PATH_JPG,
+    TESTS_MEDIA_ROOT,
+    TESTS_MEDIA_URL,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def stored_files(user) -> dict:
+    return dict(
+        Image.objects.filter(owner=user["user"]).values_list("thumbnail_size", "image")
+    )
+
+
+def test_upload_handler_hashes_streamed_file():
+    content = open(TEST_IMAGE_PATH_A, "rb").read()
+    handler = HashingTemporaryFileUploadHandler()
+    handler.new_file("image", "a.png", CONTENT_TYPE_PNG, len(content))
+
+    handler.receive_data_chunk(content[:100], 0)
+    handler.receive_data_chunk(content[100:], 100)
+    uploaded = handler.file_complete(len(content))
+
+    assert uploaded.content_hash == hashlib.sha256(content).hexdigest()
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_duplicate_upload_reuses_stored_files(premium_user, enterprise_user, upload):
+    first = upload(premium_user)
+    second = upload(enterprise_user)
+
+    assert first.status_code == second.status_code == 201
+    assert stored_files(premium_user) == stored_files(enterprise_user)
+    assert Image.objects.filter(owner=enterprise_user["user"]).count() == 3
+    content_hash = hashlib.sha256(open(TEST_IMAGE_PATH_A, "rb").read()).hexdigest()
+    assert set(Image.objects.values_list("content_hash", flat=True)) == {content_hash}
+    assert metrics.get("dedup_misses") == 1
+    assert metrics.get("dedup_hits") == 1
+    assert metrics.get("dedup_thumbnails_reused") == 2
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_thumbnails_are_not_reused_across_encoding_profiles(
+    premium_user, enterprise_user, upload
+):
+    tier = enterprise_user["user"].account_type
+    tier.encoding_profile = EncodingProfile.objects.create(name="small")
+    tier.save()
+    upload(premium_user)
+    upload(enterprise_user)
+
+    premium_files = stored_files(premium_user)
+    enterprise_files = stored_files(enterprise_user)
+    assert premium_files[None] == enterprise_files[None]
+    assert premium_files[200] != enterprise_files[200]
+    assert metrics.get("dedup_thumbnails_reused") == 0
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_thumbnails_are_reused_only_in_stored_format_of_tier(
+    premium_user, enterprise_user, upload, tmp_path
+):
+    path = tmp_path / "transparent.png"
+    PILImage.new("RGBA", (300, 300), (255, 0, 0, 128)).save(path)
+    tier = premium_user["user"].account_type
+    tier.thumbnail_format = AccountTier.JPEG_FORMAT
+    tier.save()
+    upload(premium_user, str(path))
+    upload(enterprise_user, str(path))
+
+    premium_files = stored_files(premium_user)
+    enterprise_files = stored_files(enterprise_user)
+    assert premium_files[None] == enterprise_files[None]
+    assert premium_files[200].endswith(".jpg")
+    assert enterprise_files[200].endswith(".png")
+    assert metrics.get("dedup_thumbnails_reused") == 0
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_reused_originals_are_locked_until_upload_commits(
+    premium_user, enterprise_user, upload
+):
+    upload(premium_user)
+
+    with CaptureQueriesContext(connection) as queries:
+        upload(enterprise_user)
+
+    lookup = next(
+        query["sql"] for query in queries if '"content_hash" IN' in query["sql"]
+    )
+    assert lookup.endswith("FOR UPDATE")
+    assert metrics.get("dedup_hits") == 1
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_reused_thumbnails_are_locked_until_upload_commits(
+    premium_user, enterprise_user, upload
+):
+    upload(premium_user)
+
+    with CaptureQueriesContext(connection) as queries:
+        upload(enterprise_user)
+
+    lookups = [
+        query["sql"]
+        for query in queries
+        if '"thumbnail_size" IN' in query["sql"] and '"content_hash" IN' in query["sql"]
+    ]
+    assert len(lookups) == 2
+    assert not lookups[0].endswith("FOR UPDATE")
+    assert lookups[1].endswith('FOR UPDATE OF "API_image"')
+    assert metrics.get("dedup_thumbnails_reused") == 2
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_different_uploads_are_stored_separately(premium_user, upload):
+    upload(premium_user, TEST_IMAGE_PATH_A)
+    upload(premium_user, TEST_IMAGE_PATH_JPG)
+
+    assert Image.objects.values("image").distinct().count() == 6
+    assert metrics.get("dedup_misses") == 2
+    assert metrics.get("dedup_hits") == 0
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_shared_original_file_is_kept_until_last_row_is_deleted(
+    premium_user, basic_user, upload, django_capture_on_commit_callbacks
+):
+    upload(premium_user)
+    shared = Image.objects.originals().get(owner=premium_user["user"]).image.name
+
+    with django_capture_on_commit_callbacks(execute=True):
+        upload(basic_user)  # basic tier deletes its original row
+
+    assert not Image.objects.originals().filter(owner=basic_user["user"]).exists()
+    assert default_storage.exists(shared)
+
+    Image.objects.filter(image=shared).delete()
+    assert Image.objects.delete_unreferenced_files([shared]) == 1
+    assert not default_storage.exists(shared)
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_batch_upload_reuses_stored_files(
+    premium_user, enterprise_user, client, upload
+):
+    upload(premium_user)
+    images = [
+        SimpleUploadedFile(
+            name=os.path.basename(path),
+            content=open(path, "rb").read(),
+            content_type=CONTENT_TYPE_PNG,
+        )
+        for path in (TEST_IMAGE_PATH_A, TEST_IMAGE_PATH_JPG)
+    ]
+
+    response = client.post(
+        ENDPOINT_BATCH,
+        data={"images": images},
+        HTTP_AUTHORIZATION=f"Token {enterprise_user['token']}",
+        format="multipart",
+    )
+
+    results = json.loads(response.content.decode("utf8"))["results"]
+    assert [result["status"] for result in results] == [201, 201]
+    reused = Image.objects.filter(owner=enterprise_user["user"]).values_list(
+        "image", flat=True
+    )
+    assert set(stored_files(premium_user).values()) < set(reused)
+    assert metrics.get("dedup_hits") == 1
+    assert metrics.get("dedup_misses") == 2
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_metrics_endpoint_reports_dedup_hit_rate(
+    premium_user, enterprise_user, client, upload
+):
+    upload(premium_user)
+    upload(enterprise_user)
+    enterprise_user["user"].is_staff = True
+    enterprise_user["user"].save()
+
+    response = client.get(
+        ENDPOINT_METRICS, HTTP_AUTHORIZATION=f"Token {enterprise_user['token']}"
+    )
+
+    assert response.json()["dedup_hit_rate"] == 0.5
@@ -0,0 +1,183 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pytest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image as PILImage
+
+from API import metrics
+from API.derived_cache import evict, get_derived_image, store_derived
+from API.models import Image
+from tests.constants import (
+    CONTENT_TYPE_PNG,
+    ENDPOINT_ALL,
+    TEST_IMAGE_PATH_A,
+    TESTS_MEDIA_ROOT,
+    TESTS_MEDIA_URL,
+)
+
+pytestmark = pytest.mark.django_db
+
+ENDPOINT_LAZY = ENDPOINT_ALL + "?lazy=true"
+
+
+@pytest.fixture(autouse=True)
+def empty_derived_cache():
+    shutil.rmtree(os.path.join(TESTS_MEDIA_ROOT, "derived"), ignore_errors=True)
+
+
+def stored_original(user) -> str:
+    image = SimpleUploadedFile(
+        name=os.path.basename(TEST_IMAGE_PATH_A),
+        content=open(TEST_IMAGE_PATH_A, "rb").read(),
+        content_type=CONTENT_TYPE_PNG,
+    )
+    return Image.objects.create(owner=user["user"], image=image).image.name
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_lazy_upload_stores_only_original(premium_user, upload):
+    response = upload(premium_user, endpoint=ENDPOINT_LAZY)
+
+    original = Image.objects.originals().get()
+    thumbnails = Image.objects.filter(thumbnail_size__isnull=False)
+    assert response.status_code == 201
+    assert len(response.json()["thumbnails"]) == 3
+    assert {thumbnail.image.name for thumbnail in thumbnails} == {original.image.name}
+    assert all(thumbnail.lazy for thumbnail in thumbnails)
+    assert [thumbnail.dimensions for thumbnail in thumbnails] == ["200x200", "400x400"]
+    assert metrics.get("derived_cache_renders") == 0
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_lazy_thumbnail_is_rendered_on_first_view_only(premium_user, client, upload):
+    upload(premium_user, endpoint=ENDPOINT_LAZY)
+    thumbnail = Image.objects.get(thumbnail_size=200)
+
+    first = client.get(f"/i/{thumbnail.slug}/raw")
+    second = client.get(f"/i/{thumbnail.slug}/raw")
+
+    assert first.status_code == second.status_code == 200
+    with PILImage.open(BytesIO(b"".join(first.streaming_content))) as image:
+        assert image.size == (200, 200)
+    assert metrics.get("derived_cache_renders") == 1
+    assert metrics.get("render_processes") == 1
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_lazy_thumbnail_of_basic_tier_keeps_source_file(
+    basic_user, client, django_capture_on_commit_callbacks, upload
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        upload(basic_user, endpoint=ENDPOINT_LAZY)
+    thumbnail = Image.objects.get()
+
+    response = client.get(f"/i/{thumbnail.slug}/raw")
+
+    assert thumbnail.lazy
+    assert default_storage.exists(thumbnail.image.name)
+    assert response.status_code == 200
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_lazy_thumbnail_over_render_budget_of_tier_is_rejected(
+    premium_user, client, upload
+):
+    upload(premium_user, endpoint=ENDPOINT_LAZY)
+    thumbnail = Image.objects.get(thumbnail_size=200)
+    tier = premium_user["user"].account_type
+    tier.max_image_pixels = 100
+    tier.save()
+
+    response = client.get(f"/i/{thumbnail.slug}/raw")
+
+    assert response.status_code == 400
+    assert b"Allowed size is 100 pixels" in response.content
+    assert metrics.get("derived_cache_renders") == 0
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_formats_of_transparent_source_are_cached_separately(premium_user):
+    content = BytesIO()
+    PILImage.new("RGBA", (300, 300), (255, 0, 0, 128)).save(content, "PNG")
+    image = SimpleUploadedFile(
+        "transparent.png", content.getvalue(), content_type=CONTENT_TYPE_PNG
+    )
+    source = Image.objects.create(owner=premium_user["user"], image=image).image.name
+
+    jpeg = get_derived_image(source, 100, "jpeg")
+    source_format = get_derived_image(source, 100)
+
+    assert jpeg.endswith("_jpeg.jpg")
+    assert source_format.endswith("_src.png")
+    with default_storage.open(source_format) as file, PILImage.open(file) as image:
+        assert image.mode == "RGBA"
+    assert metrics.get("derived_cache_renders") == 2
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_concurrent_first_views_render_once(premium_user):
+    source = stored_original(premium_user)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        names = set(executor.map(lambda _: get_derived_image(source, 100), range(8)))
+
+    assert len(names) == 1
+    assert metrics.get("derived_cache_renders") == 1
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_least_recently_viewed_thumbnails_are_evicted(premium_user):
+    source = stored_original(premium_user)
+    old = get_derived_image(source, 100)
+    os.utime(default_storage.path(old), (1, 1))
+    recent = get_derived_image(source, 50)
+
+    deleted = evict(default_storage.size(recent))
+
+    assert deleted == 1
+    assert not default_storage.exists(old)
+    assert default_storage.exists(recent)
+
+
+@override_settings(
+    MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT, DERIVED_CACHE_MAX_BYTES=1
+)
+def test_evicted_thumbnail_is_rendered_again(premium_user):
+    source = stored_original(premium_user)
+    get_derived_image(source, 100)
+    os.remove(default_storage.path(get_derived_image(source, 100)))
+
+    name = get_derived_image(source, 100)
+
+    assert default_storage.exists(name)
+    assert metrics.get("derived_cache_renders") == 2
+
+
+@override_settings(
+    MEDIA_URL=TESTS_MEDIA_URL,
+    MEDIA_ROOT=TESTS_MEDIA_ROOT,
+    DERIVED_CACHE_MAX_BYTES=1000,
+    DERIVED_CACHE_LOW_WATER=0.5,
+)
+def test_eviction_frees_cache_down_to_low_water():
+    names = []
+    for index in range(5):
+        names.append(store_derived(f"derived/ab/thumbnail_{index}", b"x" * 300, ".jpg"))
+        os.utime(default_storage.path(names[-1]), (index + 1, index + 1))
+
+    # first write counts the cache, fourth one evicts three files down to 300 bytes,
+    # and the fifth fits under the limit again without walking the cache
+    assert metrics.get("derived_cache_eviction_runs") == 2
+    assert metrics.get("derived_cache_evictions") == 3
+    assert [default_storage.exists(name) for name in names] == [
+        False,
+        False,
+        False,
+        True,
+        True,
+    ]
@@ -0,0 +1,124 @@
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+from django.db import connection
+from easy_thumbnails import engine as easy_engine
+from easy_thumbnails import namers, processors, utils
+from easy_thumbnails.options import ThumbnailOptions
+from PIL import Image as PILImage
+
+from API import engine
+
+
+def photo(size=(300, 200), mode="RGB") -> PILImage.Image:
+    image = PILImage.effect_noise(size, 64).convert("RGB")
+    image = PILImage.blend(
+        image, PILImage.linear_gradient("L").resize(size).convert("RGB"), 0.5
+    )
+    if mode in ("RGBA", "LA"):
+        image = image.convert(mode)
+        image.putalpha(PILImage.linear_gradient("L").resize(size))
+        return image
+    if mode == "I":
+        return image.convert("L").convert("I")
+    return image.convert(mode)
+
+
+def easy_thumbnail_name(source_name, size, transparent, profile_id=None):
+    options = {"size": (size, size), "upscale": True, "crop": True}
+    if profile_id is not None:
+        options["profile"] = profile_id
+    thumbnailer = SimpleNamespace(thumbnail_basedir="", thumbnail_subdir="")
+    extension = "png" if transparent else "jpg"
+    return namers.default(
+        thumbnailer=thumbnailer,
+        prepared_options=ThumbnailOptions(options).prepared_options(),
+        source_filename=source_name,
+        thumbnail_extension=extension,
+    )
+
+
+@pytest.mark.parametrize(
+    "source_size, size",
+    [((300, 200), 100), ((200, 300), 150), ((120, 80), 200), ((333, 333), 333)],
+)
+def test_scale_and_crop_matches_easy_thumbnails(source_size, size):
+    image = photo(source_size)
+
+    native = engine.scale_and_crop(image, size)
+    easy = processors.scale_and_crop(image, (size, size), crop=True, upscale=True)
+
+    assert native.size == easy.size == (size, size)
+    assert native.tobytes() == easy.tobytes()
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA", "L", "LA", "CMYK", "I", "P"])
+def test_colorspace_matches_easy_thumbnails(mode):
+    image = photo(mode=mode)
+
+    native = engine.colorspace(image)
+    easy = processors.colorspace(image)
+
+    assert native.mode == easy.mode
+    assert native.tobytes() == easy.tobytes()
+    assert engine.is_transparent(image) == utils.is_transparent(image)
+
+
+@pytest.mark.parametrize("orientation", range(1, 9))
+def test_exif_orientation_matches_easy_thumbnails(orientation):
+    exif = PILImage.Exif()
+    exif[engine.EXIF_ORIENTATION] = orientation
+    output = BytesIO()
+    photo().save(output, format="JPEG", exif=exif.tobytes())
+
+    with PILImage.open(output) as image:
+        native = engine.exif_orientation(image)
+        easy = utils.exif_orientation(image)
+
+        assert native.size == easy.size
+        assert native.tobytes() == easy.tobytes()
+
+
+@pytest.mark.parametrize("transparent", [False, True])
+@pytest.mark.parametrize("profile_id", [None, 7])
+def test_thumbnail_name_matches_easy_thumbnails(transparent, profile_id):
+    native = engine.thumbnail_name(
+        "user_1/a.png", 200, transparent=transparent, profile_id=profile_id
+    )
+
+    assert native == easy_thumbnail_name("user_1/a.png", 200, transparent, profile_id)
+
+
+@pytest.mark.parametrize(
+    "mode, size, image_format",
+    [("RGB", 200, "JPEG"), ("RGB", 50, "JPEG"), ("RGBA", 200, "JPEG")]
+    + [("RGBA", 200, "PNG"), ("RGB", 200, "WEBP")],
+)
+def test_save_image_matches_easy_thumbnails(mode, size, image_format):
+    image = photo((size, size), mode)
+    filename = (
+        "thumbnail" + {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}[image_format]
+    )
+
+    native = engine.save_image(image, engine.image_format(filename))
+    easy = easy_engine.save_pil_image(
+        image, filename=filename, quality=85, subsampling=2
+    ).read()
+
+    assert native == easy
+
+
+def test_thumbnail_name_of_forced_format():
+    name = engine.thumbnail_name("a.png", 200, transparent=True, output_format="webp")
+
+    assert name == "a.png.200x200_q85_crop_upscale.webp"
+
+
+@pytest.mark.django_db
+def test_engine_needs_no_tables_of_its_own():
+    assert not [
+        table
+        for table in connection.introspection.table_names()
+        if table.startswith("easy_thumbnails")
+    ]
@@ -0,0 +1,158 @@
+import datetime
+
+import pytest
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from API.jobs import claim_next_job, enqueue_thumbnail_job, run_job
+from API.models import Image, ThumbnailJob
+from tests.constants import TEST_MEDIA_IMAGE_PATH_A, TESTS_MEDIA_ROOT, TESTS_MEDIA_URL
+
+pytestmark = pytest.mark.django_db
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_enqueue_thumbnail_job_reserves_slug_for_each_size(premium_user):
+    user = premium_user["user"]
+    image = Image.objects.create(owner=user, image=TEST_MEDIA_IMAGE_PATH_A)
+
+    job = enqueue_thumbnail_job(image, user)
+
+    assert list(job.slugs.keys()) == ["200", "400"]
+    assert job.priority == user.account_type.job_priority
+    assert job.status == ThumbnailJob.PENDING
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_claim_next_job_prefers_higher_priority(basic_user, enterprise_user):
+    enterprise_user["user"].account_type.job_priority = 2
+    enterprise_user["user"].account_type.save()
+    basic_image = Image.objects.create(
+        owner=basic_user["user"], image=TEST_MEDIA_IMAGE_PATH_A
+    )
+    enterprise_image = Image.objects.create(
+        owner=enterprise_user["user"], image=TEST_MEDIA_IMAGE_PATH_A
+    )
+    basic_job = enqueue_thumbnail_job(basic_image, basic_user["user"])
+    enterprise_job = enqueue_thumbnail_job(enterprise_image, enterprise_user["user"])
+
+    assert claim_next_job(min_priority=3) is None
+    assert claim_next_job() == enterprise_job
+    assert claim_next_job() == basic_job
+    assert claim_next_job() is None
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_claim_next_job_retries_stale_running_job(basic_user):
+    image = Image.objects.create(
+        owner=basic_user["user"], image=TEST_MEDIA_IMAGE_PATH_A
+    )
+    job = enqueue_thumbnail_job(image, basic_user["user"])
+    ThumbnailJob.objects.filter(id=job.id).update(
+        status=ThumbnailJob.RUNNING,
+        started=timezone.now() - datetime.timedelta(hours=1),
+    )
+
+    assert claim_next_job() == job
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_claim_next_job_takes_pending_job_before_stale_one(basic_user, enterprise_user):
+    enterprise_user["user"].account_type.job_priority = 2
+    enterprise_user["user"].account_type.save()
+    image = Image.objects.create(
+        owner=basic_user["user"], image=TEST_MEDIA_IMAGE_PATH_A
+    )
+    stale_job = enqueue_thumbnail_job(image, enterprise_user["user"])
+    ThumbnailJob.objects.filter(id=stale_job.id).update(
+        status=ThumbnailJob.RUNNING,
+        started=timezone.now() - datetime.timedelta(hours=1),
+    )
+    pending_job = enqueue_thumbnail_job(image, basic_user["user"])
+
+    with CaptureQueriesContext(connection) as queries:
+        assert claim_next_job() == pending_job
+    assert claim_next_job() == stale_job
+    lookups = [query["sql"] for query in queries if "FOR UPDATE" in query["sql"]]
+    assert len(lookups) == 1
+    assert " OR " not in lookups[0]
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_run_job_creates_thumbnails_with_reserved_slugs(premium_user):
+    user = premium_user["user"]
+    image = Image.objects.create(owner=user, image=TEST_MEDIA_IMAGE_PATH_A)
+    job = enqueue_thumbnail_job(image, user)
+
+    run_job(claim_next_job())
+    job.refresh_from_db()
+
+    assert job.status == ThumbnailJob.DONE
+    assert job.progress == 2
+    for size, slug in job.slugs.items():
+        assert Image.objects.get(slug=slug).thumbnail_size == int(size)
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_run_job_marks_job_failed_without_source(premium_user):
+    user = premium_user["user"]
+    image = Image.objects.create(owner=user, image=TEST_MEDIA_IMAGE_PATH_A)
+    enqueue_thumbnail_job(image, user)
+    image.delete()
+
+    job = run_job(claim_next_job())
+
+    assert job.status == ThumbnailJob.FAILED
+    assert job.error
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_run_job_progress_keeps_job_from_going_stale(premium_user):
+    user = premium_user["user"]
+    image = Image.objects.create(owner=user, image=TEST_MEDIA_IMAGE_PATH_A)
+    enqueue_thumbnail_job(image, user)
+    job = claim_next_job()
+    long_ago = timezone.now() - datetime.timedelta(hours=1)
+    ThumbnailJob.objects.filter(id=job.id).update(started=long_ago)
+
+    run_job(job)
+    job.refresh_from_db()
+
+    assert job.started > long_ago
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_run_job_reclaimed_after_thumbnails_were_stored_is_done(premium_user):
+    user = premium_user["user"]
+    image = Image.objects.create(owner=user, image=TEST_MEDIA_IMAGE_PATH_A)
+    enqueue_thumbnail_job(image, user)
+    job = claim_next_job()
+    run_job(job)
+    ThumbnailJob.objects.filter(id=job.id).update(
+        status=ThumbnailJob.RUNNING,
+        started=timezone.now() - datetime.timedelta(hours=1),
+    )
+
+    job = run_job(claim_next_job())
+
+    assert job.status == ThumbnailJob.DONE
+    assert job.progress == 2
+    assert Image.objects.filter(thumbnail_size__isnull=False).count() == 2
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_run_job_fails_when_reserved_slug_is_taken(premium_user, basic_user):
+    user = premium_user["user"]
+    image = Image.objects.create(owner=user, image=TEST_MEDIA_IMAGE_PATH_A)
+    job = enqueue_thumbnail_job(image, user)
+    Image.objects.create(
+        owner=basic_user["user"], image=TEST_MEDIA_IMAGE_PATH_A, slug=job.slugs["200"]
+    )
+
+    job = run_job(claim_next_job())
+
+    assert job.status == ThumbnailJob.FAILED
+    assert not Image.objects.filter(thumbnail_size__isnull=False).exists()
@@ -1,10 +1,14 @@
 import datetime
 import os
+from io import StringIO
 
 import pytest
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
 from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
 
 from API.models import AccountTier, Image
 from tests.constants import (
@@ -52,6 +56,97 @@ def test_image_save(basic_user):
     assert image.slug is not None
 
 
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_image_save_replaces_colliding_slug(basic_user):
+    taken = Image.objects.create(
+        owner=basic_user["user"], image=TEST_IMAGE_PATH_A, slug="takenslug123456"
+    )
+
+    image = Image(owner=basic_user["user"], image=TEST_IMAGE_PATH_A, slug=taken.slug)
+    image.save()
+
+    assert image.pk is not None
+    assert image.slug != taken.slug
+    assert Image.objects.filter(slug=taken.slug).count() == 1
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_image_bulk_create_allocates_slugs_in_single_insert(
+    basic_user, django_assert_num_queries
+):
+    images = [
+        Image(owner=basic_user["user"], image=TEST_MEDIA_IMAGE_PATH_A)
+        for _ in range(20)
+    ]
+
+    # savepoint, insert, savepoint release
+    with django_assert_num_queries(3):
+        Image.objects.bulk_create(images)
+
+    assert len({image.slug for image in images}) == 20
+    assert Image.objects.count() == 20
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_image_bulk_create_retries_colliding_slug(basic_user):
+    taken = Image.objects.create(
+        owner=basic_user["user"], image=TEST_IMAGE_PATH_A, slug="takenslug123456"
+    )
+    images = [
+        Image(owner=basic_user["user"], image=TEST_MEDIA_IMAGE_PATH_A),
+        Image(owner=basic_user["user"], image=TEST_MEDIA_IMAGE_PATH_A, slug=taken.slug),
+    ]
+
+    Image.objects.bulk_create(images)
+
+    assert images[1].slug != taken.slug
+    assert Image.objects.count() == 3
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_image_bulk_create_retries_slug_repeated_in_batch(basic_user):
+    images = [
+        Image(
+            owner=basic_user["user"],
+            image=TEST_MEDIA_IMAGE_PATH_A,
+            slug="sameslug1234567",
+        )
+        for _ in range(2)
+    ]
+
+    Image.objects.bulk_create(images)
+
+    assert images[0].slug == "sameslug1234567"
+    assert images[1].slug != images[0].slug
+    assert Image.objects.count() == 2
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_image_bulk_create_raises_on_colliding_reserved_slug(basic_user):
+    taken = Image.objects.create(
+        owner=basic_user["user"], image=TEST_IMAGE_PATH_A, slug="takenslug123456"
+    )
+    images = [
+        Image(owner=basic_user["user"], image=TEST_MEDIA_IMAGE_PATH_A, slug=taken.slug)
+    ]
+
+    with pytest.raises(IntegrityError):
+        with transaction.atomic():
+            Image.objects.bulk_create(images, reserved_slugs=[taken.slug])
+
+    assert images[0].slug == taken.slug
+    assert Image.objects.count() == 1
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_image_bulk_create_raises_integrity_error_not_caused_by_slug():
+    images = [Image(owner=None, image=TEST_MEDIA_IMAGE_PATH_A)]
+
+    with pytest.raises(IntegrityError):
+        with transaction.atomic():
+            Image.objects.bulk_create(images)
+
+
 @override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
 @pytest.fixture(params=[datetime.datetime(2055, 12, 25, 17, 5, 55)])
 def test_image_property_is_expired(basic_user):
@@ -80,6 +175,33 @@ def test_image_property_is_not_expired(basic_user):
     assert image.is_expired is False
 
 
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_image_expires_at_is_stored_once(basic_user):
+    image = Image.objects.create(
+        owner=basic_user["user"], image=TEST_IMAGE_PATH_A, expire_time=400
+    )
+    expires_at = image.expires_at
+    image.save()
+
+    assert (expires_at - image.created).total_seconds() == pytest.approx(400, abs=1)
+    assert image.expires_at == expires_at
+    assert Image.objects.expired().count() == 0
+    assert Image.objects.active().get() == image
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_image_property_is_expired_after_expires_at(basic_user):
+    image = Image.objects.create(
+        owner=basic_user["user"],
+        image=TEST_IMAGE_PATH_A,
+        expire_time=400,
+        expires_at=timezone.now() - datetime.timedelta(seconds=1),
+    )
+
+    assert image.is_expired is True
+    assert Image.objects.expired().get() == image
+
+
 @override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
 def test_image_get_url(basic_user, client):
     response = client.get(reverse("all-list"))
@@ -128,4 +250,59 @@ def test_image_make_time_limited_thumbnail(enterprise_user, client):
     for image in all_images:
         assert image.slug is not None
     assert "img_url" in image_dict
-    assert len(image_dict) == 1
+    assert "signed_url" in image_dict
+    assert len(image_dict) == 2
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_image_save_stores_uploaded_file_metadata(basic_user):
+    image = Image(
+        owner=basic_user["user"],
+        image=SimpleUploadedFile(
+            name=os.path.basename(TEST_IMAGE_PATH_A),
+            content=open(TEST_IMAGE_PATH_A, "rb").read(),
+        ),
+    )
+    image.save()
+
+    assert (image.width, image.height) == (840, 680)
+    assert image.file_size == os.path.getsize(TEST_IMAGE_PATH_A)
+    assert image.format == "JPEG"  # test images are jpegs with png extension
+    assert image.dimensions == "840x680"
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_image_make_thumbnails_stores_thumbnail_metadata(premium_user, client):
+    image = Image.objects.create(
+        owner=premium_user["user"],
+        image=TEST_MEDIA_IMAGE_PATH_A,
+    )
+    request = client.get(reverse("all-list")).wsgi_request
+
+    image.make_thumbnails(premium_user["user"], request)
+
+    for thumbnail in Image.objects.filter(thumbnail_size__isnull=False):
+        assert thumbnail.width == thumbnail.height == thumbnail.thumbnail_size
+        assert thumbnail.file_size > 0
+        assert thumbnail.format
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_backfill_image_metadata_command(basic_user):
+    image = Image.objects.create(
+        owner=basic_user["user"],
+        image=TEST_MEDIA_IMAGE_PATH_A,
+    )
+    missing = Image.objects.create(
+        owner=basic_user["user"],
+        image="user_0/missing.png",
+    )
+
+    call_command("backfill_image_metadata", chunk_size=1, stdout=StringIO())
+    image.refresh_from_db()
+    missing.refresh_from_db()
+
+    assert (image.width, image.height) == (840, 680)
+    assert image.format == "JPEG"  # test images are jpegs with png extension
+    assert image.file_size == os.path.getsize(TEST_MEDIA_IMAGE_PATH_A)
+    assert missing.width is None
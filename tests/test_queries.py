@@ -0,0 +1,165 @@
+"""
+Locks in number of database queries made by each endpoint, so per-request
+lookups don't creep back in. Authentication loads the user with its account
+tier in a single query, or none when cached, and views and serializers reuse it.
+"""
+
+import pytest
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from API.jobs import enqueue_thumbnail_job
+from API.models import Image
+from tests.constants import (
+    ENDPOINT_ALL,
+    ENDPOINT_JOBS,
+    ENDPOINT_TIMED,
+    TEST_MEDIA_IMAGE_PATH_A,
+    TESTS_MEDIA_ROOT,
+    TESTS_MEDIA_URL,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def create_images(owner, count):
+    return Image.objects.bulk_create(
+        Image(owner=owner, image=TEST_MEDIA_IMAGE_PATH_A, width=840, height=680)
+        for _ in range(count)
+    )
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+@pytest.mark.parametrize("count", [1, 10])
+def test_list_queries(premium_user, client, django_assert_num_queries, count):
+    create_images(premium_user["user"], count)
+
+    # token with user and tier, collection version, page of images
+    with django_assert_num_queries(3):
+        response = client.get(
+            ENDPOINT_ALL, HTTP_AUTHORIZATION=f"Token {premium_user['token']}"
+        )
+
+    assert response.status_code == 200
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+@pytest.mark.parametrize("count", [1, 10])
+def test_grouped_list_queries(premium_user, client, django_assert_num_queries, count):
+    for original in create_images(premium_user["user"], count):
+        Image.objects.bulk_create(
+            Image(
+                owner=premium_user["user"],
+                image=TEST_MEDIA_IMAGE_PATH_A,
+                thumbnail_size=size,
+                width=size,
+                height=size,
+                source=original,
+            )
+            for size in (200, 400)
+        )
+
+    # token with user and tier, collection version, page of originals, their thumbnails
+    with django_assert_num_queries(4):
+        response = client.get(
+            ENDPOINT_ALL + "?grouped=true",
+            HTTP_AUTHORIZATION=f"Token {premium_user['token']}",
+        )
+
+    assert response.status_code == 200
+    assert [len(item["thumbnails"]) for item in response.json()["results"]] == [
+        2
+    ] * count
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_list_queries_with_cached_identity(
+    premium_user, client, django_assert_num_queries
+):
+    create_images(premium_user["user"], 3)
+    auth = f"Token {premium_user['token']}"
+    client.get(ENDPOINT_ALL, HTTP_AUTHORIZATION=auth)
+
+    # collection version and page of images, token, user and tier come from cache
+    with django_assert_num_queries(2):
+        response = client.get(ENDPOINT_ALL, HTTP_AUTHORIZATION=auth)
+
+    assert response.status_code == 200
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_not_modified_list_queries(premium_user, client, django_assert_num_queries):
+    create_images(premium_user["user"], 3)
+    auth = f"Token {premium_user['token']}"
+    etag = client.get(ENDPOINT_ALL, HTTP_AUTHORIZATION=auth)["ETag"]
+
+    # collection version only, identity comes from cache
+    with django_assert_num_queries(1):
+        response = client.get(
+            ENDPOINT_ALL, HTTP_AUTHORIZATION=auth, HTTP_IF_NONE_MATCH=etag
+        )
+
+    assert response.status_code == 304
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_list_queries_with_jwt(premium_user, client, django_assert_num_queries):
+    create_images(premium_user["user"], 3)
+    access_token = AccessToken.for_user(premium_user["user"])
+
+    # user with tier, collection version, page of images
+    with django_assert_num_queries(3):
+        response = client.get(ENDPOINT_ALL, HTTP_AUTHORIZATION=f"Bearer {access_token}")
+
+    assert response.status_code == 200
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_retrieve_queries(premium_user, client, django_assert_num_queries):
+    (image,) = create_images(premium_user["user"], 1)
+
+    with django_assert_num_queries(4):
+        response = client.get(
+            f"{ENDPOINT_ALL}{image.id}/",
+            HTTP_AUTHORIZATION=f"Token {premium_user['token']}",
+        )
+
+    assert response.status_code == 200
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_job_retrieve_queries(premium_user, client, django_assert_num_queries):
+    (image,) = create_images(premium_user["user"], 1)
+    job = enqueue_thumbnail_job(image, premium_user["user"])
+
+    with django_assert_num_queries(2):
+        response = client.get(
+            f"{ENDPOINT_JOBS}{job.id}/",
+            HTTP_AUTHORIZATION=f"Token {premium_user['token']}",
+        )
+
+    assert response.status_code == 200
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_upload_queries(premium_user, upload, django_assert_num_queries):
+    # token with user and tier, upload transaction, stored original with same
+    # content hash, original insert in savepoint, stored thumbnails of the
+    # content, bulk insert of thumbnails in savepoint
+    with django_assert_num_queries(11):
+        response = upload(premium_user)
+
+    assert response.status_code == 201
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_timed_upload_queries(enterprise_user, upload, django_assert_num_queries):
+    with django_assert_num_queries(11):
+        response = upload(
+            enterprise_user,
+            endpoint=ENDPOINT_TIMED,
+            expire_time=300,
+            thumbnail_size=100,
+        )
+
+    assert response.status_code == 201
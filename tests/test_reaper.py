@@ -0,0 +1,133 @@
+import datetime
+import threading
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from API import metrics
+from API.models import Image, ThumbnailJob
+from API.reaper import reap_expired, reap_expired_batch, reap_finished_jobs
+from tests.constants import TESTS_MEDIA_ROOT, TESTS_MEDIA_URL
+
+
+def create_stored_image(owner, name, expires_in=None, path=None):
+    if path is None:
+        path = default_storage.save(f"user_{owner.id}/{name}", ContentFile(b"image"))
+    image = Image.objects.create(owner=owner, image=path)
+    if expires_in is not None:
+        expires_at = timezone.now() + datetime.timedelta(seconds=expires_in)
+        Image.objects.filter(id=image.id).update(expire_time=300, expires_at=expires_at)
+    return image
+
+
+@pytest.mark.django_db
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_reap_expired_deletes_rows_and_files_in_batches(
+    basic_user, django_capture_on_commit_callbacks
+):
+    owner = basic_user["user"]
+    expired = [create_stored_image(owner, f"e{i}.jpg", -10) for i in range(5)]
+    active = create_stored_image(owner, "active.jpg", 300)
+    permanent = create_stored_image(owner, "permanent.jpg")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        stats = reap_expired(batch_size=2)
+
+    assert stats["rows"] == 5
+    assert stats["batches"] == 3
+    assert set(Image.objects.all()) == {active, permanent}
+    assert not any(default_storage.exists(image.image.name) for image in expired)
+    assert default_storage.exists(active.image.name)
+    assert metrics.get("reaper_rows_deleted") == 5
+    assert metrics.get("reaper_files_deleted") == 5
+
+
+@pytest.mark.django_db
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_reap_expired_keeps_files_of_other_rows(
+    basic_user, django_capture_on_commit_callbacks
+):
+    owner = basic_user["user"]
+    kept = create_stored_image(owner, "shared.jpg")
+    create_stored_image(owner, "shared.jpg", -10, path=kept.image.name)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert reap_expired_batch(10) == 1
+
+    assert default_storage.exists(kept.image.name)
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_reap_expired_batch_skips_rows_locked_by_other_reaper(basic_user):
+    owner = basic_user["user"]
+    locked = create_stored_image(owner, "locked.jpg", -20)
+    free = create_stored_image(owner, "free.jpg", -10)
+    row_locked = threading.Event()
+    release = threading.Event()
+
+    def other_reaper():
+        with transaction.atomic():
+            Image.objects.select_for_update().filter(id=locked.id).first()
+            row_locked.set()
+            release.wait(5)
+        connection.close()
+
+    thread = threading.Thread(target=other_reaper)
+    thread.start()
+    row_locked.wait(5)
+    try:
+        deleted = reap_expired_batch(10)
+    finally:
+        release.set()
+        thread.join()
+
+    assert deleted == 1
+    assert not Image.objects.filter(id=free.id).exists()
+    assert Image.objects.filter(id=locked.id).exists()
+
+
+@pytest.mark.django_db
+def test_reap_finished_jobs_deletes_done_and_failed_jobs_past_retention(basic_user):
+    long_ago = timezone.now() - settings.THUMBNAIL_JOB_RETENTION
+    recently = timezone.now()
+    jobs = {
+        (status, finished): ThumbnailJob.objects.create(
+            owner=basic_user["user"], status=status, finished=finished
+        ).id
+        for status, finished in [
+            (ThumbnailJob.DONE, long_ago),
+            (ThumbnailJob.FAILED, long_ago),
+            (ThumbnailJob.DONE, recently),
+            (ThumbnailJob.PENDING, None),
+        ]
+    }
+
+    stats = reap_finished_jobs(batch_size=1)
+
+    assert stats["rows"] == stats["batches"] == 2
+    assert set(ThumbnailJob.objects.values_list("id", flat=True)) == {
+        jobs[(ThumbnailJob.DONE, recently)],
+        jobs[(ThumbnailJob.PENDING, None)],
+    }
+    assert metrics.get("reaper_jobs_deleted") == 2
+
+
+@pytest.mark.django_db
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_reap_expired_images_command(basic_user):
+    create_stored_image(basic_user["user"], "expired.jpg", -10)
+    out = StringIO()
+
+    call_command("reap_expired_images", "--batch-size", "10", stdout=out)
+
+    assert "Deleted 1 expired images in 1 batches" in out.getvalue()
+    assert "Deleted 0 finished jobs in 0 batches" in out.getvalue()
+    assert Image.objects.count() == 0
@@ -0,0 +1,234 @@
+import os
+import threading
+import time
+from io import BytesIO
+
+import pytest
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.test import override_settings
+from PIL import Image as PILImage
+from PIL import ImageCms
+
+from API.engine import EXIF_ORIENTATION
+from API.models import EncodingProfile, Image
+from API.rendering import (
+    RenderedThumbnail,
+    decode_source,
+    map_bounded,
+    render_images,
+    render_thumbnails,
+    save_with_profile,
+    write_thumbnail,
+)
+from tests.constants import (
+    TEST_IMAGE_PATH_A,
+    TEST_IMAGE_PATH_JPG,
+    TEST_IMAGE_PATH_ROTATED,
+    TEST_MEDIA_IMAGE_PATH_A,
+    TESTS_MEDIA_ROOT,
+    TESTS_MEDIA_URL,
+)
+
+
+def test_render_images_creates_all_square_sizes():
+    with open(TEST_IMAGE_PATH_A, "rb") as f:
+        images = render_images(File(f), [200, 400, 50])
+
+    assert sorted(images.keys()) == [50, 200, 400]
+    for size, image in images.items():
+        assert image.size == (size, size)
+
+
+def test_render_images_upscales_sizes_bigger_than_source():
+    with open(TEST_IMAGE_PATH_A, "rb") as f:
+        images = render_images(File(f), [200, 1000])
+
+    assert images[1000].size == (1000, 1000)
+    assert images[200].size == (200, 200)
+
+
+def test_render_images_ignores_duplicated_sizes():
+    with open(TEST_IMAGE_PATH_A, "rb") as f:
+        images = render_images(File(f), [200, 200])
+
+    assert list(images.keys()) == [200]
+
+
+def test_decode_source_uses_jpeg_draft_for_small_targets():
+    with open(TEST_IMAGE_PATH_JPG, "rb") as f:
+        image = decode_source(File(f), 100)
+
+    # Source is 1599x1133, draft decoding never goes below requested size
+    assert min(image.size) >= 100
+    assert max(image.size) < 1599
+
+
+def test_decode_source_keeps_full_resolution_for_big_targets():
+    with open(TEST_IMAGE_PATH_JPG, "rb") as f:
+        image = decode_source(File(f), 2000)
+
+    assert image.size == (1599, 1133)
+
+
+def test_decode_source_applies_exif_orientation_of_reduced_source():
+    with open(TEST_IMAGE_PATH_ROTATED, "rb") as f:
+        image = decode_source(File(f), 200)
+    with open(TEST_IMAGE_PATH_ROTATED, "rb") as f:
+        thumbnail = render_images(File(f), [200])[200]
+
+    # reduced by 2, and rotated 90 degrees clockwise, so dark left side is on top
+    assert image.size == (400, 800)
+    assert image.getpixel((200, 0)) < image.getpixel((200, 799))
+    assert thumbnail.getpixel((100, 0)) < thumbnail.getpixel((100, 199))
+
+
+def test_decode_source_rejects_truncated_file():
+    with open(TEST_IMAGE_PATH_JPG, "rb") as f:
+        data = f.read()
+    truncated = File(BytesIO(data[: len(data) // 2]), name="truncated.jpg")
+
+    with pytest.raises(OSError):
+        decode_source(truncated, 200)
+
+
+def test_map_bounded_keeps_order_and_limit():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work(item):
+        with lock:
+            running.append(item)
+            peak.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(item)
+        return item * 2
+
+    with override_settings(THUMBNAIL_RENDER_WORKERS=4):
+        results = list(map_bounded(work, range(8), limit=2))
+
+    assert results == [item * 2 for item in range(8)]
+    assert max(peak) <= 2
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("workers", [1, 4])
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_render_thumbnails_stores_every_size(workers):
+    with override_settings(THUMBNAIL_RENDER_WORKERS=workers):
+        image = Image(image=TEST_MEDIA_IMAGE_PATH_A)
+        rendered = render_thumbnails(image.image, [400, 200, 100])
+
+    assert sorted(rendered.keys()) == [100, 200, 400]
+    for size, metadata in rendered.items():
+        assert default_storage.exists(metadata["image"])
+        assert f"{size}x{size}" in metadata["image"]
+        assert metadata["width"] == metadata["height"] == size
+        assert metadata["file_size"] == default_storage.size(metadata["image"])
+        assert metadata["format"] == "JPEG"
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_write_thumbnail_replaces_file_under_same_name():
+    name = "user_0/replaced.png.100x100.jpg"
+    image = PILImage.new("RGB", (100, 100))
+    write_thumbnail(RenderedThumbnail(name, b"old", image))
+    reader = default_storage.open(name, "rb")
+
+    write_thumbnail(RenderedThumbnail(name, b"new", image))
+
+    assert reader.read() == b"old"  # open readers keep the version they opened
+    reader.close()
+    assert default_storage.open(name, "rb").read() == b"new"
+    assert default_storage.listdir("user_0")[1] == ["replaced.png.100x100.jpg"]
+    assert os.stat(default_storage.path(name)).st_mode & 0o777 == 0o644
+    default_storage.delete(name)
+
+
+def photo_with_icc_profile() -> PILImage.Image:
+    image = PILImage.effect_noise((200, 200), 64).convert("RGB")
+    image.info["icc_profile"] = ImageCms.ImageCmsProfile(
+        ImageCms.createProfile("sRGB")
+    ).tobytes()
+    return image
+
+
+@pytest.mark.parametrize("image_format", ["JPEG", "PNG", "WEBP"])
+def test_save_with_profile_strips_metadata(image_format):
+    image = photo_with_icc_profile()
+
+    stripped = save_with_profile(image, image_format, EncodingProfile())
+    kept = save_with_profile(image, image_format, EncodingProfile(strip_metadata=False))
+
+    with PILImage.open(BytesIO(stripped)) as encoded:
+        assert "icc_profile" not in encoded.info
+    with PILImage.open(BytesIO(kept)) as encoded:
+        assert encoded.info["icc_profile"] == image.info["icc_profile"]
+
+
+def test_save_with_profile_applies_jpeg_settings():
+    image = photo_with_icc_profile()
+
+    low = save_with_profile(image, "JPEG", EncodingProfile(jpeg_quality=30))
+    high = save_with_profile(
+        image, "JPEG", EncodingProfile(jpeg_quality=95, progressive=True)
+    )
+
+    assert len(low) < len(high)
+    with PILImage.open(BytesIO(high)) as encoded:
+        assert encoded.info.get("progressive")
+    with PILImage.open(BytesIO(low)) as encoded:
+        assert not encoded.info.get("progressive")
+
+
+def test_save_with_profile_quantizes_png():
+    image = photo_with_icc_profile().convert("RGBA")
+
+    full_color = save_with_profile(image, "PNG", EncodingProfile())
+    quantized = save_with_profile(image, "PNG", EncodingProfile(png_colors=16))
+
+    assert len(quantized) < len(full_color)
+    with PILImage.open(BytesIO(quantized)) as encoded:
+        assert encoded.mode == "P"
+        assert len(encoded.getcolors()) <= 16
+
+
+@pytest.mark.django_db
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_render_thumbnails_names_differ_per_profile():
+    profile = EncodingProfile.objects.create(name="small", jpeg_quality=40)
+    image = Image(image=TEST_MEDIA_IMAGE_PATH_A)
+
+    default = render_thumbnails(image.image, [200])[200]
+    profiled = render_thumbnails(image.image, [200], profile=profile)[200]
+
+    assert default["image"] != profiled["image"]
+    assert default_storage.exists(default["image"])
+    assert profiled["file_size"] < default["file_size"]
+
+
+def test_save_with_profile_resets_orientation_of_kept_exif():
+    image = photo_with_icc_profile()
+    exif = PILImage.Exif()
+    exif[EXIF_ORIENTATION] = 6
+    image.info["exif"] = exif.tobytes()
+
+    kept = save_with_profile(image, "JPEG", EncodingProfile(strip_metadata=False))
+
+    with PILImage.open(BytesIO(kept)) as encoded:
+        assert encoded.getexif()[EXIF_ORIENTATION] == 1
+
+
+@pytest.mark.parametrize("mode", ["LA", "RGBA", "P"])
+def test_save_with_profile_quantizes_png_with_alpha(mode):
+    image = photo_with_icc_profile().convert("RGBA")
+    image.putalpha(PILImage.linear_gradient("L").resize(image.size))
+    image = image.convert(mode)
+
+    quantized = save_with_profile(image, "PNG", EncodingProfile(png_colors=16))
+
+    with PILImage.open(BytesIO(quantized)) as encoded:
+        assert encoded.mode == "P"
+        assert len(encoded.getcolors()) <= 16
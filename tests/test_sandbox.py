@@ -0,0 +1,107 @@
+import time
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from API import metrics
+from API.jobs import run_job
+from API.models import Image, ThumbnailJob
+from API.sandbox import RenderError, RenderLimitExceeded, run_sandboxed
+from tests.constants import (
+    ENDPOINT_ALL,
+    TEST_IMAGE_PATH_A,
+    TESTS_MEDIA_ROOT,
+    TESTS_MEDIA_URL,
+)
+
+MB = 1024 * 1024
+
+
+def allocate(megabytes):
+    data = bytearray(megabytes * MB)
+    time.sleep(5)
+    return len(data)
+
+
+def fail():
+    raise ValueError("broken image")
+
+
+def count_to(number, progress):
+    for done in range(1, number + 1):
+        progress(done)
+    return number
+
+
+def test_render_process_result_and_peak_memory_are_reported():
+    assert run_sandboxed(len, ([1, 2, 3],), 1000, 100 * MB, 5) == 3
+    assert metrics.get("render_processes") == 1
+    assert metrics.get("render_max_peak_memory_bytes") < 100 * MB
+
+
+def test_progress_of_render_process_is_reported_as_it_goes():
+    reported = []
+
+    result = run_sandboxed(count_to, (3,), 1000, 100 * MB, 5, progress=reported.append)
+
+    assert result == 3
+    assert reported == [1, 2, 3]
+
+
+def test_render_process_is_killed_after_timeout():
+    started = time.monotonic()
+    with pytest.raises(RenderLimitExceeded, match="longer than 0.2 seconds"):
+        run_sandboxed(time.sleep, (5,), 1000, 100 * MB, 0.2)
+
+    assert time.monotonic() - started < 2
+    assert metrics.get("render_timeouts") == 1
+
+
+def test_render_process_is_killed_over_memory_budget():
+    with pytest.raises(RenderLimitExceeded, match="more than 50 MB"):
+        run_sandboxed(allocate, (200,), 1000, 50 * MB, 10)
+
+    assert metrics.get("render_memory_kills") == 1
+
+
+def test_render_process_error_is_raised_in_parent():
+    with pytest.raises(RenderError, match="ValueError: broken image"):
+        run_sandboxed(fail, (), 1000, 100 * MB, 5)
+
+
+@pytest.mark.django_db
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_upload_over_pixel_budget_of_tier_is_rejected(premium_user, upload):
+    tier = premium_user["user"].account_type
+    tier.max_image_pixels = 100
+    tier.save()
+
+    response = upload(premium_user)
+
+    assert response.status_code == 400
+    assert response.json() == {
+        "image": ["Image is too large. Allowed size is 100 pixels."]
+    }
+    assert not Image.objects.exists()
+
+
+@pytest.mark.django_db
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_thumbnail_job_over_pixel_budget_fails(premium_user, client):
+    response = client.post(
+        ENDPOINT_ALL + "?async=true",
+        data={
+            "image": SimpleUploadedFile("a.png", open(TEST_IMAGE_PATH_A, "rb").read())
+        },
+        HTTP_AUTHORIZATION=f"Token {premium_user['token']}",
+        format="multipart",
+    )
+    tier = premium_user["user"].account_type
+    tier.max_image_pixels = 100
+    tier.save()
+
+    job = run_job(ThumbnailJob.objects.get(id=response.json()["job"]["id"]))
+
+    assert job.status == ThumbnailJob.FAILED
+    assert job.error == "Image is too large. Allowed size is 100 pixels."
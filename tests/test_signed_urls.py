@@ -0,0 +1,109 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import pytest
+from django.test import override_settings
+
+from API.models import Image
+from API.signed_urls import InvalidSignature, open_signed_path, sign_path
+from API.slug_cache import slug_cache
+from tests.constants import (
+    CONTENT_TYPE_PNG,
+    ENDPOINT_TIMED,
+    TEST_MEDIA_IMAGE_PATH_A,
+    TESTS_MEDIA_ROOT,
+    TESTS_MEDIA_URL,
+)
+
+pytestmark = pytest.mark.django_db
+
+IMAGE_NAME = os.path.basename(TEST_MEDIA_IMAGE_PATH_A)
+DUMMY_CACHES = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+def in_seconds(seconds):
+    return datetime.now(tz=timezone.utc) + timedelta(seconds=seconds)
+
+
+def split_url(url) -> tuple:
+    """:return: key id, expires and token of signed url path"""
+    _, _, key_id, expires, token = url.split("/")
+    return key_id, int(expires), token
+
+
+@override_settings(URL_SIGNING_KEYS={"new": "new-secret", "old": "old-secret"})
+def test_signed_path_is_opened_with_current_key():
+    url = sign_path(IMAGE_NAME, in_seconds(300))
+    key_id, expires, token = split_url(url)
+
+    assert open_signed_path(key_id, expires, token) == IMAGE_NAME
+    assert key_id == "new"
+    assert IMAGE_NAME not in url
+
+
+def test_signature_of_rotated_keys():
+    with override_settings(URL_SIGNING_KEYS={"old": "old-secret"}):
+        key_id, expires, token = split_url(sign_path(IMAGE_NAME, in_seconds(300)))
+
+    with override_settings(URL_SIGNING_KEYS={"new": "new-secret", "old": "old-secret"}):
+        assert open_signed_path(key_id, expires, token) == IMAGE_NAME
+    with override_settings(URL_SIGNING_KEYS={"new": "new-secret"}):
+        with pytest.raises(InvalidSignature):
+            open_signed_path(key_id, expires, token)
+
+
+def test_tampered_signed_url_is_rejected():
+    key_id, expires, token = split_url(sign_path(IMAGE_NAME, in_seconds(300)))
+    _, _, other_token = split_url(sign_path("user_2/other.png", in_seconds(300)))
+
+    with pytest.raises(InvalidSignature):
+        open_signed_path(key_id, expires, token[:-8] + "AAAAAAAA")
+    with pytest.raises(InvalidSignature):
+        open_signed_path(key_id, expires + 3600, token)
+    assert open_signed_path(key_id, expires, other_token) == "user_2/other.png"
+
+
+@override_settings(
+    MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT, CACHES=DUMMY_CACHES
+)
+def test_signed_image_served_without_lookups(client, django_assert_num_queries):
+    url = sign_path(IMAGE_NAME, in_seconds(300))
+
+    with mock.patch.object(slug_cache, "get_or_load", side_effect=AssertionError):
+        with django_assert_num_queries(0):
+            response = client.get(url)
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == CONTENT_TYPE_PNG
+    assert int(response["Cache-Control"].split("max-age=")[1]) <= 300
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_signed_image_rejected_after_expiry_or_with_bad_signature(
+    client, django_assert_num_queries
+):
+    expired_url = sign_path(IMAGE_NAME, in_seconds(-1))
+    key_id, expires, token = split_url(sign_path(IMAGE_NAME, in_seconds(300)))
+
+    with django_assert_num_queries(0):
+        assert client.get(expired_url).status_code == 410
+        assert client.get(f"/s/{key_id}/{expires + 1}/{token}").status_code == 403
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_timed_endpoint_signed_url_serves_thumbnail(enterprise_user, client, upload):
+    response = upload(
+        enterprise_user, endpoint=ENDPOINT_TIMED, expire_time=300, thumbnail_size=100
+    )
+    signed_url = response.json()["signed_url"].removeprefix("testserver")
+    thumbnail = Image.objects.get(source__isnull=False)
+
+    image_response = client.get(signed_url)
+    _, expires, _ = split_url(signed_url)
+
+    assert thumbnail.image.name not in signed_url
+    assert image_response.status_code == 200
+    assert image_response["Content-Type"] == "image/jpeg"
+    assert 295 <= expires - time.time() <= 300
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+
+from API import metrics
+from API.caching import TwoLevelCache
+from API.jobs import claim_next_job, enqueue_thumbnail_job, run_job
+from API.models import Image
+from API.slug_cache import get_slug_metadata
+from img.caching import invalidate_page
+from tests.constants import TEST_MEDIA_IMAGE_PATH_A, TESTS_MEDIA_ROOT, TESTS_MEDIA_URL
+
+pytestmark = pytest.mark.django_db
+
+
+def test_get_or_load_single_flights_concurrent_misses():
+    test_cache = TwoLevelCache("test", local_size=10, local_ttl=60, ttl=60)
+    loads = []
+
+    def load():
+        loads.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(test_cache.get_or_load("key", load))
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert results == ["value"] * 8
+
+
+@override_settings(CACHE_SINGLE_FLIGHT_WAIT=1)
+def test_get_or_load_waits_for_value_loaded_by_other_process():
+    test_cache = TwoLevelCache("test", local_size=10, local_ttl=60, ttl=60)
+    cache.add(test_cache.make_key("key") + ":lock", 1)
+    threading.Timer(
+        0.1, lambda: cache.set(test_cache.make_key("key"), "shared")
+    ).start()
+
+    value = test_cache.get_or_load("key", lambda: "loaded")
+
+    assert value == "shared"
+    assert metrics.get("test_cache_loads") == 0
+
+
+@override_settings(CACHE_SINGLE_FLIGHT_WAIT=0.05)
+def test_get_or_load_loads_when_other_process_does_not_deliver():
+    test_cache = TwoLevelCache("test", local_size=10, local_ttl=60, ttl=60)
+    cache.add(test_cache.make_key("key") + ":lock", 1)
+
+    assert test_cache.get_or_load("key", lambda: "loaded") == "loaded"
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_unknown_slug_is_negatively_cached(client, django_assert_num_queries):
+    url = reverse("display_image", args=["unknownslug1234"])
+
+    with django_assert_num_queries(1):
+        first = client.get(url)
+    with django_assert_num_queries(0):
+        second = client.get(url)
+
+    assert first.status_code == second.status_code == 404
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_display_image_uses_slug_cache(basic_user, client, django_assert_num_queries):
+    image = Image.objects.create(
+        owner=basic_user["user"], image=TEST_MEDIA_IMAGE_PATH_A
+    )
+    client.get(reverse("display_image", args=[image.slug]))
+    invalidate_page(image.slug)
+
+    with django_assert_num_queries(0):
+        response = client.get(reverse("display_image", args=[image.slug]))
+
+    assert response.status_code == 200
+    assert f"/i/{image.slug}/raw" in response.content.decode("utf8")
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_deleting_image_invalidates_slug(basic_user):
+    image = Image.objects.create(
+        owner=basic_user["user"], image=TEST_MEDIA_IMAGE_PATH_A, expire_time=300
+    )
+    metadata = get_slug_metadata(image.slug)
+
+    image.delete()
+
+    assert metadata.path == image.image.name
+    assert metadata.expires_at == image.expires_at
+    assert get_slug_metadata(image.slug) is None
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_rendered_job_invalidates_reserved_slugs(premium_user):
+    user = premium_user["user"]
+    image = Image.objects.create(owner=user, image=TEST_MEDIA_IMAGE_PATH_A)
+    job = enqueue_thumbnail_job(image, user)
+    assert get_slug_metadata(job.slugs["200"]) is None
+
+    run_job(claim_next_job())
+
+    assert get_slug_metadata(job.slugs["200"]) is not None
@@ -0,0 +1,111 @@
+import importlib
+
+import pytest
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.test import override_settings
+
+from API.models import Image
+from tests.constants import (
+    ENDPOINT_ALL,
+    ENDPOINT_TIMED,
+    TESTS_MEDIA_ROOT,
+    TESTS_MEDIA_URL,
+)
+
+pytestmark = pytest.mark.django_db
+
+link_thumbnails = importlib.import_module(
+    "API.migrations.0014_image_source"
+).link_thumbnails
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_thumbnails_are_linked_to_kept_original(premium_user, basic_user, upload):
+    upload(premium_user)
+    upload(basic_user)
+
+    original = Image.objects.originals().get()
+    assert sorted(original.thumbnails.values_list("thumbnail_size", flat=True)) == [
+        200,
+        400,
+    ]
+    # original of basic tier is deleted after rendering, its thumbnail stays
+    assert Image.objects.get(owner=basic_user["user"]).source is None
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_retrieve_and_grouped_list_nest_thumbnails(premium_user, client, upload):
+    upload(premium_user)
+    original = Image.objects.originals().get()
+
+    retrieved = client.get(
+        f"{ENDPOINT_ALL}{original.id}/",
+        HTTP_AUTHORIZATION=f"Token {premium_user['token']}",
+    ).json()
+    listed = client.get(
+        ENDPOINT_ALL + "?grouped=true",
+        HTTP_AUTHORIZATION=f"Token {premium_user['token']}",
+    ).json()["results"]
+
+    assert [item["img_size"] for item in retrieved["thumbnails"]] == [
+        "200x200",
+        "400x400",
+    ]
+    assert [item["id"] for item in listed] == [original.id]
+    assert listed[0]["thumbnails"][0]["id"] == retrieved["thumbnails"][0]["id"]
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_delete_original_deletes_thumbnails_and_files(
+    enterprise_user, client, django_capture_on_commit_callbacks, upload
+):
+    upload(enterprise_user)
+    original = Image.objects.originals().get()
+    client.post(
+        ENDPOINT_TIMED,
+        data={"image_id": original.id, "expire_time": 300, "thumbnail_size": 100},
+        HTTP_AUTHORIZATION=f"Token {enterprise_user['token']}",
+    )
+    names = list(Image.objects.values_list("image", flat=True))
+    assert len(names) == 4
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.delete(
+            f"{ENDPOINT_ALL}{original.id}/",
+            HTTP_AUTHORIZATION=f"Token {enterprise_user['token']}",
+        )
+
+    assert response.status_code == 204
+    assert not Image.objects.exists()
+    assert not any(default_storage.exists(name) for name in names)
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_delete_image_of_other_user(premium_user, enterprise_user, client, upload):
+    upload(premium_user)
+    original = Image.objects.originals().get()
+
+    response = client.delete(
+        f"{ENDPOINT_ALL}{original.id}/",
+        HTTP_AUTHORIZATION=f"Token {enterprise_user['token']}",
+    )
+
+    assert response.status_code == 404
+    assert Image.objects.count() == 3
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_backfill_links_thumbnails_by_hash_and_file_name(premium_user, upload):
+    upload(premium_user)
+    original = Image.objects.originals().get()
+    Image.objects.update(source=None)
+    # rows uploaded before content hashes, found by thumbnail file name
+    Image.objects.filter(thumbnail_size=400).update(content_hash="")
+
+    link_thumbnails(apps, None)
+
+    assert set(original.thumbnails.values_list("thumbnail_size", flat=True)) == {
+        200,
+        400,
+    }
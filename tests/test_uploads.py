@@ -0,0 +1,121 @@
+import os
+
+import pytest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, override_settings
+
+from API.models import Image
+from tests.constants import (
+    CONTENT_TYPE_PNG,
+    ENDPOINT_BATCH,
+    ENDPOINT_TIMED,
+    TEST_IMAGE_PATH_A,
+    TEST_IMAGE_PATH_B,
+    TESTS_MEDIA_ROOT,
+    TESTS_MEDIA_URL,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def user_files(user) -> set:
+    directory = f"user_{user['user'].id}"
+    if not default_storage.exists(directory):
+        return set()
+    return set(default_storage.listdir(directory)[1])
+
+
+def fail_after_rendering(monkeypatch):
+    def get_url(self, request):
+        raise RuntimeError("failed after rendering")
+
+    monkeypatch.setattr(Image, "get_url", get_url)
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_upload_response_describes_saved_original(premium_user, upload):
+    response = upload(premium_user)
+
+    original = Image.objects.originals().get()
+    assert response.status_code == 201
+    assert response.json()["id"] == original.id
+    assert len(user_files(premium_user)) == 3
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_failed_upload_rolls_back_rows_and_deletes_files(
+    premium_user, upload, monkeypatch
+):
+    fail_after_rendering(monkeypatch)
+
+    response = upload(premium_user, client=Client(raise_request_exception=False))
+
+    assert response.status_code == 500
+    assert not Image.objects.exists()
+    assert user_files(premium_user) == set()
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_failed_timed_upload_rolls_back_rows_and_deletes_files(
+    enterprise_user, upload, monkeypatch
+):
+    def sign_path(*args):
+        raise RuntimeError("failed after rendering")
+
+    monkeypatch.setattr("API.models.sign_path", sign_path)
+
+    response = upload(
+        enterprise_user,
+        endpoint=ENDPOINT_TIMED,
+        client=Client(raise_request_exception=False),
+        expire_time=300,
+        thumbnail_size=100,
+    )
+
+    assert response.status_code == 500
+    assert not Image.objects.exists()
+    assert user_files(enterprise_user) == set()
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_failed_batch_upload_deletes_originals_and_rendered_files(
+    premium_user, monkeypatch
+):
+    images = []
+    for path in (TEST_IMAGE_PATH_A, TEST_IMAGE_PATH_B):
+        with open(path, "rb") as file:
+            images.append(
+                SimpleUploadedFile(
+                    name=os.path.basename(path),
+                    content=file.read(),
+                    content_type=CONTENT_TYPE_PNG,
+                )
+            )
+    fail_after_rendering(monkeypatch)
+
+    response = Client(raise_request_exception=False).post(
+        ENDPOINT_BATCH,
+        data={"images": images},
+        HTTP_AUTHORIZATION=f"Token {premium_user['token']}",
+        format="multipart",
+    )
+
+    assert response.status_code == 500
+    assert not Image.objects.exists()
+    assert user_files(premium_user) == set()
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_failed_duplicate_upload_keeps_files_it_reused(
+    premium_user, enterprise_user, upload, monkeypatch
+):
+    upload(premium_user)
+    stored = user_files(premium_user)
+    fail_after_rendering(monkeypatch)
+
+    response = upload(enterprise_user, client=Client(raise_request_exception=False))
+
+    assert response.status_code == 500
+    assert Image.objects.count() == 3
+    assert user_files(premium_user) == stored
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from API.custom_validators import (
+    HEADER_READ_SIZE,
+    read_image_size,
+    validate_image_dimensions,
+    validate_image_type,
+)
+from tests.constants import (
+    CONTENT_TYPE_PNG,
+    MOCK_WRONG_FILE_TYPE_PATH,
+    TEST_IMAGE_PATH_A,
+    TEST_IMAGE_PATH_JPG,
+)
+
+
+def uploaded_file(path):
+    return SimpleUploadedFile(
+        name=os.path.basename(path),
+        content=open(path, "rb").read(),
+        content_type=CONTENT_TYPE_PNG,
+    )
+
+
+def test_validate_image_type_rewinds_file():
+    image = uploaded_file(TEST_IMAGE_PATH_A)
+    image.seek(100)
+
+    validate_image_type(image)
+
+    assert image.tell() == 0
+
+
+def test_validate_image_type_rejects_renamed_text_file():
+    text_file = uploaded_file(MOCK_WRONG_FILE_TYPE_PATH)
+    text_file.name = "test_text.png"
+
+    with pytest.raises(ValidationError):
+        validate_image_type(text_file)
+
+
+def test_read_image_size_uses_header_only():
+    with open(TEST_IMAGE_PATH_JPG, "rb") as f:
+        header = f.read(HEADER_READ_SIZE)
+
+    with open(TEST_IMAGE_PATH_JPG, "rb") as f:
+        assert read_image_size(f) == (1599, 1133)
+    assert read_image_size(SimpleUploadedFile("a.jpg", header)) == (1599, 1133)
+    assert read_image_size(SimpleUploadedFile("a.jpg", b"not an image")) is None
+
+
+@override_settings(THUMBNAIL_MAX_IMAGE_PIXELS=100_000)
+def test_validate_image_dimensions_rejects_image_over_budget():
+    image = uploaded_file(TEST_IMAGE_PATH_A)
+
+    with pytest.raises(ValidationError):
+        validate_image_dimensions(image)
+    assert image.tell() == 0
+
+
+def test_validate_image_dimensions_accepts_image_within_budget():
+    image = uploaded_file(TEST_IMAGE_PATH_A)
+
+    validate_image_dimensions(image)
+
+    assert image.tell() == 0
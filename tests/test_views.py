@@ -1,16 +1,22 @@
 import datetime
 import os
+from io import BytesIO
 
 import pytest
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image as PILImage
 
-from API.models import Image
+from API.models import AccountTier, Image
+from img.caching import get_cached_page
+from img.serving import accepts
 from tests.constants import (
     CONTENT_TYPE_PNG,
     ENDPOINT_ALL,
     TEST_IMAGE_PATH_A,
+    TEST_MEDIA_IMAGE_PATH_A,
     TESTS_MEDIA_ROOT,
     TESTS_MEDIA_URL,
 )
@@ -59,3 +65,217 @@ def test_dont_display_expired_image(basic_user, client):
 
     assert image_page_response.status_code == 200
     assert "expired" in image_page_response.content.decode("utf8")
+
+
+def create_image(owner, expire_time=None, age=0):
+    image = Image.objects.create(
+        owner=owner, image=TEST_MEDIA_IMAGE_PATH_A, expire_time=expire_time
+    )
+    if expire_time:
+        expires_at = timezone.now() + datetime.timedelta(seconds=expire_time - age)
+        Image.objects.filter(id=image.id).update(expires_at=expires_at)
+    return image
+
+
+def max_age(response):
+    return int(response["Cache-Control"].split("max-age=")[1])
+
+
+@override_settings(
+    MEDIA_URL=TESTS_MEDIA_URL,
+    MEDIA_ROOT=TESTS_MEDIA_ROOT,
+    DISPLAY_IMAGE_CACHE_TTL=3600,
+)
+def test_display_image_without_expire_time_cached_for_configured_ttl(
+    basic_user, client, django_assert_num_queries
+):
+    image = create_image(basic_user["user"])
+
+    first = client.get(reverse("display_image", args=[image.slug]))
+    with django_assert_num_queries(0):
+        second = client.get(reverse("display_image", args=[image.slug]))
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert first["Cache-Control"].startswith("public")
+    assert 3590 <= max_age(first) <= 3600
+    assert "Expires" in first
+    assert max_age(second) <= max_age(first)
+
+
+@override_settings(
+    MEDIA_URL=TESTS_MEDIA_URL,
+    MEDIA_ROOT=TESTS_MEDIA_ROOT,
+    DISPLAY_IMAGE_CACHE_TTL=3600,
+)
+def test_display_time_limited_image_cached_until_it_expires(basic_user, client):
+    image = create_image(basic_user["user"], expire_time=300, age=100)
+
+    response = client.get(reverse("display_image", args=[image.slug]))
+
+    assert "expired" not in response.content.decode("utf8")
+    assert 190 <= max_age(response) <= 200
+    assert get_cached_page(image.slug) is not None
+
+
+@override_settings(
+    MEDIA_URL=TESTS_MEDIA_URL,
+    MEDIA_ROOT=TESTS_MEDIA_ROOT,
+    DISPLAY_IMAGE_CACHE_TTL=3600,
+)
+def test_display_expired_image_cached_for_configured_ttl(basic_user, client):
+    image = create_image(basic_user["user"], expire_time=300, age=400)
+
+    response = client.get(reverse("display_image", args=[image.slug]))
+
+    assert "expired" in response.content.decode("utf8")
+    assert 3590 <= max_age(response) <= 3600
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_deleting_image_invalidates_cached_page(basic_user, client):
+    image = create_image(basic_user["user"])
+    client.get(reverse("display_image", args=[image.slug]))
+    assert get_cached_page(image.slug) is not None
+
+    Image.objects.filter(id=image.id).delete()
+
+    assert get_cached_page(image.slug) is None
+
+
+def create_raw_image(owner, expire_time=None):
+    return Image.objects.create(
+        owner=owner,
+        image=os.path.basename(TEST_MEDIA_IMAGE_PATH_A),
+        expire_time=expire_time,
+    )
+
+
+@override_settings(
+    MEDIA_URL=TESTS_MEDIA_URL,
+    MEDIA_ROOT=TESTS_MEDIA_ROOT,
+    MEDIA_ACCEL_REDIRECT_LOCATION="",
+)
+def test_raw_image_sent_by_django_without_nginx(basic_user, client):
+    image = create_raw_image(basic_user["user"], expire_time=300)
+
+    response = client.get(reverse("display_image_raw", args=[image.slug]))
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == CONTENT_TYPE_PNG
+    assert (
+        b"".join(response.streaming_content)
+        == open(TEST_MEDIA_IMAGE_PATH_A, "rb").read()
+    )
+    assert 290 <= max_age(response) <= 300
+
+
+@override_settings(
+    MEDIA_URL=TESTS_MEDIA_URL,
+    MEDIA_ROOT=TESTS_MEDIA_ROOT,
+    MEDIA_ACCEL_REDIRECT_LOCATION="/protected_media/",
+)
+def test_raw_image_sent_by_nginx_accel_redirect(basic_user, client):
+    image = create_raw_image(basic_user["user"])
+
+    response = client.get(reverse("display_image_raw", args=[image.slug]))
+
+    assert response.status_code == 200
+    assert response["X-Accel-Redirect"] == "/protected_media/test_image_a.png"
+    assert response["Content-Type"] == CONTENT_TYPE_PNG
+    assert response.content == b""
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_raw_image_not_sent_after_expiry(basic_user, client):
+    image = create_raw_image(basic_user["user"], expire_time=300)
+    Image.objects.filter(id=image.id).update(
+        expires_at=timezone.now() - datetime.timedelta(seconds=1)
+    )
+
+    response = client.get(reverse("display_image_raw", args=[image.slug]))
+
+    assert response.status_code == 410
+    assert "X-Accel-Redirect" not in response
+
+
+def test_raw_image_of_unknown_slug(client):
+    response = client.get(reverse("display_image_raw", args=["unknownslug1234"]))
+
+    assert response.status_code == 404
+
+
+def latest_thumbnail() -> Image:
+    return Image.objects.filter(thumbnail_size__isnull=False).latest("id")
+
+
+def transparent_png() -> bytes:
+    image = PILImage.new("RGBA", (600, 600), (255, 0, 0, 128))
+    content = BytesIO()
+    image.save(content, format="PNG")
+    return content.getvalue()
+
+
+def test_accepts_media_type_with_non_zero_quality(rf):
+    assert accepts(rf.get("/", HTTP_ACCEPT="image/avif,image/webp,*/*"), "image/webp")
+    assert accepts(rf.get("/", HTTP_ACCEPT="image/webp;q=0.8"), "image/webp")
+    assert not accepts(rf.get("/", HTTP_ACCEPT="image/webp;q=0"), "image/webp")
+    assert not accepts(rf.get("/", HTTP_ACCEPT="image/*"), "image/webp")
+    assert not accepts(rf.get("/"), "image/webp")
+
+
+@override_settings(
+    MEDIA_URL=TESTS_MEDIA_URL,
+    MEDIA_ROOT=TESTS_MEDIA_ROOT,
+    MEDIA_ACCEL_REDIRECT_LOCATION="",
+)
+def test_raw_thumbnail_negotiated_by_accept_header_for_webp_tier(
+    basic_user, client, upload
+):
+    AccountTier.objects.update(thumbnail_format=AccountTier.WEBP_FORMAT)
+    upload(basic_user)
+    thumbnail = latest_thumbnail()
+    url = reverse("display_image_raw", args=[thumbnail.slug])
+
+    webp = client.get(url, HTTP_ACCEPT="image/webp,*/*")
+    fallback = client.get(url, HTTP_ACCEPT="image/*")
+
+    assert webp["Content-Type"] == "image/webp"
+    assert webp["Vary"] == "Accept"
+    with PILImage.open(BytesIO(b"".join(webp.streaming_content))) as image:
+        assert image.format == "WEBP"
+        assert image.size == (200, 200)
+    assert fallback["Content-Type"] == "image/jpeg"
+    assert fallback["Vary"] == "Accept"
+
+
+@override_settings(
+    MEDIA_URL=TESTS_MEDIA_URL,
+    MEDIA_ROOT=TESTS_MEDIA_ROOT,
+    MEDIA_ACCEL_REDIRECT_LOCATION="",
+)
+def test_raw_thumbnail_of_source_format_tier_is_not_negotiated(
+    basic_user, client, upload
+):
+    upload(basic_user, content=transparent_png())
+    thumbnail = latest_thumbnail()
+
+    response = client.get(
+        reverse("display_image_raw", args=[thumbnail.slug]),
+        HTTP_ACCEPT="image/webp,*/*",
+    )
+
+    assert thumbnail.format == "PNG"
+    assert response["Content-Type"] == CONTENT_TYPE_PNG
+    assert "Vary" not in response
+
+
+@override_settings(MEDIA_URL=TESTS_MEDIA_URL, MEDIA_ROOT=TESTS_MEDIA_ROOT)
+def test_jpeg_tier_stores_transparent_thumbnails_as_jpeg(basic_user, upload):
+    AccountTier.objects.update(thumbnail_format=AccountTier.JPEG_FORMAT)
+
+    upload(basic_user, content=transparent_png())
+    thumbnail = latest_thumbnail()
+
+    assert thumbnail.format == "JPEG"
+    assert thumbnail.image.name.endswith(".jpg")